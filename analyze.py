@@ -1,8 +1,6 @@
 from __future__ import annotations
 
 import argparse
-import pandas as pd
-import matplotlib.pyplot as plt
 
 
 def main():
@@ -12,6 +10,14 @@ def main():
     ap.add_argument("--save", type=str, default=None)
     args = ap.parse_args()
 
+    import pandas as pd
+    import matplotlib
+
+    if not args.show:
+        # tylko zapis do pliku: backend Agg, bez toolkitu GUI
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
     df = pd.read_csv(args.model_csv)
 
     # zakładamy, że indeks kroku jest w pierwszej kolumnie (DataCollector zapisuje index)
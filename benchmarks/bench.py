@@ -0,0 +1,306 @@
+"""
+Benchmarki wydajności tired_system: skalowanie, konstrukcja, koszt zbierania danych, sweep, czas importu.
+
+    python benchmarks/bench.py run --suite quick --save benchmarks/baselines/<nazwa>.json
+    python benchmarks/bench.py compare benchmarks/baselines/<baza>.json <nowy>.json --tolerance 0.15
+    python benchmarks/bench.py run --only "vassals/*,sweep/*"      # wybrane przypadki (wzorce fnmatch)
+
+Każdy przypadek liczy się w osobnym procesie (czysty pomiar szczytowej pamięci RSS).
+Przebiegi mają wyłączone warunki końcowe (TH_reform = TH_exit = 1.01), więc liczba kroków jest stała.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# metryki porównywane przez `compare`: nazwa -> True, jeśli większa wartość jest lepsza
+METRICS = {
+    "steps_per_s": True,
+    "build_s": False,
+    "peak_rss_mb": False,
+    "runs_per_s": True,
+    "import_s": False,
+}
+
+# metryka wybierająca najlepszy pomiar przypadku (pierwsza obecna w wyniku)
+PRIMARY = ("steps_per_s", "runs_per_s", "import_s")
+
+NO_STOP = dict(TH_reform=1.01, TH_exit=1.01)
+
+# czasy konstrukcji poniżej progu to głównie szum — nie porównujemy ich
+MIN_BUILD_S = 0.05
+MIN_IMPORT_S = 0.02
+
+# biblioteki, których ścieżka headless (parametry, presety, rdzeń, batch) nie może ładować
+HEAVY_MODULES = ("mesa", "networkx", "pandas", "matplotlib", "scipy")
+
+
+def _suite(name: str) -> List[Dict]:
+    from tired_system.presets import PRESETS
+
+    full = name == "full"
+    sizes = [100, 1_000, 10_000, 100_000, 1_000_000] if full else [100, 1_000, 10_000]
+    lords = [1, 10, 100, 1_000] if full else [1, 10, 100]
+    n_ref = 10_000 if full else 2_000
+    cases = []
+    for n in sizes:
+        steps = max(5, min(200, 2_000_000 // n))
+        cases.append(dict(kind="model", name=f"vassals/{n}", n_vassals=n, n_lords=12, steps=steps, recording="columnar"))
+    for n in sizes[1:]:
+        steps = max(5, min(200, 2_000_000 // n))
+        cases.append(dict(kind="model", name=f"compact/{n}", n_vassals=n, n_lords=12, steps=steps, recording="none", compact=True))
+    for n_lords in lords:
+        cases.append(dict(kind="model", name=f"lords/{n_lords}", n_vassals=n_ref, n_lords=n_lords, steps=50, recording="columnar"))
+    for preset in PRESETS:
+        cases.append(dict(kind="model", name=f"preset/{preset}", n_vassals=n_ref, n_lords=12, steps=50, preset=preset, recording="columnar"))
+    # koszt zbierania danych: bez zapisu agentów, kolumnowo co krok / co 10 kroków, DataCollector Mesy
+    for recording in ("none", "columnar", "columnar_stride10", "datacollector"):
+        cases.append(dict(kind="model", name=f"collect/{recording}", n_vassals=n_ref, n_lords=12, steps=50, recording=recording))
+    # polityka zbierania przebiegów wsadowych: szeregi modelu co 10 kroków / tylko EndState
+    for collection in ("summary:10", "none"):
+        cases.append(dict(
+            kind="model", name=f"collect/policy_{collection.replace(':', '')}", n_vassals=n_ref, n_lords=12, steps=50,
+            recording="datacollector", collection=collection,
+        ))
+    cases.append(dict(kind="sweep", name="sweep/grid", grid=7 if full else 4, n_vassals=200, steps=100))
+    # zimny import w świeżym interpreterze; worker = import batch + pierwszy przebieg (start procesu puli)
+    for module in ("tired_system", "tired_system.params", "tired_system.core", "tired_system.batch"):
+        cases.append(dict(kind="import", name=f"import/{module}", module=module, headless=True))
+    cases.append(dict(kind="import", name="import/worker", module="tired_system.batch", run=True, headless=True))
+    cases.append(dict(kind="import", name="import/tired_system.model", module="tired_system.model"))
+    return cases
+
+
+# --- pojedynczy przypadek (w procesie potomnym) ---
+def _peak_rss_mb() -> float:
+    import resource
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: bajty
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def _run_model_case(case: Dict) -> Dict:
+    from tired_system import TiredSystemModel, PRESETS
+    from tired_system.params import ModelParams
+    from tired_system.recording import AgentRecording, CollectionPolicy
+
+    overrides = dict(PRESETS[case["preset"]]) if case.get("preset") else {}
+    overrides.update(NO_STOP)
+    params = ModelParams(
+        n_vassals=case["n_vassals"], n_lords=case["n_lords"], max_steps=case["steps"], seed=case.get("seed", 1), **overrides
+    )
+    recording = {
+        "none": AgentRecording(variables=(), stride=case["steps"] + 1),
+        "columnar": AgentRecording(),
+        "columnar_stride10": AgentRecording(stride=10),
+        "datacollector": None,
+    }[case["recording"]]
+
+    t0 = time.perf_counter()
+    compact = case.get("compact", False)
+    if compact and case["recording"] == "none":
+        recording = None
+    collection = CollectionPolicy.parse(case.get("collection", "full"))
+    model = TiredSystemModel(params, agent_recording=recording, compact=compact, collection=collection)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    model.run()
+    run_s = time.perf_counter() - t0
+    steps = model.step_count
+    return {
+        "build_s": build_s,
+        "run_s": run_s,
+        "steps": steps,
+        "steps_per_s": steps / run_s if run_s > 0 else float("inf"),
+        "agent_steps_per_s": steps * params.n_vassals / run_s if run_s > 0 else float("inf"),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_sweep_case(case: Dict) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        cmd = [
+            sys.executable, str(ROOT / "sweep_phase_diagram.py"),
+            "--grid", str(case["grid"]), "--steps", str(case["steps"]), "--n_vassals", str(case["n_vassals"]),
+            "--outdir", tmp, "--savefig", str(Path(tmp) / "phase.png"),
+        ]
+        env = {**os.environ, "MPLBACKEND": "Agg", "PYTHONPATH": str(ROOT)}
+        t0 = time.perf_counter()
+        subprocess.run(cmd, check=True, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wall = time.perf_counter() - t0
+    runs = case["grid"] ** 2
+    return {"wall_s": wall, "runs": runs, "runs_per_s": runs / wall}
+
+
+def _run_import_case(case: Dict) -> Dict:
+    # proces potomny nie zaimportował jeszcze niczego z tired_system (bench.py używa tylko stdlib)
+    import importlib
+
+    t0 = time.perf_counter()
+    module = importlib.import_module(case["module"])
+    if case.get("run"):
+        from tired_system.params import ModelParams
+
+        module.run_end_state(ModelParams(n_vassals=100, n_lords=5, max_steps=10, seed=1))
+    import_s = time.perf_counter() - t0
+    heavy = sorted(m for m in HEAVY_MODULES if m in sys.modules)
+    return {"import_s": import_s, "heavy": heavy, "peak_rss_mb": _peak_rss_mb()}
+
+
+def _case_main(spec: str) -> None:
+    case = json.loads(spec)
+    run = {"sweep": _run_sweep_case, "import": _run_import_case}.get(case["kind"], _run_model_case)
+    result = run(case)
+    print(json.dumps(result))
+
+
+def _run_case(case: Dict, repeat: int) -> Dict:
+    """
+    Najlepszy z `repeat` pomiarów wg głównej metryki przypadku (PRIMARY) — wszystkie czasy z tego samego
+    pomiaru; pamięć — maksimum ze wszystkich.
+    """
+    best, peak = None, 0.0
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, __file__, "_case", json.dumps(case)],
+            check=True, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": str(ROOT)},
+        )
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        peak = max(peak, res.get("peak_rss_mb", 0.0))
+        key = next(k for k in PRIMARY if k in res)
+        if best is None or (res[key] > best[key] if METRICS[key] else res[key] < best[key]):
+            best = res
+    if "peak_rss_mb" in best:
+        best["peak_rss_mb"] = peak
+    return best
+
+
+def _environment() -> Dict:
+    import numpy as np
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def cmd_run(args) -> None:
+    sys.path.insert(0, str(ROOT))
+    cases = _suite(args.suite)
+    if args.only:
+        patterns = args.only.split(",")
+        cases = [c for c in cases if any(fnmatch(c["name"], pattern) for pattern in patterns)]
+
+    results = {}
+    heavy = []
+    for case in cases:
+        t0 = time.perf_counter()
+        res = _run_case(case, args.repeat)
+        results[case["name"]] = {"case": case, **res}
+        shown = ", ".join(f"{k}={res[k]:.4g}" for k in METRICS if k in res)
+        if case.get("headless") and res["heavy"]:
+            heavy.append(case["name"])
+            shown += f"  HEAVY IMPORT: {', '.join(res['heavy'])}"
+        print(f"{case['name']:<28} {shown}  [{time.perf_counter() - t0:.1f}s]", flush=True)
+
+    doc = {"suite": args.suite, "repeat": args.repeat, "environment": _environment(), "results": results}
+    if args.save:
+        path = Path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(doc, indent=2))
+        print(f"Saved: {path}")
+    if heavy:
+        sys.exit(f"Ścieżka headless ładuje ciężkie biblioteki: {', '.join(heavy)}")
+
+
+def compare(base: Dict, new: Dict, tolerance: float) -> List[Dict]:
+    """Wiersze porównania dla wspólnych przypadków; regression=True, gdy metryka gorsza o > tolerance."""
+    rows = []
+    for name, b in base["results"].items():
+        n = new["results"].get(name)
+        if n is None:
+            continue
+        for metric, higher_better in METRICS.items():
+            if metric not in b or metric not in n or not b[metric]:
+                continue
+            if metric == "build_s" and max(b[metric], n[metric]) < MIN_BUILD_S:
+                continue
+            if metric == "import_s" and max(b[metric], n[metric]) < MIN_IMPORT_S:
+                continue
+            ratio = n[metric] / b[metric]
+            change = ratio - 1.0 if higher_better else 1.0 - ratio
+            rows.append({
+                "case": name,
+                "metric": metric,
+                "base": b[metric],
+                "new": n[metric],
+                "change": change,
+                "regression": change < -tolerance,
+            })
+    return rows
+
+
+def cmd_compare(args) -> None:
+    base = json.loads(Path(args.base).read_text())
+    new = json.loads(Path(args.new).read_text())
+    rows = compare(base, new, args.tolerance)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['case']:<28} {row['metric']:<12} {row['base']:>12.4g} -> {row['new']:<12.4g} {row['change']:>+8.1%}  {flag}")
+    bad = [r for r in rows if r["regression"]]
+    print(f"{len(bad)} regression(s) beyond {args.tolerance:.0%} in {len(rows)} comparisons")
+    if bad:
+        sys.exit(1)
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "_case":
+        _case_main(sys.argv[2])
+        return
+
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    run = sub.add_parser("run")
+    run.add_argument("--suite", choices=["quick", "full"], default="quick")
+    run.add_argument("--only", type=str, default=None)
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--save", type=str, default=None)
+    run.set_defaults(func=cmd_run)
+
+    cmp_ = sub.add_parser("compare")
+    cmp_.add_argument("base")
+    cmp_.add_argument("new")
+    cmp_.add_argument("--tolerance", type=float, default=0.15)
+    cmp_.set_defaults(func=cmd_compare)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,12 @@ from __future__ import annotations
 
 import argparse
 from pathlib import Path
-import pandas as pd
 
 from tired_system import TiredSystemModel, PRESETS
-from tired_system.model import ModelParams
+from tired_system.params import ModelParams
+from tired_system.recording import AgentRecording, CollectionPolicy, STATE_VARS
+from tired_system.profiling import make_profiler
+from tired_system.streams import RNG_SCHEMES
 
 
 def build_params_from_args(args) -> ModelParams:
@@ -14,6 +16,7 @@ def build_params_from_args(args) -> ModelParams:
         n_lords=args.n_lords,
         max_steps=args.steps,
         seed=args.seed,
+        rng_scheme=args.rng_scheme,
     )
 
     if args.preset:
@@ -33,6 +36,10 @@ def build_params_from_args(args) -> ModelParams:
         "TH_exit": args.TH_exit,
         "e_min": args.e_min,
         "s_min": args.s_min,
+        "exit_removal": args.exit_removal or None,
+        "patron_switching": args.patron_switching or None,
+        "switch_loy": args.switch_loy,
+        "switch_prob": args.switch_prob,
     }
     for k, v in overrides.items():
         if v is not None:
@@ -41,6 +48,33 @@ def build_params_from_args(args) -> ModelParams:
     return p
 
 
+def build_agent_recording_from_args(args):
+    # zapis kolumnowy włączamy, gdy podano którąkolwiek z opcji --agent_*/--record_lords
+    if args.agent_vars is None and args.agent_stride is None and args.agent_sample is None and not args.record_lords:
+        return None
+    variables = tuple(args.agent_vars.split(",")) if args.agent_vars else STATE_VARS + ("access_received",)
+    return AgentRecording(
+        variables=variables,
+        stride=args.agent_stride or 1,
+        sample=args.agent_sample,
+        lords=args.record_lords,
+    )
+
+
+def build_model(params: ModelParams, args, **kw) -> TiredSystemModel:
+    if args.shards:
+        from tired_system.sharded import ShardedModel
+
+        return ShardedModel(params, compact=args.compact, workers=args.shards, **kw)
+    return TiredSystemModel(params, compact=args.compact, **kw)
+
+
+def close_model(model: TiredSystemModel) -> None:
+    # procesy robocze trybu --shards; stan zostaje w modelu (zapis wyników po zamknięciu)
+    if hasattr(model, "close"):
+        model.close()
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--preset", choices=list(PRESETS.keys()), default="dryf")
@@ -48,6 +82,7 @@ def main():
     ap.add_argument("--n_lords", type=int, default=12)
     ap.add_argument("--steps", type=int, default=400)
     ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--rng_scheme", choices=list(RNG_SCHEMES), default="sequential")
 
     ap.add_argument("--I_work", type=float, default=None)
     ap.add_argument("--A_affect", type=float, default=None)
@@ -59,31 +94,169 @@ def main():
     ap.add_argument("--TH_exit", type=float, default=None)
     ap.add_argument("--e_min", type=float, default=None)
     ap.add_argument("--s_min", type=float, default=None)
+    ap.add_argument("--exit_removal", action="store_true")
+
+    # zmiana patrona (patron_switching)
+    ap.add_argument("--patron_switching", action="store_true")
+    ap.add_argument("--switch_loy", type=float, default=None)
+    ap.add_argument("--switch_prob", type=float, default=None)
+
+    # zapis agentów: kolumnowy (float32) zamiast DataCollectora
+    ap.add_argument("--agent_vars", type=str, default=None)
+    ap.add_argument("--agent_stride", type=int, default=None)
+    ap.add_argument("--agent_sample", type=int, default=None)
+    ap.add_argument("--record_lords", action="store_true")
+    # co zbierać: full (szeregi + agenci), summary[:k] (szeregi modelu co k kroków), end (ostatni krok), none
+    ap.add_argument("--collect", type=str, default="full")
+
+    # format wyjścia: csv (po runie) albo parquet/arrow (strumieniowo, chunkami co --chunk_steps kroków)
+    ap.add_argument("--format", choices=["csv", "parquet", "arrow"], default="csv")
+    ap.add_argument("--chunk_steps", type=int, default=50)
+    ap.add_argument("--compression", type=str, default="zstd")
+
+    # trwały cache wyników (SQLite): EndState + szeregi modelu; przy trafieniu bez ponownej symulacji
+    ap.add_argument("--cache", type=str, default=None)
+    ap.add_argument("--cache_max_mb", type=float, default=1024)
+
+    # tryb dużej skali: float32, sieć CSR bez networkx, bez agentów Mesy (agenci tylko przez --agent_*)
+    ap.add_argument("--compact", action="store_true")
+    # jeden run w kilku procesach (stan w pamięci współdzielonej); wyniki jak bez --shards
+    ap.add_argument("--shards", type=int, default=None)
+
+    # profil etapów kroku: tabela na stdout + JSON w outdir (--profile_memory: także alokacje, wolniej)
+    ap.add_argument("--profile", action="store_true")
+    ap.add_argument("--profile_memory", action="store_true")
 
     ap.add_argument("--outdir", type=str, default="out")
     args = ap.parse_args()
+    if args.cache and args.format != "csv":
+        ap.error("--cache działa z --format csv")
+    if args.cache and args.compact:
+        ap.error("--cache nie obsługuje --compact (wyniki float32 różnią się od trybu zwykłego)")
+    try:
+        collection = CollectionPolicy.parse(args.collect)
+    except ValueError as exc:
+        ap.error(f"--collect: {exc}")
+    if not collection.agents and build_agent_recording_from_args(args) is not None:
+        ap.error("--agent_*/--record_lords wymagają --collect full")
 
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
     params = build_params_from_args(args)
-    model = TiredSystemModel(params)
-    end_state = model.run()
+    profiler = make_profiler(args.profile or args.profile_memory, track_memory=args.profile_memory)
+    if args.format != "csv":
+        end_state, saved = run_streaming(params, args, outdir, profiler, collection)
+        report(end_state, saved)
+        report_profile(profiler, outdir / f"profile_{args.preset}_seed{args.seed}.json")
+        return
+
+    # cache wyników zamykany po przebiegu (także po błędzie)
+    if args.cache:
+        from tired_system.cache import ResultCache
 
-    model_df = model.get_model_df()
-    agent_df = model.get_agent_df()
+        with ResultCache(args.cache, max_bytes=int(args.cache_max_mb * 2**20)) as cache:
+            run_csv(params, args, outdir, profiler, collection, cache)
+    else:
+        run_csv(params, args, outdir, profiler, collection, None)
 
-    # pliki
+
+def run_csv(params: ModelParams, args, outdir: Path, profiler, collection, cache) -> None:
     model_path = outdir / f"model_{args.preset}_seed{args.seed}.csv"
     agent_path = outdir / f"agents_{args.preset}_seed{args.seed}.csv"
 
-    model_df.to_csv(model_path, index=True)
-    agent_df.to_csv(agent_path, index=True)
+    recording = build_agent_recording_from_args(args)
+    # cache trzyma tylko szeregi modelu: przy zapisie agentów/lordów zawsze liczymy od nowa
+    agent_output = recording is not None or (not args.compact and collection.agents)
+    if cache is not None and not agent_output:
+        end_state, series = cache.get(params), cache.get_series(params)
+        if end_state is not None and series is not None:
+            # trafienie: pełne szeregi z cache przycięte do kroków, które zebrałby przebieg (--collect)
+            df = series.to_frame()
+            last = df.index[-1]
+            df = df[[collection.collects(int(t), final=t == last) for t in df.index]]
+            saved = []
+            if len(df):
+                df.to_csv(model_path, index=True)
+                saved.append(model_path)
+            print(f"Cache hit ({args.cache})")
+            report(end_state, saved)
+            return
+
+    model = build_model(params, args, agent_recording=recording, profiler=profiler, collection=collection)
+    try:
+        end_state = model.run()
+    finally:
+        close_model(model)
+    if cache is not None:
+        # szeregi do cache tylko pełne (co krok); sam EndState nie nadpisuje wpisu z szeregami
+        if collection.mode in ("summary", "full") and collection.every == 1:
+            cache.put(params, end_state, model.series)
+        elif cache.get(params) is None:
+            cache.put(params, end_state)
+
+    # pliki (tryb compact bez opcji --agent_*: tylko szeregi modelu; --collect none: bez plików)
+    saved = []
+    if len(model.series):
+        model.get_model_df().to_csv(model_path, index=True)
+        saved.append(model_path)
+    if model.agent_recorder is not None or model.datacollector is not None:
+        model.get_agent_df().to_csv(agent_path, index=True)
+        saved.append(agent_path)
+
+    if args.record_lords:
+        lord_path = outdir / f"lords_{args.preset}_seed{args.seed}.csv"
+        model.get_lord_df().to_csv(lord_path, index=True)
+        saved.append(lord_path)
+
+    report(end_state, saved)
+    report_profile(profiler, outdir / f"profile_{args.preset}_seed{args.seed}.json")
+
+
+def run_streaming(params: ModelParams, args, outdir: Path, profiler=None, collection=None):
+    from tired_system.streaming import ChunkedRunWriter
+
+    # bufory na jeden chunk: pamięć stała niezależnie od --steps; agentów zapisujemy kolumnowo
+    recording = build_agent_recording_from_args(args)
+    if recording is None and not args.compact and (collection is None or collection.agents):
+        recording = AgentRecording()
+    chunk = max(1, args.chunk_steps)
+    model = build_model(
+        params, args, agent_recording=recording, buffer_steps=chunk, profiler=profiler, collection=collection
+    )
+
+    stems = {"model": f"model_{args.preset}_seed{args.seed}"}
+    if recording is not None:
+        stems["agents"] = f"agents_{args.preset}_seed{args.seed}"
+    if recording is not None and recording.lords:
+        stems["lords"] = f"lords_{args.preset}_seed{args.seed}"
+
+    try:
+        with ChunkedRunWriter(outdir, stems, fmt=args.format, compression=args.compression) as writer:
+            while model.running:
+                model.step()
+                if model.step_count % chunk == 0:
+                    writer.flush(model)
+            writer.flush(model)
+        # po ostatnim kroku run() nie liczy nic więcej — zwraca EndState przebiegu
+        end_state = model.run()
+    finally:
+        close_model(model)
+
+    return end_state, list(writer.paths.values())
+
+
+def report_profile(profiler, path: Path) -> None:
+    if profiler.enabled:
+        print(profiler.format_table())
+        print(f"Saved: {profiler.to_json(path)}")
+
 
+def report(end_state, saved) -> None:
     print("DONE")
     print(f"Status: {end_state.status} | step={end_state.step} | mean_coord={end_state.mean_coord:.3f} | exit_share={end_state.exit_share:.3f}")
-    print(f"Saved: {model_path}")
-    print(f"Saved: {agent_path}")
+    for path in saved:
+        print(f"Saved: {path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from tired_system import PRESETS
+from tired_system.params import ModelParams
+from tired_system.sensitivity import (
+    OUTPUTS,
+    DEFAULT_BOUNDS,
+    param_space,
+    parse_bounds,
+    saltelli_design,
+    sobol_indices,
+    morris_design,
+    morris_indices,
+    evaluate,
+)
+from tired_system.streams import RNG_SCHEMES
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--method", choices=["sobol", "morris"], default="sobol")
+    # pola ModelParams (domyślnie wszystkie z DEFAULT_BOUNDS) i ich zakresy "nazwa=lo:hi,..."
+    ap.add_argument("--params", type=str, default=None)
+    ap.add_argument("--bounds", type=str, default=None)
+    # środek analizy: preset (pozostałe pola) i opcjonalnie zakres ± spread * szerokość wokół niego
+    ap.add_argument("--preset", choices=list(PRESETS.keys()), default=None)
+    ap.add_argument("--spread", type=float, default=None)
+
+    # Sobol: n punktów bazowych (potęga 2), razem n * (d + 2) przebiegów; Morris: r * (d + 1)
+    ap.add_argument("--n", type=int, default=64)
+    ap.add_argument("--trajectories", type=int, default=20)
+    ap.add_argument("--levels", type=int, default=4)
+    ap.add_argument("--bootstrap", type=int, default=500)
+    ap.add_argument("--confidence", type=float, default=0.95)
+
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--rng_scheme", choices=list(RNG_SCHEMES), default="sequential")
+    ap.add_argument("--steps", type=int, default=250)
+    ap.add_argument("--n_vassals", type=int, default=200)
+    ap.add_argument("--n_lords", type=int, default=10)
+    ap.add_argument("--replicas", type=int, default=1)
+
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--chunksize", type=int, default=None)
+    ap.add_argument("--cache", type=str, default=None)
+    ap.add_argument("--cache_max_mb", type=float, default=1024)
+
+    ap.add_argument("--outdir", type=str, default="out")
+    ap.add_argument("--savefig", type=str, default=None)
+    args = ap.parse_args()
+
+    outdir = Path(args.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    base = ModelParams(
+        n_vassals=args.n_vassals,
+        n_lords=args.n_lords,
+        max_steps=args.steps,
+        seed=args.seed,
+        rng_scheme=args.rng_scheme,
+    )
+    names = args.params.split(",") if args.params else list(DEFAULT_BOUNDS)
+    try:
+        space = param_space(names, base=base, preset=args.preset, bounds=parse_bounds(args.bounds), spread=args.spread)
+    except ValueError as exc:
+        ap.error(str(exc))
+
+    if args.method == "sobol":
+        n = 1 << max(0, int(np.ceil(np.log2(max(1, args.n)))))
+        if n != args.n:
+            print(f"--n rounded up to a power of 2: {n}")
+        unit = saltelli_design(space, n, seed=args.seed)
+    else:
+        unit, order, signs = morris_design(space, args.trajectories, levels=args.levels, seed=args.seed)
+    print(f"{args.method}: {space.d} parameters, {len(unit)} runs (x{args.replicas} replicas)")
+
+    pool_opts = dict(workers=args.workers, chunksize=args.chunksize, progress=True, label=args.method)
+    cache = None
+    if args.cache:
+        from tired_system.cache import ResultCache
+
+        cache = pool_opts["cache"] = ResultCache(args.cache, max_bytes=int(args.cache_max_mb * 2**20))
+    y = evaluate(space, unit, replicas=args.replicas, **pool_opts)
+    if cache is not None:
+        print(f"Cache: {cache.hits} hit / {cache.misses} miss ({cache.path})")
+        cache.close()
+
+    import pandas as pd
+
+    stem = f"sensitivity_{args.method}_{args.preset or 'default'}_seed{args.seed}"
+    design = pd.DataFrame(space.values(unit), columns=space.names)
+    for k, out in enumerate(OUTPUTS):
+        design[out] = y[:, k]
+    design_path = outdir / f"{stem}_design.csv"
+    design.to_csv(design_path, index=False)
+
+    rows = []
+    for k, out in enumerate(OUTPUTS):
+        if args.method == "sobol":
+            ind = sobol_indices(y[:, k], n, space.d, bootstrap=args.bootstrap, confidence=args.confidence, seed=args.seed)
+        else:
+            ind = morris_indices(
+                y[:, k], order, signs, levels=args.levels,
+                bootstrap=args.bootstrap, confidence=args.confidence, seed=args.seed,
+            )
+        for i, name in enumerate(space.names):
+            rows.append({"output": out, "param": name, **{key: float(v[i]) for key, v in ind.items()}})
+    df = pd.DataFrame(rows)
+    indices_path = outdir / f"{stem}_indices.csv"
+    df.to_csv(indices_path, index=False)
+
+    # ranking: indeks całkowity (Sobol) albo mu* (Morris)
+    key = "ST" if args.method == "sobol" else "mu_star"
+    cols = [c for c in df.columns if c not in ("output", "param")]
+    for out in OUTPUTS:
+        part = df[df["output"] == out].sort_values(key, ascending=False, na_position="last")
+        print(f"\n== {out} (ranked by {key}) ==")
+        print(part[["param"] + cols].head(10).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(f"\nSaved: {design_path}")
+    print(f"Saved: {indices_path}")
+
+    # matplotlib dopiero przy rysowaniu; --savefig bez okna
+    import matplotlib
+
+    if args.savefig:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(2, 2, figsize=(12, max(6, 0.5 * space.d + 3)))
+    for ax, out in zip(axes.ravel(), OUTPUTS):
+        part = df[df["output"] == out].sort_values(key, ascending=True, na_position="first")
+        lo, hi = part.get(f"{key}_lo"), part.get(f"{key}_hi")
+        xerr = None
+        if lo is not None and hi is not None:
+            xerr = np.vstack([part[key] - lo, hi - part[key]]).clip(min=0)
+        ax.barh(part["param"], part[key], xerr=xerr, color="tab:blue", alpha=0.8)
+        if args.method == "sobol":
+            ax.scatter(part["S1"], part["param"], color="tab:orange", zorder=3, s=12, label="S1")
+            ax.legend(loc="lower right")
+        ax.set_title(f"{out}: {key}")
+    fig.tight_layout()
+    if args.savefig:
+        plt.savefig(args.savefig, dpi=150, bbox_inches="tight")
+    else:
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from tired_system.service import serve
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    # gniazdo Unix (domyślnie) albo TCP na localhost (--port)
+    ap.add_argument("--socket", type=str, default="/tmp/tired_system.sock")
+    ap.add_argument("--host", type=str, default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=None)
+
+    # pula procesów z zaimportowanym modelem; paczki do --max_batch przebiegów na proces
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--max_batch", type=int, default=16)
+    # back-pressure: przyjęte przebiegi na serwer i niezakończone żądania na połączenie
+    ap.add_argument("--max_pending", type=int, default=1024)
+    ap.add_argument("--max_requests", type=int, default=256)
+
+    ap.add_argument("--cache", type=str, default=None)
+    ap.add_argument("--cache_max_mb", type=float, default=1024)
+    args = ap.parse_args()
+
+    cache = None
+    if args.cache:
+        from tired_system.cache import ResultCache
+
+        cache = ResultCache(args.cache, max_bytes=int(args.cache_max_mb * 2**20))
+    try:
+        asyncio.run(
+            serve(
+                path=None if args.port is not None else args.socket,
+                host=args.host,
+                port=args.port,
+                workers=args.workers,
+                max_batch=args.max_batch,
+                max_pending=args.max_pending,
+                max_requests=args.max_requests,
+                cache=cache,
+            )
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from tired_system import PRESETS
+from tired_system.params import ModelParams
+from tired_system.sensitivity import param_space, parse_bounds
+from tired_system.streams import RNG_SCHEMES
+from tired_system.surrogate import REGIMES, TARGETS, Surrogate, active_learning, load_rows
+
+
+def parse_point(text: str) -> dict:
+    # "I_work=0.5,G_regen=0.3"
+    out = {}
+    for item in filter(None, text.split(",")):
+        name, value = item.split("=")
+        out[name.strip()] = float(value)
+    return out
+
+
+def report_fit(sur: Surrogate) -> None:
+    scales = ", ".join(f"{n}={v:.3g}" for n, v in zip(sur.names, sur.gp.lengthscales))
+    print(f"Surrogate: {sur.n_train} runs | features: {', '.join(sur.names)}")
+    print(f"  length scales ({scales}) | noise={sur.gp.noise:.3g} | link scale={sur.scale:.3g}")
+
+
+def cmd_fit(args) -> None:
+    rows = load_rows(args.data)
+    names = args.params.split(",") if args.params else None
+    sur = Surrogate.fit(rows, names, max_fit=args.max_fit, seed=args.seed)
+    report_fit(sur)
+    print(f"Saved: {sur.save(args.model)}")
+
+
+def cmd_predict(args) -> None:
+    sur = Surrogate.load(args.model)
+    points = [parse_point(p) for p in args.point]
+    missing = sorted({n for n in sur.names if any(n not in p for p in points)})
+    if missing:
+        raise SystemExit(f"--point: brak pól {', '.join(missing)} (emulator: {', '.join(sur.names)})")
+    query = {n: [p[n] for p in points] for n in sur.names}
+    t0 = time.perf_counter()
+    pred = sur.predict(query)
+    ms = (time.perf_counter() - t0) * 1000.0
+    import pandas as pd
+
+    df = pd.DataFrame({**query, **pred})
+    print(df.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(f"{len(points)} point(s) in {ms:.2f} ms")
+
+
+def cmd_active(args) -> None:
+    outdir = Path(args.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    base = ModelParams(
+        n_vassals=args.n_vassals,
+        n_lords=args.n_lords,
+        max_steps=args.steps,
+        seed=args.seed,
+        rng_scheme=args.rng_scheme,
+    )
+    names = args.params.split(",")
+    try:
+        space = param_space(names, base=base, preset=args.preset, bounds=parse_bounds(args.bounds), spread=args.spread)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    rows = load_rows(args.data) if args.data else None
+
+    pool_opts = dict(workers=args.workers, chunksize=args.chunksize, progress=True, label="active")
+    cache = None
+    if args.cache:
+        from tired_system.cache import ResultCache
+
+        cache = pool_opts["cache"] = ResultCache(args.cache, max_bytes=int(args.cache_max_mb * 2**20))
+
+    def on_fit(r, sur, data):
+        counts = {k: int(np.sum(np.asarray(data["status"]) == k)) for k in REGIMES}
+        print(f"round {r}: {len(data['status'])} runs {counts}")
+
+    sur, data = active_learning(
+        space, args.rounds, args.batch, initial=args.initial, rows=rows, pool=args.pool, explore=args.explore,
+        seed=args.seed, max_fit=args.max_fit, callback=on_fit, **pool_opts,
+    )
+    if cache is not None:
+        print(f"Cache: {cache.hits} hit / {cache.misses} miss ({cache.path})")
+        cache.close()
+
+    stem = f"surrogate_{args.preset or 'default'}_seed{args.seed}"
+    csv_path = outdir / f"{stem}_runs.csv"
+    import pandas as pd
+
+    pd.DataFrame({k: data[k] for k in space.names + ("status",) + TARGETS}).to_csv(csv_path, index=False)
+    report_fit(sur)
+    print(f"Saved: {csv_path}")
+    print(f"Saved: {sur.save(args.model or outdir / f'{stem}.pkl')}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    # uczenie na zgromadzonych wynikach (CSV ze sweep_phase_diagram.py, sensitivity_analysis.py, active)
+    fit = sub.add_parser("fit")
+    fit.add_argument("data", nargs="+")
+    fit.add_argument("--params", type=str, default=None)
+    fit.add_argument("--model", type=str, default="out/surrogate.pkl")
+    fit.add_argument("--max_fit", type=int, default=600)
+    fit.add_argument("--seed", type=int, default=0)
+
+    # predykcja: --point "I_work=0.5,G_regen=0.3" (można powtarzać)
+    pred = sub.add_parser("predict")
+    pred.add_argument("model")
+    pred.add_argument("--point", action="append", required=True)
+
+    # aktywne uczenie: symulacje tam, gdzie emulator jest najmniej pewny reżimu
+    act = sub.add_parser("active")
+    act.add_argument("--params", type=str, default="I_work,G_regen")
+    act.add_argument("--bounds", type=str, default=None)
+    act.add_argument("--preset", choices=list(PRESETS.keys()), default=None)
+    act.add_argument("--spread", type=float, default=None)
+    act.add_argument("--data", nargs="*", default=None)
+    act.add_argument("--initial", type=int, default=32)
+    act.add_argument("--rounds", type=int, default=5)
+    act.add_argument("--batch", type=int, default=16)
+    act.add_argument("--pool", type=int, default=4096)
+    act.add_argument("--explore", type=float, default=0.5)
+    act.add_argument("--max_fit", type=int, default=600)
+
+    act.add_argument("--seed", type=int, default=42)
+    act.add_argument("--rng_scheme", choices=list(RNG_SCHEMES), default="sequential")
+    act.add_argument("--steps", type=int, default=250)
+    act.add_argument("--n_vassals", type=int, default=200)
+    act.add_argument("--n_lords", type=int, default=10)
+
+    act.add_argument("--workers", type=int, default=1)
+    act.add_argument("--chunksize", type=int, default=None)
+    act.add_argument("--cache", type=str, default=None)
+    act.add_argument("--cache_max_mb", type=float, default=1024)
+
+    act.add_argument("--outdir", type=str, default="out")
+    act.add_argument("--model", type=str, default=None)
+    args = ap.parse_args()
+
+    {"fit": cmd_fit, "predict": cmd_predict, "active": cmd_active}[args.cmd](args)
+
+
+if __name__ == "__main__":
+    main()
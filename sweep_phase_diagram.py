@@ -5,17 +5,59 @@ from itertools import product
 from pathlib import Path
 
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 
-from tired_system import TiredSystemModel, PRESETS
-from tired_system.model import ModelParams
+from tired_system import PRESETS
+from tired_system.params import ModelParams
+from tired_system.batch import run_end_states, run_replicated_end_states, replica_seeds, replica_topology_seeds
+from tired_system.adaptive import refine_grid
+from tired_system.profiling import make_profiler
+from tired_system.streams import RNG_SCHEMES
+
+STATUS_MAP = {"reform": 2, "running": 1, "max_steps": 1, "collapse": 0}
+
+
+def point_params(base: ModelParams, I_work: float, G_regen: float) -> ModelParams:
+    return base.__class__(**{**base.__dict__, "I_work": I_work, "G_regen": G_regen})
+
+
+def end_row(I_work: float, G_regen: float, end) -> dict:
+    return {
+        "I_work": I_work,
+        "G_regen": G_regen,
+        "status": end.status,
+        "step": end.step,
+        "mean_coord": end.mean_coord,
+        "exit_share": end.exit_share,
+    }
+
+
+def adaptive_sweep(base: ModelParams, args, pool_opts: dict):
+    """
+    Siatka adaptacyjna: start z --grid × --grid, podział komórek o różnych statusach w narożnikach
+    (do --max_depth poziomów). Punkty leżą na siatce jednorodnej (grid - 1) * 2**max_depth + 1.
+    """
+    size = (args.grid - 1) * 2 ** args.max_depth
+    I_fine = np.linspace(args.I_min, args.I_max, size + 1)
+    G_fine = np.linspace(args.G_min, args.G_max, size + 1)
+    level = [0]
+
+    def evaluate(points):
+        params = [point_params(base, float(I_fine[i]), float(G_fine[j])) for i, j in points]
+        ends = run_end_states(params, **{**pool_opts, "label": f"refine L{level[0]}"})
+        level[0] += 1
+        return ends
+
+    grid = refine_grid(evaluate, base=args.grid, max_depth=args.max_depth)
+    rows = [end_row(float(I_fine[i]), float(G_fine[j]), end) for (i, j), end in sorted(grid.values.items())]
+    print(f"Adaptive: {len(rows)} runs (uniform {size + 1}x{size + 1} = {(size + 1) ** 2})")
+    return rows, grid.raster(lambda end: STATUS_MAP.get(end.status, 1))
 
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--preset", choices=list(PRESETS.keys()), default="dryf")
     ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--rng_scheme", choices=list(RNG_SCHEMES), default="sequential")
     ap.add_argument("--steps", type=int, default=250)
     ap.add_argument("--n_vassals", type=int, default=200)
     ap.add_argument("--n_lords", type=int, default=10)
@@ -26,9 +68,29 @@ def main():
     ap.add_argument("--G_max", type=float, default=0.90)
     ap.add_argument("--grid", type=int, default=11)
 
+    # równoległość: pula procesów, punkty siatki wysyłane chunkami
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--chunksize", type=int, default=None)
+    # repliki na punkt (seed, seed+1, ...) liczone razem jako zespół na wspólnej topologii
+    ap.add_argument("--replicas", type=int, default=1)
+    # siatka adaptacyjna: zagęszczanie tylko przy granicach reżimów
+    ap.add_argument("--adaptive", action="store_true")
+    ap.add_argument("--max_depth", type=int, default=4)
+    # trwały cache wyników (SQLite): powtórny sweep liczy tylko nowe punkty
+    ap.add_argument("--cache", type=str, default=None)
+    ap.add_argument("--cache_max_mb", type=float, default=1024)
+
+    # profil etapów kroku zsumowany po przebiegach (także z procesów roboczych)
+    ap.add_argument("--profile", action="store_true")
+    ap.add_argument("--profile_memory", action="store_true")
+
     ap.add_argument("--outdir", type=str, default="out")
     ap.add_argument("--savefig", type=str, default=None)
+    # tylko CSV: bez matplotlib
+    ap.add_argument("--no_plot", action="store_true")
     args = ap.parse_args()
+    if args.adaptive and args.replicas > 1:
+        ap.error("--adaptive działa z pojedynczym przebiegiem na punkt (--replicas 1)")
 
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
@@ -38,6 +100,7 @@ def main():
         n_lords=args.n_lords,
         max_steps=args.steps,
         seed=args.seed,
+        rng_scheme=args.rng_scheme,
     )
 
     preset = PRESETS[args.preset].copy()
@@ -45,34 +108,84 @@ def main():
         if hasattr(base, k):
             base = base.__class__(**{**base.__dict__, k: v})
 
+    pool_opts = dict(workers=args.workers, chunksize=args.chunksize, progress=True, label="sweep")
+    cache = open_cache(args)
+    if cache is not None:
+        pool_opts["cache"] = cache
+    profiler = make_profiler(args.profile or args.profile_memory, track_memory=args.profile_memory)
+    if profiler.enabled:
+        pool_opts["profiler"] = profiler
+
+    if args.adaptive:
+        rows, image = adaptive_sweep(base, args, pool_opts)
+        import pandas as pd
+
+        df = pd.DataFrame(rows)
+        csv_path = outdir / f"phase_{args.preset}_seed{args.seed}_adaptive.csv"
+        df.to_csv(csv_path, index=False)
+        print(f"Saved: {csv_path}")
+        report_cache(cache)
+        report_profile(profiler, outdir / f"profile_{args.preset}_seed{args.seed}_adaptive.json")
+        if args.no_plot:
+            return
+
+        plt = pyplot(args)
+        plt.figure()
+        extent = [args.I_min, args.I_max, args.G_min, args.G_max]
+        plt.imshow(image, aspect="auto", origin="lower", extent=extent, interpolation="nearest")
+        plt.scatter(df["I_work"], df["G_regen"], s=1, c="k", alpha=0.3)
+        plt.title("Mapa reżimów, siatka adaptacyjna (0=collapse, 1=dryf, 2=reform)")
+        plt.xlabel("I_work")
+        plt.ylabel("G_regen")
+        finish_figure(plt, args)
+        return
+
     I_vals = np.linspace(args.I_min, args.I_max, args.grid)
     G_vals = np.linspace(args.G_min, args.G_max, args.grid)
 
+    points = [(float(I_work), float(G_regen)) for I_work, G_regen in product(I_vals, G_vals)]
+    params = [point_params(base, I_work, G_regen) for I_work, G_regen in points]
+
     rows = []
-    for I_work, G_regen in product(I_vals, G_vals):
-        p = base.__class__(**{**base.__dict__, "I_work": float(I_work), "G_regen": float(G_regen)})
-        m = TiredSystemModel(p)
-        end = m.run()
-        rows.append({
-            "I_work": float(I_work),
-            "G_regen": float(G_regen),
-            "status": end.status,
-            "step": end.step,
-            "mean_coord": end.mean_coord,
-            "exit_share": end.exit_share,
-        })
+    if args.replicas > 1:
+        ensembles = run_replicated_end_states(params, args.replicas, **pool_opts)
+        for (I_work, G_regen), p, ends in zip(points, params, ensembles):
+            seeds = zip(replica_seeds(p, args.replicas), replica_topology_seeds(p, args.replicas))
+            for r, ((seed, topology_seed), end) in enumerate(zip(seeds, ends)):
+                rows.append({
+                    "I_work": I_work,
+                    "G_regen": G_regen,
+                    "replica": r,
+                    "seed": seed,
+                    "topology_seed": topology_seed,
+                    "status": end.status,
+                    "step": end.step,
+                    "mean_coord": end.mean_coord,
+                    "exit_share": end.exit_share,
+                })
+    else:
+        ends = run_end_states(params, **pool_opts)
+        for (I_work, G_regen), end in zip(points, ends):
+            rows.append(end_row(I_work, G_regen, end))
+
+    import pandas as pd
 
     df = pd.DataFrame(rows)
     csv_path = outdir / f"phase_{args.preset}_seed{args.seed}.csv"
     df.to_csv(csv_path, index=False)
     print(f"Saved: {csv_path}")
+    report_cache(cache)
+    report_profile(profiler, outdir / f"profile_{args.preset}_seed{args.seed}.json")
+    if args.no_plot:
+        return
 
     # prosta wizualizacja: status -> liczba
-    status_map = {"reform": 2, "running": 1, "max_steps": 1, "collapse": 0}
-    df["status_code"] = df["status"].map(status_map).fillna(1).astype(int)
+    df["status_code"] = df["status"].map(STATUS_MAP).fillna(1).astype(int)
 
-    pivot = df.pivot(index="G_regen", columns="I_work", values="status_code").sort_index(ascending=True)
+    # przy replikach: średni kod statusu w punkcie
+    pivot = df.pivot_table(index="G_regen", columns="I_work", values="status_code", aggfunc="mean").sort_index(ascending=True)
 
+    plt = pyplot(args)
     plt.figure()
     plt.imshow(pivot.values, aspect="auto", origin="lower")
     plt.title("Mapa reżimów (0=collapse, 1=dryf, 2=reform)")
@@ -80,7 +193,41 @@ def main():
     plt.ylabel("G_regen (wiersze)")
     plt.xticks(range(len(pivot.columns)), [f"{x:.2f}" for x in pivot.columns], rotation=90)
     plt.yticks(range(len(pivot.index)), [f"{y:.2f}" for y in pivot.index])
+    finish_figure(plt, args)
+
+
+def open_cache(args):
+    if not args.cache:
+        return None
+    from tired_system.cache import ResultCache
+
+    return ResultCache(args.cache, max_bytes=int(args.cache_max_mb * 2**20))
+
+
+def report_cache(cache) -> None:
+    if cache is not None:
+        print(f"Cache: {cache.hits} hit / {cache.misses} miss ({cache.path})")
+        cache.close()
+
+
+def report_profile(profiler, path: Path) -> None:
+    if profiler.enabled:
+        print(profiler.format_table())
+        print(f"Saved: {profiler.to_json(path)}")
+
+
+def pyplot(args):
+    # matplotlib dopiero przy rysowaniu (procesy robocze puli go nie importują); --savefig bez okna
+    import matplotlib
+
+    if args.savefig:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
 
+def finish_figure(plt, args) -> None:
     if args.savefig:
         plt.savefig(args.savefig, dpi=150, bbox_inches="tight")
     else:
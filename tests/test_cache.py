@@ -0,0 +1,71 @@
+import dataclasses
+import itertools
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from tired_system.cache import ResultCache
+from tired_system.core import TiredSystemCore
+from tired_system.params import ModelParams
+
+
+def run(seed):
+    p = ModelParams(n_vassals=150, n_lords=5, max_steps=25, seed=seed, TH_exit=1.01, TH_reform=1.01)
+    model = TiredSystemCore(p)
+    return p, model.run(), model.series
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # last_access rośnie o 1 przy każdym odczycie/zapisie — kolejność LRU bez remisów
+    monkeypatch.setattr("tired_system.cache.time", SimpleNamespace(time=itertools.count().__next__))
+
+
+def test_round_trip(tmp_path):
+    p, end, series = run(1)
+    with ResultCache(tmp_path / "cache.sqlite") as cache:
+        cache.put(p, end, series)
+    # nowe połączenie: wynik czytany z pliku
+    with ResultCache(tmp_path / "cache.sqlite") as cache:
+        assert cache.get(p) == end
+        got = cache.get_series(p)
+        assert got.to_frame().equals(series.to_frame())
+        for name in ("step", "status", "resolution_event", "values"):
+            assert np.array_equal(getattr(got, name)[:got.size], getattr(series, name)[:series.size])
+        assert cache.get(dataclasses.replace(p, seed=2)) is None
+        assert cache.get(dataclasses.replace(p, G_regen=p.G_regen + 0.1)) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_eviction(tmp_path, clock):
+    runs = {seed: run(seed) for seed in (1, 2, 3)}
+    with ResultCache(tmp_path / "cache.sqlite", max_bytes=None) as cache:
+        for p, end, series in runs.values():
+            cache.put(p, end, series)
+        total = cache.conn.execute("SELECT SUM(nbytes) FROM results").fetchone()[0]
+        cache.clear()
+
+        # limit o bajt mniejszy niż trzy wpisy: trzeci zapis usuwa dokładnie jeden, najdawniej używany
+        cache.max_bytes = total - 1
+        for seed in (1, 2):
+            p, end, series = runs[seed]
+            cache.put(p, end, series)
+        assert cache.get(runs[1][0]) == runs[1][1]
+        p, end, series = runs[3]
+        cache.put(p, end, series)
+        assert len(cache) == 2
+        assert cache.get(runs[2][0]) is None
+        assert cache.get(runs[1][0]) == runs[1][1]
+        assert cache.get_series(runs[3][0]) is not None
+
+
+def test_seed_none_bypasses_cache(tmp_path):
+    p, end, series = run(None)
+    with ResultCache(tmp_path / "cache.sqlite") as cache:
+        cache.put(p, end, series)
+        cache.put_many([p, p], [[end], [end]], variant="ensemble:2")
+        assert len(cache) == 0
+        assert cache.get(p) is None
+        assert cache.get_series(p) is None
+        assert cache.get_many([p], variant="ensemble:2") == [None]
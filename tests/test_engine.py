@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from tired_system import engine
+from tired_system.engine import VassalParams, VassalState
+from tired_system.metrics import clip01
+
+
+# parametry kroku: A_t, I_work, collective_regen, G_regen, visibility_weight,
+# regen_base, regen_work_penalty, overload_threshold, overload_scale
+STEP = (0.4, 0.7, 0.12, 0.5, 0.3, 0.18, 0.2, 0.9, 0.35)
+
+
+def scalar_step(v: dict, p: VassalParams, noise: float, A_t, I_work, collective_regen, G_regen,
+                visibility_weight, regen_base, regen_work_penalty, overload_threshold, overload_scale) -> None:
+    # dawny VassalAgent.update_core_states + update_loyalty_after_access (wasal po wasalu)
+    visibility_cost = visibility_weight * (0.6 * v["Loy"] + 0.4 * v["centrality"])
+    workload = v["base_workload"] + I_work * (0.5 + noise) + visibility_cost + 0.10 * v["access_received"]
+    workload = float(np.clip(workload, 0.0, 2.0))
+    v["workload_last"] = workload
+
+    private_rest = max(0.0, regen_base - regen_work_penalty * workload)
+    penalty = G_regen * 0.6 * private_rest
+    regen_i = max(0.0, private_rest - penalty)
+    v["regen_last"] = regen_i
+
+    v["E"] = clip01(v["E"] - p.alpha * workload + regen_i)
+    v["Sense"] = clip01(v["Sense"] - p.beta * workload)
+
+    v["Out"] = clip01(v["Out"] + p.gamma * A_t - p.delta * v["F"])
+    lack_access = 1.0 - float(np.clip(v["access_received"], 0.0, 1.0))
+    lack_exit = 1.0 - v["exit_option"]
+    risk_excl = clip01(0.25 * (1.0 - v["Loy"]) + 0.25 * lack_access + 0.20 * lack_exit)
+    v["Fear"] = clip01(v["Fear"] + p.eta * A_t + risk_excl)
+
+    overload = max(0.0, workload - overload_threshold)
+    v["F"] = clip01(v["F"] + p.kappa * (1.0 - v["E"]) + overload_scale * overload)
+    v["Coord"] = clip01(v["Coord"] - p.mu * v["F"] + p.nu * collective_regen)
+    v["performance"] = clip01(0.5 * (v["E"] + v["Sense"]) - 0.5 * v["F"])
+
+    if v["access_received"] > 0.0:
+        v["Loy"] = clip01(v["Loy"] + p.rho * 1.0 + p.sigma * v["Fear"] - p.tau * (1.0 - v["Sense"]))
+    else:
+        v["Loy"] = clip01(v["Loy"] + p.sigma * v["Fear"] - p.tau * (1.0 - v["Sense"]))
+    v["E"] = clip01(v["E"] - 0.05 * v["Loy"])
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_array_engine_matches_per_agent_updates(seed):
+    # kernele wektorowe (kroki 2–4, 5.4) == dawne aktualizacje skalarne, bit w bit
+    rng = np.random.default_rng(seed)
+    n = 500
+    p = VassalParams(*rng.uniform(0.0, 0.3, size=11))
+    s = VassalState(n)
+    for name, arr in s.arrays().items():
+        # także wartości na krańcach przedziału (clip)
+        arr[:] = rng.choice([0.0, 1.0], size=n) if rng.random() < 0.2 else rng.uniform(0.0, 1.0, size=n)
+    s.access_received[:] = rng.random(n) < 0.4
+    agents = [{name: float(arr[i]) for name, arr in s.arrays().items()} for i in range(n)]
+
+    for _ in range(5):
+        noise = rng.normal(0.0, 0.10, size=n)
+        engine.update_core_states(s, p, noise, *STEP)
+        engine.update_loyalty_after_access(s, p)
+        for i, v in enumerate(agents):
+            scalar_step(v, p, float(noise[i]), *STEP)
+        for name, arr in s.arrays().items():
+            assert np.array_equal(arr, [v[name] for v in agents]), name
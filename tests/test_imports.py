@@ -0,0 +1,27 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+HEADLESS = ("tired_system.params", "tired_system.presets", "tired_system.core", "tired_system.batch")
+HEAVY = ("mesa", "networkx", "pandas", "matplotlib")
+# luźny limit: import rdzenia trwa zwykle dziesiątki ms, wolne maszyny CI mają zapas
+MAX_IMPORT_S = 5.0
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+seconds = time.perf_counter() - t0
+print(json.dumps({{"seconds": seconds, "heavy": sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def test_headless_import_skips_heavy_modules():
+    code = PROBE.format(modules=HEADLESS, heavy=HEAVY)
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout)
+    assert result["heavy"] == []
+    assert result["seconds"] < MAX_IMPORT_S
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from tired_system.engine import LordGroups, select_by_lord
+
+
+def reference(groups: LordGroups, keys: np.ndarray, budget: np.ndarray) -> np.ndarray:
+    return np.sort(select_by_lord(groups.patron, keys, budget, groups.offsets))
+
+
+@pytest.mark.parametrize("n, n_lords", [(250, 12), (5000, 12), (4000, 192)])
+def test_select_matches_lexsort(n, n_lords):
+    rng = np.random.default_rng(n + n_lords)
+    groups = LordGroups(rng.integers(0, n_lords, size=n), n_lords)
+    for _ in range(5):
+        # zaokrąglone klucze: remisy na granicy top-k (wygrywa mniejszy indeks)
+        keys = np.round(rng.normal(size=n), 1)
+        alive = rng.random(n) > 0.2
+        keys[~alive] = -np.inf
+        active = np.bincount(groups.patron[alive], minlength=n_lords)
+        budget = np.minimum(rng.integers(0, 2 * n // n_lords, size=n_lords), active)
+        assert np.array_equal(np.sort(groups.select(keys, budget)), reference(groups, keys, budget))
+        # zmiany patrona przez indeks członków
+        idx = rng.choice(n, size=n // 20, replace=False)
+        new = (groups.patron[idx] + rng.integers(1, n_lords, size=idx.size)) % n_lords
+        groups.move(idx, new)
+        for j in range(n_lords):
+            assert np.array_equal(np.sort(groups.members(j)), np.flatnonzero(groups.patron == j))
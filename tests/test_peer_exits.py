@@ -0,0 +1,78 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from tired_system import network
+from tired_system.network import PeerCSR, PeerExits
+
+
+def graphs():
+    yield "ws", nx.watts_strogatz_graph(300, 6, 0.1, seed=1)
+    yield "ws_sparse", nx.watts_strogatz_graph(300, 2, 0.3, seed=2)
+    # rzadki graf losowy: drzewa i mosty — usunięcia często rozbijają składowe
+    yield "gnp", nx.gnp_random_graph(300, 1.3 / 300, seed=3)
+    yield "ring", nx.cycle_graph(300)
+
+
+def check(ex: PeerExits, g: nx.Graph) -> None:
+    alive = np.flatnonzero(ex.alive)
+    sub = g.subgraph(alive.tolist())
+    want = sorted((len(c) for c in nx.connected_components(sub)), reverse=True)
+    assert ex.giant() == (want[0] if want else 0)
+    # po giant() etykiety są aktualne: rozmiary wszystkich składowych, nie tylko największej
+    assert sorted(ex.sizes[ex.sizes > 0].tolist(), reverse=True) == want
+    assert np.array_equal(ex.degree[alive], [sub.degree(int(i)) for i in alive])
+    assert not ex.degree[~ex.alive].any()
+
+
+def remove_all(g: nx.Graph, batch: int, seed: int) -> PeerExits:
+    n = g.number_of_nodes()
+    ex = PeerExits(PeerCSR.from_graph(g, n))
+    check(ex, g)
+    order = np.random.default_rng(seed).permutation(n)
+    for start in range(0, n, batch):
+        ex.remove(order[start:start + batch])
+        check(ex, g)
+    return ex
+
+
+@pytest.mark.parametrize("batch", [1, 7, 40])
+@pytest.mark.parametrize("name,g", list(graphs()))
+def test_giant_matches_networkx(name, g, batch):
+    ex = remove_all(g, batch, seed=batch)
+    assert ex.removed == g.number_of_nodes()
+
+
+def test_budget_exhausted_rebuilds(monkeypatch):
+    # mały limit przeszukiwania: lokalne sprawdzenie zawodzi i etykiety są przebudowywane
+    monkeypatch.setattr(network, "_SEARCH_BUDGET", 3)
+    ex = remove_all(nx.watts_strogatz_graph(200, 4, 0.2, seed=5), batch=3, seed=0)
+    assert ex.rebuilds > 0
+
+
+def test_large_batch_rebuilds(monkeypatch):
+    monkeypatch.setattr(network, "_LOCAL_MAX", 4)
+    ex = remove_all(nx.watts_strogatz_graph(200, 4, 0.2, seed=6), batch=10, seed=1)
+    assert ex.rebuilds > 0
+
+
+def test_ring_split_found_without_budget():
+    # pierścień dłuższy niż limit przeszukiwania: pierwsze usunięcie nie rozbija składowej,
+    # drugie (daleko) już tak — oba przypadki muszą dać dokładny wynik
+    g = nx.cycle_graph(2000)
+    ex = PeerExits(PeerCSR.from_graph(g, 2000))
+    ex.remove(np.array([0]))
+    assert ex.giant() == 1999
+    ex.remove(np.array([1000]))
+    assert ex.giant() == 999
+    assert sorted(ex.sizes[ex.sizes > 0].tolist()) == [999, 999]
+
+
+def test_copy_is_independent():
+    g = nx.watts_strogatz_graph(100, 4, 0.1, seed=7)
+    ex = PeerExits(PeerCSR.from_graph(g, 100))
+    ex.remove(np.arange(10))
+    twin = ex.copy()
+    twin.remove(np.arange(10, 60))
+    check(ex, g)
+    check(twin, g)
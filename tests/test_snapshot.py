@@ -0,0 +1,64 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+from tired_system.model import TiredSystemModel
+from tired_system.params import ModelParams
+from tired_system.recording import AgentRecording
+from tired_system.snapshot import ModelSnapshot
+
+VARIANTS = {
+    "base": {"TH_exit": 1.01, "TH_reform": 1.01},
+    "exit_removal": {"exit_removal": True},
+    "patron_switching": {"patron_switching": True, "switch_loy": 0.6, "switch_prob": 0.2},
+}
+
+
+def check_same(model, ref) -> None:
+    assert model.get_model_df().equals(ref.get_model_df())
+    assert model.get_agent_df().equals(ref.get_agent_df())
+    assert model.get_lord_df().equals(ref.get_lord_df())
+    assert np.array_equal(model.state.data, ref.state.data)
+    assert np.array_equal(model.lord_groups.patron, ref.lord_groups.patron)
+
+
+@pytest.mark.parametrize("variant", list(VARIANTS))
+@pytest.mark.parametrize("rng_scheme", ["sequential", "counter"])
+def test_fork_and_restore_bit_identical(tmp_path, rng_scheme, variant):
+    p = ModelParams(n_vassals=300, n_lords=6, max_steps=60, seed=3, rng_scheme=rng_scheme, **VARIANTS[variant])
+    recording = AgentRecording(stride=3, lords=True)
+    ref = TiredSystemModel(p, agent_recording=recording)
+    ref_end = ref.run()
+    if variant == "exit_removal":
+        assert ref._exited.size > 0
+    if variant == "patron_switching":
+        assert ref.lord_groups.moves > 0
+
+    model = TiredSystemModel(p, agent_recording=recording)
+    for _ in range(ref_end.step // 2):
+        model.step()
+    snap = ModelSnapshot.load(model.snapshot().save(tmp_path / "snap.pkl"))
+
+    fork = model.fork()
+    assert fork.run() == ref_end
+    check_same(fork, ref)
+
+    # przebieg dalej, potem powrót do snapshotu (restore w tym samym modelu)
+    for _ in range(5):
+        model.step()
+    model.restore(snap)
+    assert model.run() == ref_end
+    check_same(model, ref)
+
+    # snapshot wczytany z pliku do nowego modelu, dwa razy z rzędu
+    for _ in range(2):
+        restored = TiredSystemModel.from_snapshot(snap)
+        assert restored.run() == ref_end
+        check_same(restored, ref)
+
+    # gałąź z innymi parametrami dynamiki: ta sama historia do snapshotu, potem inna
+    branch = TiredSystemModel.from_snapshot(snap, params=dataclasses.replace(p, A_affect=p.A_affect + 0.2))
+    branch.run()
+    assert branch.get_model_df().loc[:snap.step_count].equals(ref.get_model_df().loc[:snap.step_count])
+    assert not branch.get_model_df().equals(ref.get_model_df())
@@ -0,0 +1,53 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+pd = pytest.importorskip("pandas")
+
+from tired_system.streaming import read_partial
+
+ROOT = Path(__file__).resolve().parents[1]
+# progi końcowe poza zasięgiem: 30 kroków, chunki po 7 (ostatni niepełny), agenci co 2 kroki
+RUN = [
+    "--n_vassals", "200", "--n_lords", "6", "--steps", "30", "--seed", "3", "--TH_exit", "1.01", "--TH_reform", "1.01",
+    "--agent_stride", "2", "--record_lords", "--chunk_steps", "7",
+]
+
+
+def run_cli(outdir: Path, *extra: str) -> None:
+    subprocess.run([sys.executable, "run.py", *RUN, *extra, "--outdir", str(outdir)], cwd=ROOT, check=True,
+                   capture_output=True)
+
+
+def read_csv(path: Path, index) -> "pd.DataFrame":
+    return pd.read_csv(path, index_col=index, float_precision="round_trip")
+
+
+@pytest.mark.parametrize("fmt, suffix", [("parquet", ".parquet"), ("arrow", ".arrows")])
+def test_streamed_output_matches_csv(tmp_path, fmt, suffix):
+    run_cli(tmp_path / "csv")
+    run_cli(tmp_path / fmt, "--format", fmt)
+    stem = "dryf_seed3"
+
+    csv_model = read_csv(tmp_path / "csv" / f"model_{stem}.csv", 0)
+    model = read_partial(tmp_path / fmt / f"model_{stem}{suffix}").set_index("Step")
+    assert len(csv_model) == 31
+    assert list(model.index) == list(csv_model.index)
+    assert list(model.columns) == list(csv_model.columns)
+    assert list(model["status"]) == list(csv_model["status"])
+    assert list(model["resolution_event"]) == list(csv_model["resolution_event"])
+    # szeregi modelu float64: bit w bit
+    numeric = csv_model.columns.drop(["status", "resolution_event"])
+    assert np.array_equal(model[numeric].to_numpy(), csv_model[numeric].to_numpy())
+
+    # agenci i lordzy: float32 (CSV zapisuje wartości float32, odczyt zaokrąglamy z powrotem)
+    for name, key in (("agents", "vassal"), ("lords", "lord")):
+        csv_df = read_csv(tmp_path / "csv" / f"{name}_{stem}.csv", [0, 1])
+        df = read_partial(tmp_path / fmt / f"{name}_{stem}{suffix}").set_index(["Step", key])
+        assert df.index.equals(csv_df.index)
+        assert list(df.columns) == list(csv_df.columns)
+        assert np.array_equal(df.to_numpy(), csv_df.to_numpy().astype(np.float32)), name
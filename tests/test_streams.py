@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from tired_system.ensemble import EnsembleModel
+from tired_system.model import TiredSystemModel
+from tired_system.params import ModelParams
+from tired_system.recording import CollectionPolicy
+from tired_system.sharded import ShardedModel
+from tired_system.streams import CounterStreams
+
+# nierówne fragmenty zakresu [0, 1000), liczone od końca
+CUTS = [0, 1, 333, 334, 999, 1000]
+
+
+@pytest.mark.parametrize("draw", [
+    lambda st, step, n, start: st.normal_array("noise", step, n, 0.0, 0.1, start=start),
+    lambda st, step, n, start: st.gumbel_array("gumbel", step, n, start=start),
+    lambda st, step, n, start: st.random_array("switch", step, n, k=2, start=start),
+    lambda st, step, n, start: st.random_array("switch", step, n, k=6, start=start),
+], ids=["normal", "gumbel", "random_k2", "random_k6"])
+def test_counter_draws_independent_of_order_and_chunks(draw):
+    whole = draw(CounterStreams(7), 3, 1000, 0)
+    # osobna instancja po innych losowaniach: brak stanu między wywołaniami
+    st = CounterStreams(7)
+    st.normal_array("noise", 4, 50)
+    st.random_array("switch", 2, 10, k=3)
+    parts = [draw(st, 3, b - a, a) for a, b in reversed(list(zip(CUTS, CUTS[1:])))]
+    assert np.array_equal(np.concatenate(parts[::-1]), whole)
+    assert not np.array_equal(draw(st, 4, 1000, 0), whole)
+    assert not np.array_equal(draw(CounterStreams(8), 3, 1000, 0), whole)
+
+
+def test_counter_random_at_matches_rows():
+    st = CounterStreams(7)
+    idx = np.random.default_rng(0).permutation(1000)[:97]
+    for k in (1, 2, 5):
+        assert np.array_equal(st.random_at("switch", 9, idx, k), st.random_array("switch", 9, 1000, k)[idx])
+
+
+@pytest.mark.parametrize("rng_scheme", ["sequential", "counter"])
+def test_ensemble_replica_matches_single_run(rng_scheme):
+    # replika w środku zespołu (seed == topology_seed) odtwarza pojedynczy przebieg
+    p = ModelParams(n_vassals=300, n_lords=6, max_steps=30, seed=5, rng_scheme=rng_scheme)
+    ref = TiredSystemModel(p)
+    ref_end = ref.run()
+    ens = EnsembleModel(p, seeds=[9, 5, 7], topology_seed=5)
+    ends = ens.run()
+    assert ends[1] == ref_end
+    assert ens.series[1].to_frame().equals(ref.get_model_df())
+    assert np.array_equal(ens.state.data[:, 1], ref.state.data)
+    assert ends[0] != ref_end
+
+
+@pytest.mark.parametrize("workers", [2, 4])
+def test_counter_sharding_independent_of_worker_count(workers):
+    # licznikowy: szum, Gumbel i kandydaci zmiany patrona losowani w procesach roboczych, po fragmentach
+    p = ModelParams(
+        n_vassals=500, n_lords=7, max_steps=40, seed=13, rng_scheme="counter",
+        patron_switching=True, switch_loy=0.6, switch_prob=0.2,
+    )
+    collection = CollectionPolicy("summary")
+    ref = TiredSystemModel(p, collection=collection)
+    ref_end = ref.run()
+    with ShardedModel(p, workers=workers, collection=collection) as sharded:
+        assert sharded.workers == workers
+        end = sharded.run()
+        state = sharded.state.data.copy()
+        patron = sharded.lord_groups.patron.copy()
+    assert end == ref_end
+    assert sharded.get_model_df().equals(ref.get_model_df())
+    assert np.array_equal(state, ref.state.data)
+    assert np.array_equal(patron, ref.lord_groups.patron)
+    assert ref.lord_groups.moves > 0
@@ -1,2 +1,16 @@
-from .model import TiredSystemModel
 from .presets import PRESETS
+
+__all__ = ["TiredSystemModel", "TiredSystemCore", "PRESETS"]
+
+
+def __getattr__(name):
+    # leniwy import: `from tired_system import PRESETS` nie ładuje Mesy ani networkx
+    if name == "TiredSystemModel":
+        from .model import TiredSystemModel
+
+        return TiredSystemModel
+    if name == "TiredSystemCore":
+        from .core import TiredSystemCore
+
+        return TiredSystemCore
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+import numpy as np
+
+Point = Tuple[int, int]
+Cell = Tuple[int, int, int]  # (i0, j0, h): róg i długość boku w jednostkach siatki najdrobniejszej
+
+
+@dataclass
+class AdaptiveGrid:
+    """
+    Wynik adaptacyjnego przeglądu 2D na siatce całkowitej 0..size × 0..size
+    (size = (base - 1) * 2**max_depth, czyli najdrobniejsza siatka jednorodna).
+    values: wyniki w policzonych punktach; leaves: komórki końcowe (jednorodne albo na max_depth).
+    """
+    size: int
+    values: Dict[Point, Any] = field(default_factory=dict)
+    leaves: List[Cell] = field(default_factory=list)
+
+    def raster(self, code: Callable[[Any], float]) -> np.ndarray:
+        """
+        Mapa (size + 1, size + 1) indeksowana [j, i]: komórki jednorodne wypełnione wartością
+        narożników, punkty policzone — własną wartością.
+        """
+        img = np.full((self.size + 1, self.size + 1), np.nan)
+        for i0, j0, h in self.leaves:
+            corners = [code(self.values[pt]) for pt in _corners(i0, j0, h)]
+            if all(c == corners[0] for c in corners):
+                img[j0:j0 + h + 1, i0:i0 + h + 1] = corners[0]
+        for (i, j), value in self.values.items():
+            img[j, i] = code(value)
+        return img
+
+
+def _corners(i0: int, j0: int, h: int) -> List[Point]:
+    return [(i0, j0), (i0 + h, j0), (i0, j0 + h), (i0 + h, j0 + h)]
+
+
+def refine_grid(
+    evaluate: Callable[[Sequence[Point]], Sequence[Any]],
+    base: int,
+    max_depth: int,
+    key: Callable[[Any], Any] = lambda r: r.status,
+) -> AdaptiveGrid:
+    """
+    Start z siatki base × base; komórka jest dzielona na 4, gdy `key` różni się w jej narożnikach,
+    aż do max_depth podziałów. `evaluate` dostaje całą nową warstwę punktów naraz (partia dla puli
+    procesów) i zwraca wyniki w tej samej kolejności.
+    """
+    if base < 2:
+        raise ValueError("base musi być >= 2")
+    h = 2 ** max_depth
+    grid = AdaptiveGrid(size=(base - 1) * h)
+    cells = [(a * h, b * h, h) for a in range(base - 1) for b in range(base - 1)]
+
+    while cells:
+        todo = sorted({pt for c in cells for pt in _corners(*c) if pt not in grid.values})
+        if todo:
+            grid.values.update(zip(todo, evaluate(todo)))
+
+        next_cells = []
+        for i0, j0, h in cells:
+            keys = {key(grid.values[pt]) for pt in _corners(i0, j0, h)}
+            if len(keys) > 1 and h > 1:
+                half = h // 2
+                next_cells += [
+                    (i0, j0, half), (i0 + half, j0, half),
+                    (i0, j0 + half, half), (i0 + half, j0 + half, half),
+                ]
+            else:
+                grid.leaves.append((i0, j0, h))
+        cells = next_cells
+
+    return grid
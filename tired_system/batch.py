@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .cache import ResultCache
+from .metrics import EndState
+from .core import TiredSystemCore
+from .params import ModelParams
+from .ensemble import EnsembleModel
+from .profiling import PhaseProfiler
+from .recording import NO_COLLECTION
+
+
+def run_end_state(params: ModelParams, profiler: Optional[PhaseProfiler] = None) -> EndState:
+    """Jeden pełny przebieg; zwraca tylko EndState (bez zbierania szeregów — pamięć O(1) względem kroków)."""
+    return TiredSystemCore(params, profiler=profiler, collection=NO_COLLECTION).run()
+
+
+def replica_seeds(params: ModelParams, replicas: int) -> List[Optional[int]]:
+    """Seedy replik punktu: seed, seed+1, ... (seed=None — każda replika losowa)."""
+    if params.seed is None:
+        return [None] * replicas
+    return [params.seed + r for r in range(replicas)]
+
+
+def replica_topology_seeds(params: ModelParams, replicas: int) -> List[Optional[int]]:
+    """
+    Seed topologii peer każdej repliki: zespół — wspólna sieć z params.seed; exit_removal, patron_switching
+    (repliki liczone pojedynczo) — sieć z seeda repliki. Replikę odtwarza
+    EnsembleModel(params, seeds=[seed], topology_seed=topology_seed), a przy seed == topology_seed
+    (zawsze z exit_removal, patron_switching) — pojedynczy przebieg z tym seedem.
+    """
+    if params.exit_removal or params.patron_switching:
+        return replica_seeds(params, replicas)
+    return [params.seed] * replicas
+
+
+def run_replica_end_states(
+    params: ModelParams, replicas: int, profiler: Optional[PhaseProfiler] = None
+) -> List[EndState]:
+    """
+    R replik jednego punktu jako zespół (wspólna topologia z params.seed).
+    exit_removal, patron_switching: repliki liczone pojedynczo, każda z topologią z własnego seeda
+    (zespół ma statyczną sieć i patronat) — zob. replica_topology_seeds.
+    """
+    if params.exit_removal or params.patron_switching:
+        return [
+            run_end_state(params.__class__(**{**params.__dict__, "seed": seed}), profiler=profiler)
+            for seed in replica_seeds(params, replicas)
+        ]
+    return EnsembleModel(
+        params, seeds=replica_seeds(params, replicas), profiler=profiler, collection=NO_COLLECTION
+    ).run()
+
+
+def _with_profile(fn: Callable, track_memory: bool, params: ModelParams) -> Tuple[object, Dict]:
+    # profiler tworzony w procesie roboczym; do rodzica wracają tylko statystyki
+    prof = PhaseProfiler(track_memory=track_memory)
+    return fn(params, profiler=prof), prof.stats()
+
+
+def _apply_chunk(fn: Callable, chunk: Sequence) -> list:
+    return [fn(item) for item in chunk]
+
+
+class Progress:
+    """Prosty licznik postępu na stderr (bez zależności)."""
+
+    def __init__(self, total: int, label: str = "runs", enabled: bool = True):
+        self.total = total
+        self.done = 0
+        self.label = label
+        self.enabled = enabled and total > 0
+
+    def update(self, n: int = 1) -> None:
+        self.done += n
+        if self.enabled:
+            pct = 100.0 * self.done / self.total
+            sys.stderr.write(f"\r[{self.label}] {self.done}/{self.total} ({pct:.0f}%)")
+            if self.done >= self.total:
+                sys.stderr.write("\n")
+            sys.stderr.flush()
+
+
+def map_chunked(
+    fn: Callable,
+    items: Sequence,
+    workers: int = 1,
+    chunksize: Optional[int] = None,
+    progress: bool = False,
+    label: str = "runs",
+) -> list:
+    """
+    fn(item) dla każdego elementu, wyniki w kolejności wejścia.
+    workers > 1: pula procesów, zadania w chunkach po `chunksize` elementów; wynik jest
+    identyczny z wykonaniem szeregowym (każdy przebieg zależy tylko od swoich ModelParams).
+    fn musi dać się zapiklować (funkcja modułu albo functools.partial).
+    """
+    items = list(items)
+    bar = Progress(len(items), label=label, enabled=progress)
+
+    if workers <= 1 or len(items) <= 1:
+        out = []
+        for item in items:
+            out.append(fn(item))
+            bar.update()
+        return out
+
+    if chunksize is None:
+        chunksize = max(1, len(items) // (workers * 4))
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+    results: List[Optional[list]] = [None] * len(chunks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_apply_chunk, fn, chunk): i for i, chunk in enumerate(chunks)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            results[i] = fut.result()
+            bar.update(len(chunks[i]))
+
+    return [res for chunk in results for res in chunk]
+
+
+def _map_profiled(fn: Callable, params_list: Sequence[ModelParams], profiler, **kwargs) -> list:
+    """map_chunked; z włączonym profilerem statystyki etapów z każdego przebiegu trafiają do `profiler`."""
+    if profiler is None or not profiler.enabled:
+        return map_chunked(fn, params_list, **kwargs)
+    pairs = map_chunked(partial(_with_profile, fn, profiler.track_memory), params_list, **kwargs)
+    for _, stats in pairs:
+        profiler.merge(stats)
+    return [res for res, _ in pairs]
+
+
+def _run_many(fn: Callable, params_list: Sequence[ModelParams], cache, variant: str, wrap: bool, profiler, **kwargs) -> list:
+    """Przebiegi tylko dla konfiguracji spoza cache (jeśli podany; seed=None — zawsze liczone); nowe wyniki trafiają do cache."""
+    if cache is None:
+        return _map_profiled(fn, params_list, profiler, **kwargs)
+    params_list = list(params_list)
+    cached = cache.get_many(params_list, variant=variant)
+    todo = [i for i, ends in enumerate(cached) if ends is None]
+    fresh = _map_profiled(fn, [params_list[i] for i in todo], profiler, **kwargs)
+    cache.put_many([params_list[i] for i in todo], [[r] if wrap else r for r in fresh], variant=variant)
+
+    out = [ends[0] if wrap and ends else ends for ends in cached]
+    for i, res in zip(todo, fresh):
+        out[i] = res
+    return out
+
+
+def run_end_states(
+    params_list: Sequence[ModelParams],
+    cache: Optional[ResultCache] = None,
+    profiler: Optional[PhaseProfiler] = None,
+    **kwargs,
+) -> List[EndState]:
+    """
+    Pojedyncze przebiegi listy konfiguracji (opcje jak map_chunked).
+    cache: ResultCache — liczone są tylko konfiguracje bez wpisu.
+    profiler: PhaseProfiler — zbiorcze statystyki etapów ze wszystkich liczonych przebiegów.
+    """
+    return _run_many(run_end_state, params_list, cache, "", True, profiler, **kwargs)
+
+
+def run_replicated_end_states(
+    params_list: Sequence[ModelParams],
+    replicas: int,
+    cache: Optional[ResultCache] = None,
+    profiler: Optional[PhaseProfiler] = None,
+    **kwargs,
+) -> List[List[EndState]]:
+    """Dla każdej konfiguracji lista EndState jej `replicas` replik (opcje jak map_chunked, cache i profiler jak wyżej)."""
+    fn = partial(run_replica_end_states, replicas=replicas)
+    return _run_many(fn, params_list, cache, f"ensemble:{replicas}", False, profiler, **kwargs)
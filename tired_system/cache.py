@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import sqlite3
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+from .metrics import EndState
+from .params import ModelParams
+from .recording import MODEL_COLUMNS, ModelSeries
+
+# wersja kodu modelu: podbić przy każdej zmianie dynamiki/losowań — stare wpisy przestają pasować
+MODEL_VERSION = "2"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    end_state TEXT NOT NULL,
+    series BLOB,
+    nbytes INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_lru ON results (last_access);
+"""
+
+
+def params_key(params: ModelParams, variant: str = "") -> str:
+    """
+    Stabilny klucz wyniku: sha256 z kanonicznego JSON-a ModelParams (posortowane pola, repr float)
+    + MODEL_VERSION + wariant przebiegu (np. "ensemble:16" dla zespołu replik).
+    """
+    payload = {"version": MODEL_VERSION, "variant": variant, "params": asdict(params)}
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cacheable(params: ModelParams) -> bool:
+    """Wynik zależy tylko od params, gdy seed jest ustalony; seed=None — przebieg losowy, bez cache."""
+    return params.seed is not None
+
+
+def _pack_series(series: ModelSeries) -> bytes:
+    n = series.size
+    buf = io.BytesIO()
+    np.savez_compressed(
+        buf,
+        step=series.step[:n],
+        status=series.status[:n],
+        resolution_event=series.resolution_event[:n],
+        values=series.values[:n],
+    )
+    return buf.getvalue()
+
+
+def _unpack_series(blob: bytes) -> ModelSeries:
+    with np.load(io.BytesIO(blob)) as z:
+        values = z["values"]
+        if values.shape[1] != len(MODEL_COLUMNS):
+            raise ValueError("Niezgodny układ kolumn szeregów w cache")
+        series = ModelSeries(capacity=len(values))
+        n = len(values)
+        series.step[:n] = z["step"]
+        series.status[:n] = z["status"]
+        series.resolution_event[:n] = z["resolution_event"]
+        series.values[:n] = values
+        series.size = n
+    return series
+
+
+def _dump_ends(ends: Sequence[EndState]) -> str:
+    return json.dumps([asdict(e) for e in ends])
+
+
+def _load_ends(text: str) -> List[EndState]:
+    return [EndState(**e) for e in json.loads(text)]
+
+
+class ResultCache:
+    """
+    Trwały cache wyników w pliku SQLite: klucz = params_key(...), wartość = EndState
+    (albo lista EndState zespołu) i opcjonalnie skompresowane szeregi modelu.
+
+    Rozmiar ograniczony przez max_bytes (suma rozmiarów wpisów): po zapisie usuwane są wpisy
+    najdawniej używane (LRU po last_access). Tryb WAL + busy timeout — kilka procesów może
+    czytać i zapisywać ten sam plik równocześnie. Połączenie otwierane leniwie, per proces.
+    """
+
+    def __init__(self, path, max_bytes: Optional[int] = 1 << 30, timeout: float = 60.0):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __getstate__(self) -> Dict:
+        # połączenie nie przechodzi do innych procesów — otworzy się tam od nowa
+        return {**self.__dict__, "_conn": None}
+
+    def __len__(self) -> int:
+        return int(self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0])
+
+    # --- odczyt ---
+    def _lookup(self, keys: Sequence[str], column: str) -> Dict[str, object]:
+        found: Dict[str, object] = {}
+        unique = list(dict.fromkeys(keys))
+        # SQLite ogranicza liczbę parametrów zapytania — pytamy partiami
+        for i in range(0, len(unique), 500):
+            part = unique[i:i + 500]
+            marks = ",".join("?" * len(part))
+            rows = self.conn.execute(f"SELECT key, {column} FROM results WHERE key IN ({marks})", part)
+            found.update((key, value) for key, value in rows if value is not None)
+        if found:
+            now = time.time()
+            self.conn.executemany("UPDATE results SET last_access = ? WHERE key = ?", [(now, k) for k in found])
+        return found
+
+    def get_many(self, params_list: Sequence[ModelParams], variant: str = "") -> List[Optional[List[EndState]]]:
+        """Dla każdej konfiguracji lista EndState z cache albo None (brak wpisu albo seed=None)."""
+        keys = [params_key(p, variant) if cacheable(p) else None for p in params_list]
+        found = self._lookup([k for k in keys if k is not None], "end_state")
+        out = [_load_ends(found[k]) if k in found else None for k in keys]
+        hits = sum(o is not None for o in out)
+        self.hits += hits
+        self.misses += len(out) - hits
+        return out
+
+    def get(self, params: ModelParams) -> Optional[EndState]:
+        ends = self.get_many([params])[0]
+        return ends[0] if ends else None
+
+    def get_series(self, params: ModelParams) -> Optional[ModelSeries]:
+        """Szeregi modelu pojedynczego przebiegu (None, jeśli nie były zapisane)."""
+        if not cacheable(params):
+            return None
+        key = params_key(params)
+        blob = self._lookup([key], "series").get(key)
+        return _unpack_series(blob) if blob is not None else None
+
+    # --- zapis ---
+    def put_many(
+        self,
+        params_list: Sequence[ModelParams],
+        results: Sequence[Sequence[EndState]],
+        variant: str = "",
+        series: Optional[Sequence[Optional[ModelSeries]]] = None,
+    ) -> None:
+        now = time.time()
+        rows = []
+        for i, (p, ends) in enumerate(zip(params_list, results)):
+            if not cacheable(p):
+                # seed=None: inny wynik przy każdym przebiegu — nie zapisujemy
+                continue
+            text = _dump_ends(ends)
+            blob = _pack_series(series[i]) if series is not None and series[i] is not None else None
+            nbytes = len(text) + (len(blob) if blob is not None else 0)
+            rows.append((params_key(p, variant), text, blob, nbytes, now))
+        if not rows:
+            return
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO results (key, end_state, series, nbytes, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def put(self, params: ModelParams, end_state: EndState, series: Optional[ModelSeries] = None) -> None:
+        self.put_many([params], [[end_state]], series=[series])
+
+    def _evict(self) -> None:
+        if self.max_bytes is None:
+            return
+        total = self.conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed, victims = 0, []
+        for key, nbytes in self.conn.execute("SELECT key, nbytes FROM results ORDER BY last_access"):
+            victims.append((key,))
+            freed += nbytes
+            if freed >= excess:
+                break
+        self.conn.executemany("DELETE FROM results WHERE key = ?", victims)
+
+    def clear(self) -> None:
+        self.conn.execute("DELETE FROM results")
@@ -0,0 +1,568 @@
+from __future__ import annotations
+
+from typing import Dict, List, Tuple, Optional
+import numpy as np
+
+from .engine import (
+    VassalParams,
+    VassalState,
+    LordState,
+    LordGroups,
+    draw_initial_state,
+    access_budget,
+    allocate_access,
+    update_core_states,
+    update_loyalty_after_access,
+    switch_candidates,
+)
+from .network import (
+    PeerCSR,
+    PeerExits,
+    build_peer_csr,
+    giant_component_size,
+    vassal_degree_centrality,
+    watts_strogatz_csr,
+)
+from .params import ModelParams
+from .metrics import logistic, summarize_vassals, EndState
+from .recording import ModelSeries, AgentRecording, AgentRecorder, CollectionPolicy, FULL_COLLECTION
+from .snapshot import ModelSnapshot
+from .streams import make_streams
+from .profiling import NULL_PROFILER, PhaseProfiler
+
+
+class TiredSystemCore:
+    """
+    Rdzeń modelu „System zmęczony” bez Mesy, networkx i pandas (import w milisekundach):
+    cała dynamika, szeregi modelu, zapis kolumnowy agentów i snapshoty. Sieć peer jest od razu CSR
+    (ta sama kolejność sąsiadów co graf networkx), więc przebiegi są bit-identyczne z TiredSystemModel.
+    Do przebiegów wsadowych (batch, sweep); TiredSystemModel dodaje agentów Mesy, DataCollector i peer_graph.
+
+    agent_recording: None = bez danych agentów; AgentRecording = kolumnowy zapis wasali (float32).
+    buffer_steps: pojemność buforów szeregów (w krokach symulacji); None = cały przebieg.
+    profiler: PhaseProfiler — czas (i opcjonalnie alokacje) per etap kroku; None = wyłączony.
+    compact: stan float32 i sieć z watts_strogatz_csr (sąsiedzi posortowani) — tryb dużej skali.
+    collection: CollectionPolicy — co zbierać (None = pełne szeregi co krok; NO_COLLECTION = tylko EndState).
+    """
+
+    def __init__(
+        self,
+        params: ModelParams,
+        agent_recording: Optional[AgentRecording] = None,
+        buffer_steps: Optional[int] = None,
+        profiler: Optional[PhaseProfiler] = None,
+        compact: bool = False,
+        collection: Optional[CollectionPolicy] = None,
+    ):
+        self.collection = collection if collection is not None else FULL_COLLECTION
+        if agent_recording is not None and not self.collection.agents:
+            raise ValueError(f"agent_recording wymaga pełnego zbierania (collection mode={self.collection.mode!r})")
+        self.p = params
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        if self.profiler.enabled:
+            self.profiler.runs += 1
+        self.rng = np.random.default_rng(params.seed)
+        self.streams = make_streams(params.rng_scheme, params.seed, self.rng)
+        self.compact = compact
+        dtype = np.float32 if compact else np.float64
+
+        self.step_count = 0
+        self.running = True
+        self.status = "running"  # running | reform | collapse | max_steps
+        self.resolution_event_last = False
+
+        # sieci
+        self.peer_graph = None
+        self._peer_csr: Optional[PeerCSR] = None
+        self._peer_csr_version = -1
+        self._cohesion = 0.0
+        self._cohesion_version = -1
+        self.exits: Optional[PeerExits] = None
+        self._init_topology()
+        self._full_graph = None
+        self._full_graph_key: Optional[Tuple[int, ...]] = None
+        # wersja patronatu: rośnie przy każdej zmianie (switch, wyjście, restore) — klucz full_graph
+        self._patronage_version = 0
+
+        # agenci: stan w tablicach (struct-of-arrays)
+        self.state = VassalState(params.n_vassals, dtype=dtype)
+        self.lord_state = LordState(params.n_lords, dtype=dtype)
+        self.vassals: List = []
+        self.lords: List = []
+
+        self._init_agents()
+
+        # centralności (używane w workload i selekcji access): z tablic stopni, bez budowania full_graph
+        self.state.centrality[:] = vassal_degree_centrality(self.peer_csr.degree, params.n_lords)
+
+        # wyjście z sieci (exit_removal): wasale, którzy odeszli, i ich zamrożony stan
+        self._exited = np.zeros(0, dtype=np.intp)
+        self._exit_frozen = np.zeros((self.state.data.shape[0], 0), dtype=dtype)
+        if params.exit_removal:
+            self.exits = PeerExits(self.peer_csr)
+
+        # szeregi modelu: kolumnowy bufor (t=0 + max_steps kroków); agregaty liczone raz na krok
+        horizon = buffer_steps if buffer_steps is not None else params.max_steps
+        self.series = ModelSeries(capacity=self.collection.capacity(horizon))
+        self._summary: Dict[str, float] = {}
+        self._summary_step = -1
+
+        self._init_recording(agent_recording, horizon)
+
+        # inicjalne wartości „globalne”
+        self._A_t = 0.0
+        self._collective_regen = 0.0
+        self._conflict_intensity = 0.0
+        self._resolution_potential = 0.0
+
+        # zbierz t=0
+        self._aggregate(full=self.collection.collects(0, final=False))
+        self._collect()
+
+    def _init_topology(self) -> None:
+        # topologia statyczna: CSR i spójność liczone raz
+        p = self.p
+        build = watts_strogatz_csr if self.compact else build_peer_csr
+        self._peer_csr = build(p.n_vassals, p.peer_k, p.peer_rewire_p, seed=p.seed)
+        self._cohesion = float(np.clip(giant_component_size(self._peer_csr) / max(1, p.n_vassals), 0.0, 1.0))
+        self._peer_csr_version = self._cohesion_version = 0
+
+    def _init_recording(self, agent_recording: Optional[AgentRecording], horizon: int) -> None:
+        self.agent_recorder: Optional[AgentRecorder] = None
+        if agent_recording is not None:
+            self.agent_recorder = AgentRecorder(agent_recording, self.p.n_vassals, self.p.n_lords, horizon)
+
+    # --- struktury pochodne sieci peer (ważne do następnej zmiany topologii) ---
+    def _topology_version(self) -> int:
+        return 0
+
+    def _refresh_topology_cache(self) -> None:
+        return
+
+    @property
+    def peer_csr(self) -> PeerCSR:
+        self._refresh_topology_cache()
+        return self._peer_csr
+
+    @property
+    def cohesion(self) -> float:
+        self._refresh_topology_cache()
+        if self.exits is not None:
+            # największa składowa obecnych wasali (utrzymywana przyrostowo)
+            return float(np.clip(self.exits.giant() / max(1, self.p.n_vassals), 0.0, 1.0))
+        return self._cohesion
+
+    def _init_agents(self) -> None:
+        # stan początkowy i patronaż losowane partiami (indeksy całkowite: wasal i = V{i}, lord j = L{j})
+        patron = draw_initial_state(self.streams, self.state, self.lord_state)
+        self.lord_groups = LordGroups(patron, self.p.n_lords)
+
+        self._vp = VassalParams(
+            alpha=self.p.alpha, beta=self.p.beta, kappa=self.p.kappa,
+            gamma=self.p.gamma, delta=self.p.delta, eta=self.p.eta,
+            mu=self.p.mu, nu=self.p.nu,
+            rho=self.p.rho, sigma=self.p.sigma, tau=self.p.tau
+        )
+
+    # --- widoki grafowe (budowane leniwie, tylko na żądanie) ---
+    @property
+    def patron_map(self) -> Dict[str, str]:
+        """vassal_node -> lord_node (np. "V3" -> "L1"); bez wasali, którzy odeszli."""
+        return {f"V{i}": f"L{j}" for i, j in self._patronage()}
+
+    def _patronage(self):
+        patron = self.lord_groups.patron
+        if self.exits is None:
+            return enumerate(patron.tolist())
+        members = np.flatnonzero(self.exits.alive)
+        return zip(members.tolist(), patron[members].tolist())
+
+    @property
+    def full_graph(self):
+        """
+        nx.Graph węzłów "L{j}" / "V{i}" z krawędziami peer i patronage (kind=...). Budowany przy pierwszym
+        odwołaniu i przebudowywany po zmianie topologii peer albo patronatu (wymaga networkx).
+        """
+        import networkx as nx
+
+        key = (self._topology_version(), self._patronage_version)
+        if self._full_graph is None or self._full_graph_key != key:
+            g = nx.Graph()
+            g.add_nodes_from(f"L{j}" for j in range(self.p.n_lords))
+            g.add_nodes_from(f"V{i}" for i in range(self.p.n_vassals))
+            g.add_edges_from((f"V{u}", f"V{v}", {"kind": "peer"}) for u, v in self._peer_edges())
+            g.add_edges_from((f"V{i}", f"L{j}", {"kind": "patronage"}) for i, j in self._patronage())
+            self._full_graph, self._full_graph_key = g, key
+        return self._full_graph
+
+    def _peer_edges(self):
+        csr = self.exits.active_csr() if self.exits is not None else self.peer_csr
+        rows = np.repeat(np.arange(csr.n), csr.degree)
+        upper = rows < csr.indices
+        return zip(rows[upper].tolist(), csr.indices[upper].tolist())
+
+    @property
+    def centrality(self) -> Dict[str, float]:
+        """Degree centrality węzłów full_graph (jak nx.degree_centrality), liczona z tablic stopni."""
+        n_nodes = self.p.n_vassals + self.p.n_lords
+        scale = 1.0 / (n_nodes - 1.0) if n_nodes > 1 else 1.0
+        lord_degree = self.lord_groups.active
+        out = {f"L{j}": float(d * scale) if n_nodes > 1 else 1.0 for j, d in enumerate(lord_degree.tolist())}
+        out.update((f"V{i}", float(c)) for i, c in enumerate(self.state.centrality.tolist()))
+        return out
+
+    # --- pomocnicze agregaty ---
+    def _mean(self, attr: str) -> float:
+        return float(np.mean(getattr(self.state, attr)))
+
+    def _exit_share(self) -> float:
+        s = self.state
+        bad = int(np.count_nonzero((s.E < self.p.e_min) & (s.Sense < self.p.s_min)))
+        return float(bad / max(1, s.n))
+
+    def _aggregate(self, full: bool = True) -> Dict[str, float]:
+        """
+        Etap agregatów: wszystkie statystyki kroku w jednym przebiegu, cache'owane do końca kroku
+        (czytają je konflikt, warunki końcowe i zbieranie danych).
+        full=False: tylko to, czego potrzebuje dynamika; brakujące agregaty dolicza zbieranie danych.
+        """
+        if self._summary_step != self.step_count or (full and "gini_F" not in self._summary):
+            self._summary = summarize_vassals(self.state, self.p.e_min, self.p.s_min, full=full)
+            self._summary_step = self.step_count
+        return self._summary
+
+    def _collect(self) -> None:
+        if not self.collection.collects(self.step_count, final=not self.running):
+            return
+        row = dict(
+            self._aggregate(),
+            A_t=self._A_t,
+            collective_regen=self._collective_regen,
+            ConflictIntensity=self._conflict_intensity,
+            ResolutionPotential=self._resolution_potential,
+        )
+        self.series.append(self.step_count, self.status, self.resolution_event_last, row)
+        if self.collection.agents:
+            self._collect_agents()
+
+    def _collect_agents(self) -> None:
+        if self.agent_recorder is not None:
+            self.agent_recorder.record(self.step_count, self.state, self.lord_state)
+
+    def _end_state(self) -> EndState:
+        summary = self._aggregate(full=False)
+        return EndState(
+            self.status, self.step_count, self.resolution_event_last, summary["mean_Coord"], summary["exit_share"]
+        )
+
+    def _compute_collective_regen(self) -> float:
+        """
+        Regeneracja zbiorowa = funkcja sieci wsparcia * (1 - G_regen).
+        Tu: lokalne wsparcie ~ średnia z (1-F)*(1-Fear) u sąsiadów peer.
+        """
+        s = self.state
+        if self.exits is not None:
+            # tylko obecni: sąsiedzi po wyjściu nie wspierają, a sami nie wchodzą do średniej
+            local_support = np.clip(self.exits.neighbor_mean((1.0 - s.F) * (1.0 - s.Fear)), 0.0, 1.0)
+            local_support = local_support[self.exits.alive]
+        else:
+            local_support = np.clip(self.peer_csr.neighbor_mean((1.0 - s.F) * (1.0 - s.Fear)), 0.0, 1.0)
+        base = float(np.mean(local_support)) if local_support.size else 0.0
+        return float(np.clip(base * (1.0 - self.p.G_regen), 0.0, 1.0))
+
+    def _draw_affect_shock(self) -> float:
+        """
+        A(t) zależne od A_affect z szumem: większe A_affect -> częściej mocne bodźce.
+        """
+        base = self.p.A_affect
+        # mieszanka: zwykły szum + rzadkie „szoki”
+        st, t = self.streams, self.step_count
+        normal = st.normal("affect", t, 0, loc=base, scale=0.10)
+        shock = st.uniform("affect", t, 2, 0.0, 1.0) if st.random("affect", t, 1) < (0.10 + 0.25 * base) else 0.0
+        A_t = 0.75 * normal + 0.25 * shock
+        return float(np.clip(A_t, 0.0, 1.0))
+
+    def _allocate_access(self) -> None:
+        """
+        Krok 5.1–5.3: lords przydzielają access wasalom (patronage edges).
+        """
+        allocate_access(
+            self.state,
+            self.lord_state,
+            self.lord_groups,
+            gumbel=self.streams.gumbel_array("gumbel", self.step_count, self.state.n),
+            access_scale=self.p.access_scale,
+            w_loy=self.p.w_loy,
+            w_cent=self.p.w_cent,
+            w_perf=self.p.w_perf,
+            alive=self.exits.alive if self.exits is not None else None,
+        )
+
+    def _compute_conflict_and_resolution(self) -> Tuple[float, float, bool]:
+        """
+        Krok 6: konflikt bez rozstrzygnięcia.
+        ConflictIntensity = mean(Out) * C_conflict
+        ResolutionPotential = f(mean(Coord), (1 - R_power), spójność sieci)
+        """
+        summary = self._aggregate(full=False)
+        conflict_intensity = float(summary["mean_Out"] * self.p.C_conflict)
+
+        # spójność sieci wsparcia (cache przeliczany tylko po zmianie topologii peer_graph)
+        cohesion = self.cohesion
+        resolution_potential = float(np.clip(summary["mean_Coord"] * (1.0 - self.p.R_power) * (0.5 + 0.5 * cohesion), 0.0, 1.0))
+
+        # prawdopodobieństwo rozstrzygnięcia: logistyczne wokół rp_threshold
+        z = (resolution_potential - self.p.rp_threshold) / max(1e-6, self.p.rp_scale)
+        p_res = logistic(z)
+        resolution_event = bool(self.streams.random("resolution", self.step_count) < p_res)
+
+        return conflict_intensity, resolution_potential, resolution_event
+
+    def _check_termination(self) -> None:
+        mean_coord = self._summary["mean_Coord"]
+        exit_share = self._summary["exit_share"]
+
+        if (mean_coord > self.p.TH_reform) and self.resolution_event_last:
+            self.status = "reform"
+            self.running = False
+        elif exit_share > self.p.TH_exit:
+            self.status = "collapse"
+            self.running = False
+        elif self.step_count >= self.p.max_steps:
+            self.status = "max_steps"
+            self.running = False
+
+    def step(self) -> EndState:
+        if not self.running:
+            return self._end_state()
+
+        self.step_count += 1
+        prof = self.profiler
+
+        # (7.2) collective_regen(t)
+        with prof.phase("collective_regen"):
+            self._collective_regen = self._compute_collective_regen()
+
+        # (1) bodziec afektywny A(t)
+        with prof.phase("affect"):
+            self._A_t = self._draw_affect_shock()
+
+        # (2–4) aktualizacja wasali — cała populacja naraz
+        with prof.phase("core_update"):
+            update_core_states(
+                self.state,
+                self._vp,
+                noise=self.streams.normal_array("noise", self.step_count, self.state.n, 0.0, 0.10),
+                A_t=self._A_t,
+                I_work=self.p.I_work,
+                collective_regen=self._collective_regen,
+                G_regen=self.p.G_regen,
+                visibility_weight=self.p.visibility_weight,
+                regen_base=self.p.regen_base,
+                regen_work_penalty=self.p.regen_work_penalty,
+                overload_threshold=self.p.overload_threshold,
+                overload_scale=self.p.overload_scale,
+            )
+
+        # (5) lords przydzielają access
+        with prof.phase("access"):
+            self._allocate_access()
+
+        # (5.4) lojalność po access
+        with prof.phase("loyalty"):
+            update_loyalty_after_access(self.state, self._vp)
+            if self._exited.size:
+                # wasale po wyjściu nie biorą udziału w dynamice
+                self.state.data[:, self._exited] = self._exit_frozen
+
+        # (5.5) zmiana patrona po przydziale access i lojalności
+        if self.p.patron_switching:
+            with prof.phase("patronage"):
+                self._switch_patrons()
+
+        # agregaty kroku (jeden przebieg; cache dla etapów 6, 8 i zbierania danych)
+        with prof.phase("aggregate"):
+            self._aggregate(full=self.collection.collects(self.step_count, final=False))
+
+        # (6) konflikt i rozstrzygnięcie
+        with prof.phase("conflict"):
+            self._conflict_intensity, self._resolution_potential, self.resolution_event_last = self._compute_conflict_and_resolution()
+
+        # (8) warunki końcowe
+        with prof.phase("termination"):
+            self._check_termination()
+
+        with prof.phase("collect"):
+            self._collect()
+
+        # wyjście: po zebraniu danych kroku, działa od następnego kroku
+        if self.exits is not None and self.running:
+            with prof.phase("exit"):
+                self._remove_exited()
+
+        return self._end_state()
+
+    def _switch_patrons(self) -> np.ndarray:
+        """
+        Wasal bez access z Loy < switch_loy z prawdopodobieństwem switch_prob zmienia patrona na lorda
+        losowanego proporcjonalnie do min(1, budżet / liczba obecnych wasali). Zwraca indeksy zmieniających.
+        Wybór kandydatów to jedno wektorowe przejście O(N) (maska i losowanie decyzji dla każdego wasala);
+        losowanie lorda docelowego i indeks grup (LordGroups.move) kosztują O(liczba zmian).
+        """
+        s, p = self.state, self.p
+        u = self.streams.random_array("switch", self.step_count, s.n)[:, 0]
+        switching = switch_candidates(s, u, p.switch_loy, p.switch_prob)
+        if self.exits is not None:
+            switching &= self.exits.alive
+        return self._move_patrons(np.flatnonzero(switching))
+
+    def _move_patrons(self, idx: np.ndarray) -> np.ndarray:
+        """Zmieniający patrona idx (rosnąco) dostają nowych lordów; zwraca tych, których patron się zmienił."""
+        p, groups = self.p, self.lord_groups
+        if not idx.size:
+            return idx
+        chance = np.minimum(1.0, access_budget(self.lord_state, p.access_scale) / np.maximum(1, groups.active))
+        cdf = np.cumsum(chance)
+        # druga liczba z pary wasala (pierwsza — decyzja), losowana tylko dla zmieniających
+        target = self.streams.random_at("switch", self.step_count, idx, 2)[:, 1]
+        new = np.minimum(np.searchsorted(cdf, target * cdf[-1], side="right"), p.n_lords - 1)
+        # wylosowany obecny patron — bez zmiany
+        keep = new != groups.patron[idx]
+        idx, new = idx[keep], new[keep]
+        if idx.size:
+            groups.move(idx, new)
+            self._patronage_version += 1
+        return idx
+
+    def _remove_exited(self) -> np.ndarray:
+        """
+        Wasale z E < e_min i Sense < s_min opuszczają sieci peer i patronatu: koszt O(liczba odchodzących
+        + ich stopnie), bez przebudowy CSR. Ich stan zostaje zamrożony (liczą się dalej do exit_share).
+        """
+        s, exits = self.state, self.exits
+        leaving = np.flatnonzero((s.E < self.p.e_min) & (s.Sense < self.p.s_min) & exits.alive)
+        if not leaving.size:
+            return leaving
+        leaving, neighbors = exits.remove(leaving)
+        self.lord_groups.deactivate(leaving)
+        self._patronage_version += 1
+        # centralność jak vassal_degree_centrality: sąsiedzi tracą krawędź peer, odchodzący — wszystkie
+        n_nodes = self.p.n_vassals + self.p.n_lords
+        s.centrality[neighbors] = (exits.degree[neighbors] + 1) * (1.0 / (n_nodes - 1.0))
+        s.centrality[leaving] = 0.0
+        s.access_received[leaving] = 0.0
+        self._exited = np.concatenate((self._exited, leaving))
+        self._exit_frozen = s.data[:, self._exited].copy()
+        return leaving
+
+    def run(self) -> EndState:
+        while self.running:
+            self.step()
+        return self._end_state()
+
+    # --- checkpoint / restore / fork ---
+    _GLOBALS = ("_A_t", "_collective_regen", "_conflict_intensity", "_resolution_potential")
+
+    def snapshot(self) -> ModelSnapshot:
+        """Kopia pełnego stanu po bieżącym kroku (zob. ModelSnapshot)."""
+        return ModelSnapshot(
+            params=self.p,
+            step_count=self.step_count,
+            mesa_steps=self.step_count,
+            running=self.running,
+            status=self.status,
+            resolution_event_last=self.resolution_event_last,
+            globals={name: getattr(self, name) for name in self._GLOBALS},
+            summary=dict(self._aggregate()),
+            state=self.state.data.copy(),
+            lord_state=self.lord_state.data.copy(),
+            patron=self.lord_groups.patron.copy(),
+            rng_state=self.rng.bit_generator.state,
+            random_state=None,
+            series=self.series.copy(),
+            agent_recorder=self.agent_recorder.copy() if self.agent_recorder is not None else None,
+            compact=self.compact,
+            exits=None if self.exits is None else {
+                "network": self.exits.copy(), "exited": self._exited.copy(), "frozen": self._exit_frozen.copy()
+            },
+        )
+
+    def restore(self, snap: ModelSnapshot) -> None:
+        """
+        Wczytuje snapshot do tego modelu (topologia musi się zgadzać, parametry dynamiki mogą być inne —
+        tak liczy się gałęzie „co jeśli”). Dalsze kroki są bit-identyczne z przebiegiem bez przerwy.
+        """
+        snap.check_compatible(self.p)
+        if (snap.agent_recorder is None) != (self.agent_recorder is None):
+            raise ValueError("Snapshot i model mają różny tryb zapisu agentów (agent_recording)")
+        if snap.compact != self.compact:
+            raise ValueError("Snapshot i model mają różny tryb (compact)")
+        if (snap.exits is None) != (self.exits is None):
+            raise ValueError("Snapshot i model mają różny tryb wyjścia (exit_removal)")
+
+        self.state.data[...] = snap.state
+        self.lord_state.data[...] = snap.lord_state
+        if not np.array_equal(snap.patron, self.lord_groups.patron):
+            self._set_patrons(snap.patron)
+        if snap.exits is not None:
+            self._restore_exits(snap.exits)
+        self.rng.bit_generator.state = snap.rng_state
+
+        self.step_count = snap.step_count
+        self.running = snap.running
+        self.status = snap.status
+        self.resolution_event_last = snap.resolution_event_last
+        for name, value in snap.globals.items():
+            setattr(self, name, value)
+        self._summary = dict(snap.summary)
+        self._summary_step = snap.step_count
+
+        self.series = snap.series.copy()
+        if snap.agent_recorder is not None:
+            self.agent_recorder = snap.agent_recorder.copy()
+
+    def _set_patrons(self, patron: np.ndarray) -> None:
+        self.lord_groups = LordGroups(patron.copy(), self.p.n_lords)
+        self._patronage_version += 1
+
+    def _restore_exits(self, exits: Dict) -> None:
+        self.exits = exits["network"].copy()
+        self._exited = exits["exited"].copy()
+        self._exit_frozen = exits["frozen"].copy()
+        self.lord_groups.active = np.bincount(self.lord_groups.patron[self.exits.alive], minlength=self.p.n_lords)
+        self._patronage_version += 1
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        snap: ModelSnapshot,
+        params: Optional[ModelParams] = None,
+        buffer_steps: Optional[int] = None,
+        collection: Optional[CollectionPolicy] = None,
+    ):
+        """Nowy model w stanie ze snapshotu; params=None — parametry ze snapshotu."""
+        recording = snap.agent_recorder.spec if snap.agent_recorder is not None else None
+        model = cls(
+            params or snap.params, agent_recording=recording, buffer_steps=buffer_steps, compact=snap.compact,
+            collection=collection,
+        )
+        model.restore(snap)
+        return model
+
+    def fork(self, params: Optional[ModelParams] = None):
+        """Niezależna kopia modelu w bieżącym stanie (gałąź kontynuacji, opcjonalnie z innymi params)."""
+        return type(self).from_snapshot(self.snapshot(), params=params, collection=self.collection)
+
+    # --- eksport danych ---
+    def get_model_df(self):
+        return self.series.to_frame()
+
+    def get_agent_df(self):
+        if self.agent_recorder is None:
+            raise ValueError("Dane agentów wymagają agent_recording (albo DataCollectora TiredSystemModel)")
+        return self.agent_recorder.to_frame()
+
+    def get_lord_df(self):
+        if self.agent_recorder is None:
+            raise ValueError("Zapis lordów wymaga agent_recording=AgentRecording(lords=True)")
+        return self.agent_recorder.lords_frame()
@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+
+
+@dataclass
+class VassalParams:
+    # koszty / wagi
+    alpha: float
+    beta: float
+    kappa: float
+    gamma: float
+    delta: float
+    eta: float
+    mu: float
+    nu: float
+    rho: float
+    sigma: float
+    tau: float
+
+
+# zmienne stanu wasala (0..1) — kolejność losowania wartości początkowych
+STATE_VARS = ("E", "F", "Sense", "Out", "Fear", "Coord", "Loy")
+
+# wszystkie wektory trzymane przez VassalState
+VASSAL_ARRAYS = STATE_VARS + (
+    "access_received",
+    "workload_last",
+    "regen_last",
+    "performance",
+    "base_workload",
+    "exit_option",
+    "centrality",
+)
+
+
+class VassalState:
+    """
+    Stan populacji wasali jako struct-of-arrays: jeden ciągły wektor NumPy na zmienną.
+    Wektory są wierszami jednego bloku `data` (len(VASSAL_ARRAYS), n) — agregaty po
+    zmiennych stanu to jedna redukcja po osi -1. Indeks i odpowiada węzłowi V{i}.
+    Z `replicas=R` każda zmienna ma kształt (R, n) (zespół niezależnych replik).
+    Wektory aktualizujemy w miejscu (out=...), nigdy nie podmieniamy.
+    """
+
+    __slots__ = ("n", "dtype", "data") + VASSAL_ARRAYS
+
+    def __init__(self, n: int, dtype=np.float64, replicas: Optional[int] = None):
+        shape = (int(n),) if replicas is None else (int(replicas), int(n))
+        self._bind(np.zeros((len(VASSAL_ARRAYS),) + shape, dtype=dtype))
+
+    def _bind(self, data: np.ndarray) -> None:
+        self.data = data
+        self.n = int(data.shape[-1])
+        self.dtype = data.dtype
+        for row, name in enumerate(VASSAL_ARRAYS):
+            setattr(self, name, data[row])
+
+    @classmethod
+    def view(cls, data: np.ndarray) -> "VassalState":
+        """Stan oparty na istniejącym bloku danych (bez kopiowania)."""
+        obj = cls.__new__(cls)
+        obj._bind(data)
+        return obj
+
+    @property
+    def core(self) -> np.ndarray:
+        """Widok (len(STATE_VARS), ..., n) na zmienne stanu E..Loy."""
+        return self.data[:len(STATE_VARS)]
+
+    def replica(self, r: int) -> "VassalState":
+        """Widok 1-D na replikę r stanu (R, n)."""
+        return VassalState.view(self.data[:, r])
+
+    def flat(self) -> "VassalState":
+        """Widok 1-D (R * n) na stan zespołu — wasal i repliki r ma indeks r * n + i."""
+        return VassalState.view(self.data.reshape(len(VASSAL_ARRAYS), -1))
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in VASSAL_ARRAYS}
+
+
+LORD_ARRAYS = ("Access", "Cap", "Doxa", "Buffer")
+
+
+class LordState:
+    """
+    Parametry lordów (0..1) jako wektory; indeks j odpowiada węzłowi L{j}.
+    """
+
+    __slots__ = ("n", "dtype", "data") + LORD_ARRAYS
+
+    def __init__(self, n: int, dtype=np.float64, replicas: Optional[int] = None):
+        shape = (int(n),) if replicas is None else (int(replicas), int(n))
+        self._bind(np.zeros((len(LORD_ARRAYS),) + shape, dtype=dtype))
+
+    def _bind(self, data: np.ndarray) -> None:
+        self.data = data
+        self.n = int(data.shape[-1])
+        self.dtype = data.dtype
+        for row, name in enumerate(LORD_ARRAYS):
+            setattr(self, name, data[row])
+
+    def replica(self, r: int) -> "LordState":
+        """Widok 1-D na replikę r lordów (R, n)."""
+        obj = LordState.__new__(LordState)
+        obj._bind(self.data[:, r])
+        return obj
+
+    def flat(self) -> "LordState":
+        """Widok 1-D (R * n) na lordów zespołu — lord j repliki r ma indeks r * n + j."""
+        obj = LordState.__new__(LordState)
+        obj._bind(self.data.reshape(len(LORD_ARRAYS), -1))
+        return obj
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in LORD_ARRAYS}
+
+
+# zakresy losowania stanu początkowego (jednostajnie)
+INIT_RANGES = {
+    "E": (0.55, 0.80),
+    "F": (0.10, 0.35),
+    "Sense": (0.55, 0.85),
+    "Out": (0.20, 0.50),
+    "Fear": (0.20, 0.50),
+    "Coord": (0.20, 0.55),
+    "Loy": (0.20, 0.55),
+}
+VASSAL_INIT_RANGES = {"base_workload": (0.50, 0.90), "exit_option": (0.05, 0.80), **INIT_RANGES}
+LORD_INIT_RANGES = {"Access": (0.45, 0.90), "Cap": (0.40, 0.90), "Doxa": (0.30, 0.80), "Buffer": (0.30, 0.85)}
+
+
+def draw_initial_state(streams, s: VassalState, lords: LordState) -> np.ndarray:
+    """
+    Losuje stan początkowy populacji partiami i zwraca patronów (lord każdego wasala).
+    streams: SequentialStreams albo CounterStreams (tired_system.streams).
+    W schemacie sekwencyjnym kolejność losowań jest taka jak w pętli po agentach (patroni, lordowie
+    po kolei, wasale po kolei: base_workload, exit_option, E..Loy), więc strumień liczb jest
+    identyczny — lo + (hi - lo) * random() to dokładnie rng.uniform(lo, hi).
+    """
+    patron = streams.integers("patron", s.n, lords.n).astype(np.intp)
+    u = streams.random_matrix("lord_init", lords.n, len(LORD_INIT_RANGES))
+    for k, (name, (lo, hi)) in enumerate(LORD_INIT_RANGES.items()):
+        getattr(lords, name)[:] = lo + (hi - lo) * u[:, k]
+    u = streams.random_matrix("vassal_init", s.n, len(VASSAL_INIT_RANGES))
+    for k, (name, (lo, hi)) in enumerate(VASSAL_INIT_RANGES.items()):
+        getattr(s, name)[:] = lo + (hi - lo) * u[:, k]
+    return patron
+
+
+# od tylu wasali na lorda (średnio) przydział access czyta grupy z indeksu członków (top-k w grupie, O(n))
+# zamiast sortować całą populację; przy małych grupach jedno sortowanie jest tańsze niż pętla po lordach
+_MEMBERS_MIN_GROUP = 64
+
+
+class LordGroups:
+    """
+    Grupowanie wasali po patronach: `patron[i]` — lord wasala i, `counts` — rozmiary grup.
+    `active` — liczba wasali lorda, którzy nie odeszli (exit_removal); bez wyjść równa counts.
+    Członkowie lorda: members(j) z indeksu budowanego przy pierwszym użyciu — tablica per lord i pozycja
+    wasala w niej (`_slot`); zmiana patrona usuwa wasala przez zamianę z ostatnim członkiem grupy, O(1).
+    Z indeksu korzysta przydział access (select) przy dużych grupach.
+    `moves` — liczba zmian patrona od utworzenia.
+    """
+
+    __slots__ = ("patron", "counts", "active", "moves", "_members", "_fill", "_slot")
+
+    def __init__(self, patron: np.ndarray, n_lords: int, alive: Optional[np.ndarray] = None):
+        self.patron = np.asarray(patron, dtype=np.intp)
+        self.counts = np.bincount(self.patron, minlength=n_lords)
+        self.active = self.counts.copy() if alive is None else np.bincount(self.patron[alive], minlength=n_lords)
+        self.moves = 0
+        self._members: Optional[List[np.ndarray]] = None
+        self._fill: List[int] = []
+        self._slot: Optional[np.ndarray] = None
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """Początki grup po posortowaniu po lordzie (select_by_lord)."""
+        return np.concatenate(([0], np.cumsum(self.counts)))
+
+    def _index(self) -> Tuple[List[np.ndarray], np.ndarray]:
+        if self._members is None:
+            order = np.argsort(self.patron, kind="stable")
+            offsets = self.offsets
+            bounds = offsets.tolist()
+            self._members = [order[a:b].copy() for a, b in zip(bounds[:-1], bounds[1:])]
+            self._fill = self.counts.tolist()
+            self._slot = np.empty(self.patron.size, dtype=np.intp)
+            self._slot[order] = np.arange(order.size) - offsets[self.patron[order]]
+        return self._members, self._slot
+
+    def members(self, j: int) -> np.ndarray:
+        """Wasale lorda j (po zmianach patrona kolejność dowolna)."""
+        members, _ = self._index()
+        return members[j][:self._fill[j]]
+
+    def select(self, keys: np.ndarray, budget: np.ndarray) -> np.ndarray:
+        """Indeksy budget_j największych kluczy w grupie każdego lorda (remis — mniejszy indeks), bez kolejności."""
+        if self.patron.size < _MEMBERS_MIN_GROUP * self.counts.size:
+            return select_by_lord(self.patron, keys, budget, self.offsets)
+        members, _ = self._index()
+        chosen = [top_k(group[:fill], keys, k) for group, fill, k in zip(members, self._fill, budget.tolist())]
+        return np.concatenate(chosen) if chosen else np.zeros(0, dtype=np.intp)
+
+    def deactivate(self, idx: np.ndarray) -> None:
+        """Wasale idx odchodzą z sieci patronatu (O(len(idx)))."""
+        np.subtract.at(self.active, self.patron[idx], 1)
+
+    def move(self, idx: np.ndarray, new: np.ndarray) -> None:
+        """
+        Wasale idx (obecni, różni, new[k] != patron[idx[k]]) przechodzą do lordów new.
+        Koszt O(len(idx)): indeks członków, liczniki i stopnie lordów zmieniane o różnice.
+        """
+        members, slot = self._index()
+        fill = self._fill
+        old = self.patron[idx]
+        for i, a, b in zip(idx.tolist(), old.tolist(), new.tolist()):
+            # usunięcie z grupy a: na miejsce i wchodzi ostatni członek
+            k, fill[a] = slot[i], fill[a] - 1
+            last = members[a][fill[a]]
+            members[a][k] = last
+            slot[last] = k
+            # dopisanie na końcu grupy b (pojemność podwajana)
+            if fill[b] == members[b].size:
+                members[b] = np.concatenate((members[b], np.empty(max(1, members[b].size), dtype=np.intp)))
+            members[b][fill[b]] = i
+            slot[i], fill[b] = fill[b], fill[b] + 1
+        self.patron[idx] = new
+        np.subtract.at(self.counts, old, 1)
+        np.add.at(self.counts, new, 1)
+        np.subtract.at(self.active, old, 1)
+        np.add.at(self.active, new, 1)
+        self.moves += len(idx)
+
+
+def top_k(members: np.ndarray, keys: np.ndarray, k: int) -> np.ndarray:
+    """
+    k wasali z members o największych kluczach; remis na granicy — mniejsze indeksy (jak stabilne
+    sortowanie w select_by_lord). argpartition: O(len(members)).
+    """
+    if k <= 0:
+        return members[:0]
+    if k >= members.size:
+        return members
+    g = keys[members]
+    threshold = g[np.argpartition(-g, k - 1)[k - 1]]
+    above = members[g > threshold]
+    if above.size == k:
+        return above
+    tied = np.sort(members[g == threshold])[:k - above.size]
+    return np.concatenate((above, tied))
+
+
+def access_budget(lords: LordState, access_scale) -> np.ndarray:
+    """Liczba wasali, którym lord j przydziela access: max(1, rint(Access_j * access_scale))."""
+    return np.maximum(1, np.rint(lords.Access * access_scale)).astype(np.intp)
+
+
+def access_keys(
+    s: VassalState, lords: LordState, patron: np.ndarray, gumbel: np.ndarray, w_loy, w_cent, w_perf
+) -> np.ndarray:
+    """Klucze losowania Gumbel-top-k: score wasala + Gumbel(0, 1)."""
+    # scoring: Loy + centrality + performance (+ stała Doxa lorda — nie zmienia softmaxu)
+    scores = w_loy * s.Loy + w_cent * s.centrality + w_perf * s.performance + 0.10 * lords.Doxa[patron]
+    return scores + gumbel
+
+
+def select_by_lord(
+    patron: np.ndarray, keys: np.ndarray, budget: np.ndarray, offsets: np.ndarray, perm: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Pozycje budget_j największych kluczy w grupie każdego lorda (remis — mniejsza pozycja).
+    offsets: początki grup po posortowaniu po lordzie; perm: gotowa kolejność (lord, -klucz).
+    """
+    if perm is None:
+        # sortowanie po (lord, -key): grupa lorda j zajmuje [offsets[j], offsets[j+1])
+        perm = np.lexsort((-keys, patron))
+    rank = np.arange(perm.size) - offsets[patron[perm]]
+    return perm[rank < budget[patron[perm]]]
+
+
+def allocate_access(
+    s: VassalState,
+    lords: LordState,
+    groups: LordGroups,
+    gumbel: np.ndarray,
+    access_scale: int,
+    w_loy: float,
+    w_cent: float,
+    w_perf: float,
+    alive: Optional[np.ndarray] = None,
+) -> None:
+    """
+    Kroki 5.1–5.3 dla wszystkich lordów naraz (stan 1-D; dla zespołu — widoki flat()).
+    Wagi i access_scale mogą być skalarami albo wektorami (per wasal / per lord).
+    Lord j wybiera bez zwracania budget_j wasali z prawdopodobieństwami softmax(score) —
+    losowanie Gumbel-top-k: bierzemy budget_j największych score + Gumbel(0, 1) w grupie lorda.
+    alive: maska wasali w sieci patronatu (None = wszyscy); pozostali nie dostają access.
+    """
+    keys = access_keys(s, lords, groups.patron, gumbel, w_loy, w_cent, w_perf)
+    budget = access_budget(lords, access_scale)
+    if alive is not None:
+        # wasale po wyjściu: klucz -inf (koniec grupy), budżet lorda najwyżej liczba obecnych
+        keys[~alive] = -np.inf
+        budget = np.minimum(budget, groups.active)
+    chosen = groups.select(keys, budget)
+
+    s.access_received[:] = 0.0
+    s.access_received[chosen] = 1.0
+
+
+def update_core_states(
+    s: VassalState,
+    p: VassalParams,
+    noise: np.ndarray,
+    A_t: float,
+    I_work: float,
+    collective_regen: float,
+    G_regen: float,
+    visibility_weight: float,
+    regen_base: float,
+    regen_work_penalty: float,
+    overload_threshold: float,
+    overload_scale: float,
+) -> None:
+    """
+    Kroki 2–4 + 7 (częściowo) dla całej populacji: energia, sens, afekt, zmęczenie, koordynacja.
+    `noise` to szum obciążenia N(0, 0.10) — po jednej wartości na wasala.
+    """
+    # (2) obciążenie; koszt widzialności rośnie wraz z lojalnością i centralnością (status = praca)
+    visibility_cost = visibility_weight * (0.6 * s.Loy + 0.4 * s.centrality)
+    workload = s.base_workload + I_work * (0.5 + noise) + visibility_cost + 0.10 * s.access_received
+    workload = np.clip(workload, 0.0, 2.0)
+    s.workload_last[:] = workload
+
+    # (7.1) prywatna regeneracja energetyczna (częściowo zneutralizowana przez G_regen)
+    private_rest = np.maximum(0.0, regen_base - regen_work_penalty * workload)
+    penalty = G_regen * 0.6 * private_rest
+    regen = np.maximum(0.0, private_rest - penalty)
+    s.regen_last[:] = regen
+
+    # (2.2) energia, (2.3) sens
+    np.clip(s.E - p.alpha * workload + regen, 0.0, 1.0, out=s.E)
+    np.clip(s.Sense - p.beta * workload, 0.0, 1.0, out=s.Sense)
+
+    # (3) afekt jako paliwo; ryzyko wykluczenia: niska lojalność, brak dostępu, słaba alternatywa wyjścia
+    np.clip(s.Out + p.gamma * A_t - p.delta * s.F, 0.0, 1.0, out=s.Out)
+    lack_access = 1.0 - np.clip(s.access_received, 0.0, 1.0)
+    lack_exit = 1.0 - s.exit_option
+    risk_excl = np.clip(0.25 * (1.0 - s.Loy) + 0.25 * lack_access + 0.20 * lack_exit, 0.0, 1.0)
+    np.clip(s.Fear + p.eta * A_t + risk_excl, 0.0, 1.0, out=s.Fear)
+
+    # (4.1) zmęczenie
+    overload_shock = overload_scale * np.maximum(0.0, workload - overload_threshold)
+    np.clip(s.F + p.kappa * (1.0 - s.E) + overload_shock, 0.0, 1.0, out=s.F)
+
+    # (4.2) koordynacja: tłumiona przez zmęczenie, wzmacniana przez regenerację zbiorową
+    np.clip(s.Coord - p.mu * s.F + p.nu * collective_regen, 0.0, 1.0, out=s.Coord)
+
+    # proxy "performance"
+    np.clip(0.5 * (s.E + s.Sense) - 0.5 * s.F, 0.0, 1.0, out=s.performance)
+
+
+def update_loyalty_after_access(s: VassalState, p: VassalParams) -> None:
+    """
+    Krok 5.4: lojalność po przydziale access (got = 1 dla wasali z dostępem).
+    """
+    got = (s.access_received > 0.0).astype(s.dtype)
+    np.clip(s.Loy + p.rho * got + p.sigma * s.Fear - p.tau * (1.0 - s.Sense), 0.0, 1.0, out=s.Loy)
+
+    # koszt dyspozycyjności: lojalność zużywa energię (autoeksploatacja)
+    np.clip(s.E - 0.05 * s.Loy, 0.0, 1.0, out=s.E)
+
+
+def switch_candidates(s: VassalState, u: np.ndarray, switch_loy: float, switch_prob: float) -> np.ndarray:
+    """Krok 5.5: maska wasali zmieniających patrona — bez access, Loy < switch_loy, u < switch_prob."""
+    return (s.access_received == 0.0) & (s.Loy < switch_loy) & (u < switch_prob)
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+from dataclasses import fields
+from typing import List, Optional, Sequence, Union
+import numpy as np
+
+from .engine import (
+    VassalParams,
+    VassalState,
+    LordState,
+    LordGroups,
+    draw_initial_state,
+    allocate_access,
+    update_core_states,
+    update_loyalty_after_access,
+)
+from .metrics import summarize_replicas, logistic, EndState
+from .network import build_peer_csr, giant_component_size, vassal_degree_centrality
+from .params import ModelParams
+from .profiling import NULL_PROFILER, PhaseProfiler
+from .recording import ModelSeries, CollectionPolicy, FULL_COLLECTION
+from .streams import make_streams
+
+# pola, które muszą być wspólne dla replik (dzielą topologię i kształt tablic)
+SHARED_FIELDS = ("n_vassals", "n_lords", "peer_k", "peer_rewire_p")
+
+
+class EnsembleModel:
+    """
+    Zespół R niezależnych replik modelu liczonych razem na tablicach (R, n_vassals).
+    Repliki dzielą statyczną sieć peer (zbudowaną z `topology_seed`), mają własne generatory
+    (seed z ModelParams) i mogą mieć różne parametry dynamiki. Kolejność losowań w replice jest
+    taka jak w TiredSystemModel — replika z seed == topology_seed odtwarza pojedynczy przebieg.
+    Replika po warunku końcowym jest zamrażana; pozostałe liczą się dalej.
+    profiler: PhaseProfiler (etapy jak w TiredSystemModel, czas łączny dla wszystkich replik).
+    collection: CollectionPolicy szeregów replik (None = co krok); tryb "full" nie ma tu danych agentów.
+    """
+
+    def __init__(
+        self,
+        params: Union[ModelParams, Sequence[ModelParams]],
+        seeds: Optional[Sequence[int]] = None,
+        topology_seed: Optional[int] = None,
+        profiler: Optional[PhaseProfiler] = None,
+        collection: Optional[CollectionPolicy] = None,
+    ):
+        self.collection = collection if collection is not None else FULL_COLLECTION
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        if self.profiler.enabled:
+            self.profiler.runs += 1
+        if isinstance(params, ModelParams):
+            if seeds is None:
+                seeds = [params.seed]
+            params = [params.__class__(**{**params.__dict__, "seed": None if s is None else int(s)}) for s in seeds]
+        self.params: List[ModelParams] = list(params)
+        if not self.params:
+            raise ValueError("Zespół wymaga co najmniej jednej repliki")
+        p0 = self.params[0]
+        if any(p.exit_removal for p in self.params):
+            # wspólna, statyczna sieć peer — wyjście zmienia ją osobno w każdej replice
+            raise ValueError("EnsembleModel nie obsługuje exit_removal (repliki: TiredSystemCore)")
+        if any(p.patron_switching for p in self.params):
+            raise ValueError("EnsembleModel nie obsługuje patron_switching (repliki: TiredSystemCore)")
+        for p in self.params[1:]:
+            for name in SHARED_FIELDS:
+                if getattr(p, name) != getattr(p0, name):
+                    raise ValueError(f"Repliki muszą mieć wspólne {name}")
+
+        R, N, L = len(self.params), p0.n_vassals, p0.n_lords
+        self.R, self.n_vassals, self.n_lords = R, N, L
+        self.rngs = [np.random.default_rng(p.seed) for p in self.params]
+        self.streams = [make_streams(p.rng_scheme, p.seed, rng) for p, rng in zip(self.params, self.rngs)]
+
+        # wspólna topologia peer
+        self.topology_seed = p0.seed if topology_seed is None else topology_seed
+        self.peer_csr = build_peer_csr(N, p0.peer_k, p0.peer_rewire_p, seed=self.topology_seed)
+        self.cohesion = float(np.clip(giant_component_size(self.peer_csr) / max(1, N), 0.0, 1.0))
+
+        # parametry per replika jako kolumny (R, 1) — broadcast po wasalach
+        self._col = {f.name: self._column(f.name) for f in fields(ModelParams) if f.name not in SHARED_FIELDS + ("seed", "rng_scheme")}
+        self._vp = VassalParams(**{name: self._col[name] for name in VassalParams.__dataclass_fields__})
+
+        self.state = VassalState(N, replicas=R)
+        self.lord_state = LordState(L, replicas=R)
+        self._init_replicas()
+        self.state.centrality[:] = vassal_degree_centrality(self.peer_csr.degree, L)
+
+        # wasal i repliki r należy do grupy r * L + patron — wszystkie grupy w jednym przydziale
+        self.lord_groups = LordGroups((self.patron + L * np.arange(R)[:, None]).ravel(), R * L)
+        self._flat_state = self.state.flat()
+        self._flat_lords = self.lord_state.flat()
+        self._access_scale = np.repeat(self._col["access_scale"][:, 0], L)
+        self._weights = {w: np.repeat(self._col[w][:, 0], N) for w in ("w_loy", "w_cent", "w_perf")}
+
+        self.step_count = 0
+        self.active = np.ones(R, dtype=bool)
+        self.status = ["running"] * R
+        self.end_step = np.zeros(R, dtype=np.int64)
+        self.resolution_event_last = np.zeros(R, dtype=bool)
+        self._A_t = np.zeros(R)
+        self._collective_regen = np.zeros(R)
+        self._conflict_intensity = np.zeros(R)
+        self._resolution_potential = np.zeros(R)
+        self._summary = summarize_replicas(
+            self.state, self._col["e_min"], self._col["s_min"], full=self.collection.collects(0, final=False)
+        )
+        # EndState replik bez czytania szeregów (przy collection "none" szeregi są puste)
+        self._mean_coord = self._summary["mean_Coord"].copy()
+        self._exit_share = np.asarray(self._summary["exit_share"], dtype=float).copy()
+
+        self.series = [ModelSeries(capacity=self.collection.capacity(p.max_steps)) for p in self.params]
+        self._collect()
+
+    @property
+    def running(self) -> bool:
+        return bool(self.active.any())
+
+    def _column(self, name: str) -> np.ndarray:
+        return np.array([[getattr(p, name)] for p in self.params], dtype=float)
+
+    def _init_replicas(self) -> None:
+        # ta sama kolejność losowań co TiredSystemModel (engine.draw_initial_state)
+        self.patron = np.zeros((self.R, self.n_vassals), dtype=np.intp)
+        for r, st in enumerate(self.streams):
+            self.patron[r] = draw_initial_state(st, self.state.replica(r), self.lord_state.replica(r))
+
+    # --- etapy ---
+    def _compute_collective_regen(self) -> np.ndarray:
+        s = self.state
+        local_support = np.clip(self.peer_csr.neighbor_mean((1.0 - s.F) * (1.0 - s.Fear)), 0.0, 1.0)
+        base = local_support.mean(axis=-1) if self.n_vassals else np.zeros(self.R)
+        return np.clip(base * (1.0 - self._col["G_regen"][:, 0]), 0.0, 1.0)
+
+    def _draw_affect_shock(self) -> np.ndarray:
+        A_t = np.zeros(self.R)
+        t = self.step_count
+        for r, st in enumerate(self.streams):
+            base = self.params[r].A_affect
+            normal = st.normal("affect", t, 0, loc=base, scale=0.10)
+            shock = st.uniform("affect", t, 2, 0.0, 1.0) if st.random("affect", t, 1) < (0.10 + 0.25 * base) else 0.0
+            A_t[r] = np.clip(0.75 * normal + 0.25 * shock, 0.0, 1.0)
+        return A_t
+
+    def step(self) -> None:
+        if not self.running:
+            return
+        self.step_count += 1
+        s = self.state
+        frozen = np.flatnonzero(~self.active)
+        saved = s.data[:, frozen].copy() if frozen.size else None
+
+        prof = self.profiler
+        with prof.phase("collective_regen"):
+            self._collective_regen = self._compute_collective_regen()
+        with prof.phase("affect"):
+            self._A_t = self._draw_affect_shock()
+
+        c = self._col
+        with prof.phase("core_update"):
+            noise = np.stack([st.normal_array("noise", self.step_count, self.n_vassals, 0.0, 0.10) for st in self.streams])
+            update_core_states(
+                s,
+                self._vp,
+                noise=noise,
+                A_t=self._A_t[:, None],
+                I_work=c["I_work"],
+                collective_regen=self._collective_regen[:, None],
+                G_regen=c["G_regen"],
+                visibility_weight=c["visibility_weight"],
+                regen_base=c["regen_base"],
+                regen_work_penalty=c["regen_work_penalty"],
+                overload_threshold=c["overload_threshold"],
+                overload_scale=c["overload_scale"],
+            )
+
+        with prof.phase("access"):
+            gumbel = np.stack([st.gumbel_array("gumbel", self.step_count, self.n_vassals) for st in self.streams])
+            allocate_access(
+                self._flat_state,
+                self._flat_lords,
+                self.lord_groups,
+                gumbel=gumbel.ravel(),
+                access_scale=self._access_scale,
+                **self._weights,
+            )
+        with prof.phase("loyalty"):
+            update_loyalty_after_access(s, self._vp)
+
+            if saved is not None:
+                s.data[:, frozen] = saved
+
+        with prof.phase("aggregate"):
+            full = self.collection.collects(self.step_count, final=False)
+            self._summary = summary = summarize_replicas(s, c["e_min"][:, 0], c["s_min"][:, 0], full=full)
+
+        # (6) konflikt i rozstrzygnięcie, per replika
+        with prof.phase("conflict"):
+            self._conflict_intensity = summary["mean_Out"] * c["C_conflict"][:, 0]
+            self._resolution_potential = np.clip(
+                summary["mean_Coord"] * (1.0 - c["R_power"][:, 0]) * (0.5 + 0.5 * self.cohesion), 0.0, 1.0
+            )
+            for r in np.flatnonzero(self.active):
+                p = self.params[r]
+                z = (self._resolution_potential[r] - p.rp_threshold) / max(1e-6, p.rp_scale)
+                self.resolution_event_last[r] = bool(self.streams[r].random("resolution", self.step_count) < logistic(z))
+
+        # (8) warunki końcowe
+        with prof.phase("termination"):
+            for r in np.flatnonzero(self.active):
+                p = self.params[r]
+                if (summary["mean_Coord"][r] > p.TH_reform) and self.resolution_event_last[r]:
+                    self.status[r] = "reform"
+                elif summary["exit_share"][r] > p.TH_exit:
+                    self.status[r] = "collapse"
+                elif self.step_count >= p.max_steps:
+                    self.status[r] = "max_steps"
+                else:
+                    continue
+                self.active[r] = False
+                self.end_step[r] = self.step_count
+
+        with prof.phase("collect"):
+            rows = np.flatnonzero(self.active | (self.end_step == self.step_count))
+            self._mean_coord[rows] = summary["mean_Coord"][rows]
+            self._exit_share[rows] = summary["exit_share"][rows]
+            self._collect(rows=rows)
+
+    def _collect(self, rows: Optional[np.ndarray] = None) -> None:
+        rows = np.arange(self.R) if rows is None else rows
+        rows = [r for r in rows if self.collection.collects(self.step_count, final=not self.active[r])]
+        if rows and "gini_F" not in self._summary:
+            # krok liczony bez pełnych agregatów, a któraś replika się kończy: dopełnij (stan bez zmian)
+            c = self._col
+            self._summary = summarize_replicas(self.state, c["e_min"][:, 0], c["s_min"][:, 0])
+        for r in rows:
+            row = {name: float(values[r]) for name, values in self._summary.items()}
+            row.update(
+                A_t=float(self._A_t[r]),
+                collective_regen=float(self._collective_regen[r]),
+                ConflictIntensity=float(self._conflict_intensity[r]),
+                ResolutionPotential=float(self._resolution_potential[r]),
+            )
+            self.series[r].append(self.step_count, self.status[r], bool(self.resolution_event_last[r]), row)
+
+    def end_states(self) -> List[EndState]:
+        out = []
+        for r in range(self.R):
+            step = int(self.end_step[r]) if not self.active[r] else self.step_count
+            coord, exit_share = float(self._mean_coord[r]), float(self._exit_share[r])
+            out.append(EndState(self.status[r], step, bool(self.resolution_event_last[r]), coord, exit_share))
+        return out
+
+    def run(self) -> List[EndState]:
+        while self.running:
+            self.step()
+        return self.end_states()
+
+    # --- eksport danych ---
+    def get_model_df(self):
+        """Szeregi wszystkich replik: indeks (replica, Step)."""
+        import pandas as pd
+
+        frames = [series.to_frame() for series in self.series]
+        return pd.concat(frames, keys=range(self.R), names=["replica", "Step"])
@@ -1,31 +1,49 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Dict
 import numpy as np
 
+from .engine import VassalState, STATE_VARS
+
 
 def clip01(x: float) -> float:
     return float(np.clip(x, 0.0, 1.0))
 
 
+def _as_array(values) -> np.ndarray:
+    # tablice NumPy bez kopiowania przez listę; iterowalne jak dotąd
+    if isinstance(values, np.ndarray):
+        return values.astype(float, copy=False)
+    return np.array(list(values), dtype=float)
+
+
 def safe_mean(values) -> float:
-    arr = np.array(list(values), dtype=float)
+    arr = _as_array(values)
     return float(arr.mean()) if arr.size else 0.0
 
 
 def safe_corr(x, y) -> float:
-    x = np.array(list(x), dtype=float)
-    y = np.array(list(y), dtype=float)
+    x = _as_array(x)
+    y = _as_array(y)
     if x.size < 2 or y.size < 2:
         return 0.0
-    if np.isclose(np.std(x), 0.0) or np.isclose(np.std(y), 0.0):
+    dx, dy = x - x.mean(), y - y.mean()
+    # sumy parami (np.add.reduce) — te same co złożone z sum fragmentów w ShardedModel
+    return corr_from_sums(np.add.reduce(dx * dx), np.add.reduce(dy * dy), np.add.reduce(dx * dy), x.size)
+
+
+def corr_from_sums(sxx, syy, sxy, n: int) -> float:
+    """Korelacja Pearsona z sum scentrowanych: sxx = Σ (x - x̄)², syy = Σ (y - ȳ)², sxy = Σ (x - x̄)(y - ȳ)."""
+    # sqrt(sxx / n) to np.std(x) — stała zmienna daje 0, jak dotąd
+    if n < 2 or np.isclose(np.sqrt(sxx / n), 0.0) or np.isclose(np.sqrt(syy / n), 0.0):
         return 0.0
-    return float(np.corrcoef(x, y)[0, 1])
+    return float(np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0))
 
 
 def gini(values) -> float:
     """Gini coefficient in [0, 1] for non-negative values."""
-    x = np.array(list(values), dtype=float)
+    x = _as_array(values)
     if x.size == 0:
         return 0.0
     x = np.clip(x, 0.0, None)
@@ -34,7 +52,12 @@ def gini(values) -> float:
     x = np.sort(x)
     n = x.size
     index = np.arange(1, n + 1)
-    return float((2 * (index * x).sum() / (n * x.sum())) - (n + 1) / n)
+    return gini_from_sums((index * x).sum(), x.sum(), n)
+
+
+def gini_from_sums(weighted, total, n: int) -> float:
+    """Gini z sum po wartościach posortowanych rosnąco: weighted = Σ i * x_(i) (i od 1), total = Σ x."""
+    return float((2 * weighted / (n * total)) - (n + 1) / n)
 
 
 def logistic(z: float) -> float:
@@ -42,6 +65,42 @@ def logistic(z: float) -> float:
     return float(1.0 / (1.0 + np.exp(-z)))
 
 
+def summarize_vassals(s: VassalState, e_min: float, s_min: float, full: bool = True) -> Dict[str, float]:
+    """
+    Wszystkie agregaty kroku w jednym przebiegu po tablicach stanu:
+    średnie zmiennych stanu, gini, korelacja access–Loy, udział wyjścia.
+    full=False: tylko średnie i udział wyjścia (to, czego potrzebuje dynamika) — bez sortowania do gini.
+    """
+    means = s.core.mean(axis=1)
+    out = {f"mean_{var}": float(m) for var, m in zip(STATE_VARS, means)}
+    if full:
+        out["gini_F"] = gini(s.F)
+        out["gini_access"] = gini(s.access_received)
+        out["corr_access_loy"] = safe_corr(s.access_received, s.Loy)
+    bad = int(np.count_nonzero((s.E < e_min) & (s.Sense < s_min)))
+    out["exit_share"] = float(bad / max(1, s.n))
+    return out
+
+
+def summarize_replicas(s: VassalState, e_min, s_min, full: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Jak summarize_vassals, ale dla stanu zespołu (R, n): każdy agregat to wektor (R,).
+    e_min/s_min: skalary albo wektory (R,).
+    """
+    means = s.core.mean(axis=-1)
+    out = {f"mean_{var}": means[k] for k, var in enumerate(STATE_VARS)}
+    R = s.E.shape[0]
+    if full:
+        out["gini_F"] = np.array([gini(s.F[r]) for r in range(R)])
+        out["gini_access"] = np.array([gini(s.access_received[r]) for r in range(R)])
+        out["corr_access_loy"] = np.array([safe_corr(s.access_received[r], s.Loy[r]) for r in range(R)])
+    e_min = np.asarray(e_min, dtype=float).reshape(-1, 1)
+    s_min = np.asarray(s_min, dtype=float).reshape(-1, 1)
+    bad = np.count_nonzero((s.E < e_min) & (s.Sense < s_min), axis=-1)
+    out["exit_share"] = bad / max(1, s.n)
+    return out
+
+
 @dataclass(frozen=True)
 class EndState:
     status: str  # "running" | "reform" | "collapse" | "max_steps"
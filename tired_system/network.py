@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import random
+import sys
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# od tylu węzłów składowe spójne liczy scipy (import ~0.1 s zwraca się dopiero przy dużych sieciach)
+_SCIPY_MIN_N = 50_000
+
+# PeerExits: lokalne sprawdzenie spójności po usunięciu — limit usuwanych naraz i odwiedzonych węzłów
+_LOCAL_MAX = 256
+_SEARCH_BUDGET = 512
+
+
+class PeerCSR:
+    """
+    Sieć peer jako macierz sąsiedztwa CSR (indptr, indices) + wektor stopni.
+    Wiersz i = sąsiedzi wasala V{i}; wagi krawędzi są jednostkowe.
+    """
+
+    __slots__ = ("n", "indptr", "indices", "degree", "_starts", "_nonempty")
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.n = int(self.indptr.size - 1)
+        self.degree = np.diff(self.indptr).astype(np.int32)
+        # reduceat nie obsługuje pustych segmentów — sumujemy tylko po węzłach ze stopniem > 0
+        self._nonempty = np.flatnonzero(self.degree > 0)
+        self._starts = self.indptr[self._nonempty]
+
+    @classmethod
+    def from_graph(cls, graph, n: int) -> "PeerCSR":
+        """Węzły grafu to liczby 0..n-1; kolejność sąsiadów jak w adjacency grafu."""
+        return cls.from_adjacency(graph.adj, n)
+
+    @classmethod
+    def from_adjacency(cls, adj, n: int) -> "PeerCSR":
+        """adj[i] — iterowalne sąsiedztwo węzła i (dict/lista), kolejność zachowana."""
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        indices = []
+        for i in range(n):
+            neigh = adj[i]
+            indices.extend(neigh)
+            indptr[i + 1] = indptr[i] + len(neigh)
+        return cls(indptr, np.array(indices, dtype=np.int32))
+
+    def row_block(self, start: int, stop: int) -> "PeerCSR":
+        """Wiersze [start, stop) z globalnymi indeksami sąsiadów (do liczenia fragmentami populacji)."""
+        lo, hi = self.indptr[start], self.indptr[stop]
+        return PeerCSR(self.indptr[start:stop + 1] - lo, self.indices[lo:hi])
+
+    def neighbor_sum(self, x: np.ndarray) -> np.ndarray:
+        """A @ x po ostatniej osi (x: (..., n_kolumn); wynik: (..., n))."""
+        out = np.zeros(x.shape[:-1] + (self.n,), dtype=x.dtype)
+        if self._nonempty.size:
+            out[..., self._nonempty] = np.add.reduceat(x[..., self.indices], self._starts, axis=-1)
+        return out
+
+    def neighbor_mean(self, x: np.ndarray) -> np.ndarray:
+        """Średnia po sąsiadach; węzły izolowane dostają 0."""
+        out = self.neighbor_sum(x)
+        out[..., self._nonempty] /= self.degree[self._nonempty]
+        return out
+
+
+def _peer_k(n: int, k: int) -> int:
+    k = int(max(2, min(k, n - 1)))
+    if k % 2 == 1:
+        k += 1
+    return k
+
+
+def build_peer_graph(n: int, k: int, p: float, seed: Optional[int]):
+    """Sieć peer wasali: Watts–Strogatz (mała sieć: graf pełny), węzły 0..n-1."""
+    import networkx as nx
+
+    k = _peer_k(n, k)
+    if n < 4:
+        return nx.complete_graph(n)
+    return nx.watts_strogatz_graph(n=n, k=k, p=float(np.clip(p, 0.0, 1.0)), seed=seed)
+
+
+def build_peer_csr(n: int, k: int, p: float, seed: Optional[int]) -> PeerCSR:
+    """
+    PeerCSR.from_graph(build_peer_graph(...)) bez networkx: to samo sąsiedztwo w tej samej kolejności
+    (słowniki odtwarzają kolejność wstawiania krawędzi w nx.Graph), więc sumy po sąsiadach są bit-identyczne.
+    Koszt jak networkx (czysty Python) — dla bardzo dużych sieci watts_strogatz_csr.
+    """
+    k = _peer_k(n, k)
+    if n < 4 or k >= n:
+        # graf pełny (nx.complete_graph): sąsiedzi rosnąco
+        return PeerCSR.from_adjacency([[j for j in range(n) if j != i] for i in range(n)], n)
+    p = float(np.clip(p, 0.0, 1.0))
+    rng = random.Random(seed)
+    rand, choice = rng.random, rng.choice
+    nodes = list(range(n))
+    adj = [dict() for _ in nodes]
+    # kolejność jak w nx.watts_strogatz_graph: najpierw cała krata, potem przepinanie
+    for j in range(1, k // 2 + 1):
+        for u in nodes:
+            v = (u + j) % n
+            adj[u][v] = None
+            adj[v][u] = None
+    for j in range(1, k // 2 + 1):
+        for u in nodes:
+            if rand() < p:
+                w = choice(nodes)
+                while w == u or w in adj[u]:
+                    w = choice(nodes)
+                    if len(adj[u]) >= n - 1:
+                        break
+                else:
+                    v = (u + j) % n
+                    del adj[u][v]
+                    del adj[v][u]
+                    adj[u][w] = None
+                    adj[w][u] = None
+    return PeerCSR.from_adjacency(adj, n)
+
+
+def watts_strogatz_csr(n: int, k: int, p: float, seed: Optional[int]) -> PeerCSR:
+    """
+    Ta sama sieć co build_peer_graph (ten sam zbiór krawędzi dla danego seed), generowana wprost do CSR
+    bez obiektów networkx: krata pierścieniowa jest niejawna (maska usuniętych krawędzi), jawnie trzymamy
+    tylko krawędzie po przepięciu. Losowania jak w nx.watts_strogatz_graph (random.Random(seed):
+    random() na krawędź kraty, choice(nodes) na kandydata). Kolejność sąsiadów: rosnąco po indeksie.
+    """
+    k = _peer_k(n, k)
+    if n < 4 or k >= n:
+        # graf pełny — mały, wystarczy droga przez networkx
+        return PeerCSR.from_graph(build_peer_graph(n, k, p, seed), n)
+    p = float(np.clip(p, 0.0, 1.0))
+    half = k // 2
+    rng = random.Random(seed)
+    rand, choice = rng.random, rng.choice
+    nodes = range(n)
+
+    # krawędź kraty (u, u + j) ma flagę removed[(j - 1) * n + u]; przy k < n krawędzie kraty są różne
+    removed = bytearray(half * n)
+    extra: Dict[int, set] = {}
+    degree = [k] * n
+
+    def has_edge(u: int, w: int) -> bool:
+        d = (w - u) % n
+        if d <= half:
+            if not removed[(d - 1) * n + u]:
+                return True
+        elif n - d <= half:
+            if not removed[(n - d - 1) * n + w]:
+                return True
+        nbrs = extra.get(u)
+        return nbrs is not None and w in nbrs
+
+    for j in range(1, half + 1):
+        base = (j - 1) * n
+        for u in nodes:
+            if rand() < p:
+                w = choice(nodes)
+                while w == u or has_edge(u, w):
+                    w = choice(nodes)
+                    if degree[u] >= n - 1:
+                        break
+                else:
+                    v = (u + j) % n
+                    removed[base + u] = 1
+                    extra.setdefault(u, set()).add(w)
+                    extra.setdefault(w, set()).add(u)
+                    degree[v] -= 1
+                    degree[w] += 1
+
+    # lista krawędzi w obu kierunkach -> CSR posortowany po (wiersz, sąsiad)
+    mask = np.frombuffer(bytes(removed), dtype=np.uint8).reshape(half, n) == 0
+    src = [np.flatnonzero(mask[j - 1]) for j in range(1, half + 1)]
+    dst = [(u + j) % n for j, u in enumerate(src, start=1)]
+    if extra:
+        ex_src = np.fromiter((u for u, nbrs in extra.items() for _ in nbrs), dtype=np.int64)
+        ex_dst = np.fromiter((w for nbrs in extra.values() for w in nbrs), dtype=np.int64)
+    else:
+        ex_src = ex_dst = np.zeros(0, dtype=np.int64)
+    lat_src, lat_dst = np.concatenate(src), np.concatenate(dst)
+    rows = np.concatenate([lat_src, lat_dst, ex_src])
+    cols = np.concatenate([lat_dst, lat_src, ex_dst])
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return PeerCSR(indptr, cols[order].astype(np.int32))
+
+
+def vassal_degree_centrality(peer_degree: np.ndarray, n_lords: int) -> np.ndarray:
+    """
+    Degree centrality wasali w full_graph (peer + jedna krawędź patronażu) bez budowania grafu:
+    (stopień peer + 1) / (liczba węzłów - 1), jak nx.degree_centrality.
+    """
+    n_nodes = peer_degree.size + n_lords
+    if n_nodes <= 1:
+        return np.ones(peer_degree.size)
+    return (peer_degree + 1) * (1.0 / (n_nodes - 1.0))
+
+
+def component_labels(csr: PeerCSR) -> np.ndarray:
+    """
+    Etykiety spójnych składowych sieci CSR (etykieta = najmniejszy indeks w składowej).
+    scipy.sparse.csgraph, jeśli dostępne (dla sieci od _SCIPY_MIN_N węzłów albo gdy scipy jest już
+    zaimportowane); w przeciwnym razie podpinanie korzeni + skracanie ścieżek na NumPy.
+    """
+    n = csr.n
+    try:
+        if n < _SCIPY_MIN_N and "scipy.sparse.csgraph" not in sys.modules:
+            # mała sieć: import scipy kosztuje więcej niż wersja NumPy
+            raise ImportError
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+    except ImportError:
+        pass
+    else:
+        adj = csr_matrix((np.ones(csr.indices.size, dtype=np.int8), csr.indices, csr.indptr), shape=(n, n))
+        _, labels = connected_components(adj, directed=False)
+        # etykiety scipy są numerami składowych — sprowadzamy do najmniejszego indeksu, jak niżej
+        first = np.full(labels.max() + 1 if n else 0, n, dtype=np.int64)
+        np.minimum.at(first, labels, np.arange(n))
+        return first[labels]
+
+    parent = np.arange(n)
+    src = np.repeat(np.arange(n), csr.degree)
+    dst = csr.indices.astype(np.int64)
+    while True:
+        pu, pv = parent[src], parent[dst]
+        differ = pu != pv
+        if not differ.any():
+            return parent
+        # korzeń o większym indeksie podpinamy pod mniejszy, potem skracamy ścieżki do korzeni
+        np.minimum.at(parent, np.maximum(pu[differ], pv[differ]), np.minimum(pu[differ], pv[differ]))
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+
+def giant_component_size(csr: PeerCSR) -> int:
+    if csr.n == 0:
+        return 0
+    return int(np.bincount(component_labels(csr)).max())
+
+
+class PeerExits:
+    """
+    Wyjście wasali z sieci peer: maska `alive`, stopnie liczone po obecnych sąsiadach i rozmiary
+    spójnych składowych obecnych węzłów, utrzymywane przyrostowo (bez BFS po całej sieci).
+    Usunięcie węzłów: stopnie sąsiadów i licznik składowej zmniejszane w O(stopień). Składowa może się
+    rozpaść tylko wtedy, gdy obecni sąsiedzi usuniętego skupiska przestają być połączeni — sprawdzamy to
+    lokalnym przeszukiwaniem (do _SEARCH_BUDGET węzłów). Dopiero gdy lokalnie nie da się tego potwierdzić,
+    etykiety są przebudowywane (union-find, component_labels) przy następnym odczycie. Wynik jest dokładny.
+    """
+
+    __slots__ = ("csr", "alive", "degree", "labels", "sizes", "removed", "rebuilds", "_dirty")
+
+    def __init__(self, csr: PeerCSR, alive: Optional[np.ndarray] = None):
+        self.csr = csr
+        if alive is None:
+            self.alive = np.ones(csr.n, dtype=bool)
+            self.degree = csr.degree.copy()
+        else:
+            # nowa sieć bazowa w trakcie przebiegu: stopnie = liczba obecnych sąsiadów
+            self.alive = np.asarray(alive, dtype=bool).copy()
+            self.degree = csr.neighbor_sum(self.alive.astype(np.int32)) * self.alive
+        self.removed = int(self.alive.size - np.count_nonzero(self.alive))
+        self.rebuilds = 0
+        self._dirty = False
+        self._relabel()
+
+    def _relabel(self) -> None:
+        # etykiety składowych jako kolejne liczby 0..C-1 — max po rozmiarach kosztuje O(C), nie O(n)
+        csr = self.csr if self.removed == 0 else self.active_csr()
+        _, labels = np.unique(component_labels(csr), return_inverse=True)
+        self.labels = labels.astype(np.intp)
+        self.sizes = np.bincount(self.labels[self.alive], minlength=int(self.labels.max(initial=-1)) + 1)
+        self._dirty = False
+
+    def _neighbors(self, idx: np.ndarray) -> np.ndarray:
+        """Sąsiedzi (w sieci bazowej) wszystkich węzłów idx, sklejeni."""
+        counts = self.csr.degree[idx]
+        total = int(counts.sum())
+        if not total:
+            return np.zeros(0, dtype=np.intp)
+        shift = np.repeat(self.csr.indptr[idx] - np.cumsum(counts) + counts, counts)
+        return self.csr.indices[shift + np.arange(total)].astype(np.intp)
+
+    def remove(self, idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Usuwa węzły idx (już usunięte są pomijane); zwraca (usunięte, obecni sąsiedzi ze zmienionym stopniem)."""
+        idx = np.asarray(idx, dtype=np.intp)
+        idx = idx[self.alive[idx]]
+        if not idx.size:
+            return idx, idx
+        self.alive[idx] = False
+        # stopnie zmieniają się tylko u obecnych sąsiadów (usunięci mają stopień 0)
+        neighbors = self._neighbors(idx)
+        neighbors = neighbors[self.alive[neighbors]]
+        np.subtract.at(self.degree, neighbors, 1)
+        self.degree[idx] = 0
+        self.removed += idx.size
+        if not self._dirty:
+            np.subtract.at(self.sizes, self.labels[idx], 1)
+            self._dirty = idx.size > _LOCAL_MAX or not self._still_connected(idx)
+        return idx, np.unique(neighbors)
+
+    def _row(self, u: int) -> List[int]:
+        return self.csr.indices[self.csr.indptr[u]:self.csr.indptr[u + 1]].tolist()
+
+    def _still_connected(self, idx: np.ndarray) -> bool:
+        """
+        Czy po usunięciu idx żadna składowa się nie rozpadła: dla każdego skupiska usuniętych węzłów
+        (spójnego w sieci bazowej) obecni sąsiedzi skupiska muszą być połączeni z pominięciem usuniętych.
+        """
+        removed = set(idx.tolist())
+        parent = {v: v for v in removed}
+
+        def find(v: int) -> int:
+            while parent[v] != v:
+                parent[v] = parent[parent[v]]
+                v = parent[v]
+            return v
+
+        boundary: Dict[int, set] = {}
+        for v in removed:
+            for u in self._row(v):
+                if u in removed:
+                    parent[find(u)] = find(v)
+        for v in removed:
+            boundary.setdefault(find(v), set()).update(u for u in self._row(v) if self.alive[u])
+        alive = self.alive
+        for border in boundary.values():
+            if len(border) < 2:
+                continue
+            start = border.pop()
+            seen, frontier = {start}, [start]
+            while border and frontier:
+                if len(seen) > _SEARCH_BUDGET:
+                    return False
+                nxt = []
+                for u in frontier:
+                    for w in self._row(u):
+                        if w not in seen and alive[w]:
+                            seen.add(w)
+                            nxt.append(w)
+                            border.discard(w)
+                frontier = nxt
+            if border:
+                return False
+        return True
+
+    def neighbor_mean(self, x: np.ndarray) -> np.ndarray:
+        """Średnia po obecnych sąsiadach; usunięci i węzły bez sąsiadów dostają 0."""
+        out = self.csr.neighbor_sum(x * self.alive)
+        linked = self.degree > 0
+        out[linked] /= self.degree[linked]
+        out[~linked] = 0.0
+        return out
+
+    def active_csr(self) -> PeerCSR:
+        """Sieć bez krawędzi usuniętych węzłów (ta sama kolejność sąsiadów)."""
+        rows = np.repeat(np.arange(self.csr.n), self.csr.degree)
+        keep = self.alive[rows] & self.alive[self.csr.indices]
+        indptr = np.zeros(self.csr.n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows[keep], minlength=self.csr.n), out=indptr[1:])
+        return PeerCSR(indptr, self.csr.indices[keep])
+
+    def giant(self) -> int:
+        """Rozmiar największej składowej obecnych węzłów."""
+        if self._dirty:
+            self.rebuilds += 1
+            self._relabel()
+        return int(self.sizes.max(initial=0))
+
+    def copy(self) -> "PeerExits":
+        out = PeerExits.__new__(PeerExits)
+        out.csr = self.csr  # sieć bazowa jest niezmienna
+        for name in ("alive", "degree", "labels", "sizes"):
+            setattr(out, name, getattr(self, name).copy())
+        out.removed, out.rebuilds, out._dirty = self.removed, self.rebuilds, self._dirty
+        return out
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class ModelParams:
+    # populacja / sieć
+    n_vassals: int = 250
+    n_lords: int = 12
+    peer_k: int = 6
+    peer_rewire_p: float = 0.05
+
+    # parametry makro (0..1)
+    I_work: float = 0.6
+    A_affect: float = 0.5
+    R_power: float = 0.6
+    C_conflict: float = 0.6
+    G_regen: float = 0.6
+
+    # wagi / dynamika (0..1)
+    alpha: float = 0.22
+    beta: float = 0.12
+    kappa: float = 0.18
+    gamma: float = 0.22
+    delta: float = 0.12
+    eta: float = 0.20
+    mu: float = 0.20
+    nu: float = 0.16
+    rho: float = 0.08
+    sigma: float = 0.16
+    tau: float = 0.12
+
+    # progi końcowe
+    TH_reform: float = 0.65
+    TH_exit: float = 0.35
+    e_min: float = 0.20
+    s_min: float = 0.20
+
+    # skale techniczne
+    max_steps: int = 400
+    access_scale: int = 10
+    visibility_weight: float = 0.25
+
+    regen_base: float = 0.18
+    regen_work_penalty: float = 0.07
+
+    overload_threshold: float = 1.10
+    overload_scale: float = 0.10
+
+    # rozstrzygnięcie konfliktu (probabilistycznie)
+    rp_threshold: float = 0.35
+    rp_scale: float = 0.10
+
+    # selekcja access
+    w_loy: float = 1.40
+    w_cent: float = 0.60
+    w_perf: float = 1.00
+
+    # wyjście: wasal z E < e_min i Sense < s_min opuszcza sieci peer i patronatu (stan zamrożony)
+    exit_removal: bool = False
+
+    # zmiana patrona: wasal bez access z Loy < switch_loy z prawdopodobieństwem switch_prob przechodzi
+    # do lorda losowanego proporcjonalnie do szansy na access (budżet lorda / liczba jego wasali)
+    patron_switching: bool = False
+    switch_loy: float = 0.30
+    switch_prob: float = 0.05
+
+    # seed
+    seed: Optional[int] = 42
+    # schemat losowań: "sequential" (jeden generator, kolejność wywołań) | "counter" (strumienie
+    # Philox kluczowane (seed, krok, agent, cel) — wynik niezależny od podziału na chunki / procesy)
+    rng_scheme: str = "sequential"
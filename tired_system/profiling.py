@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict
+
+# etapy kroku modelu w kolejności wykonania
+PHASES = (
+    "collective_regen",
+    "affect",
+    "core_update",
+    "access",
+    "loyalty",
+    "patronage",
+    "aggregate",
+    "conflict",
+    "termination",
+    "collect",
+    "exit",
+)
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullProfiler:
+    """Profiler wyłączony: phase() zwraca wspólny, pusty kontekst (koszt jednego wywołania metody)."""
+
+    enabled = False
+
+    def phase(self, name: str) -> _NullPhase:
+        return _NULL_PHASE
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class _Phase:
+    __slots__ = ("prof", "name", "t0", "mem0")
+
+    def __init__(self, prof: "PhaseProfiler", name: str):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self) -> None:
+        if self.prof.track_memory:
+            self.mem0 = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc) -> bool:
+        dt = time.perf_counter() - self.t0
+        prof = self.prof
+        prof.seconds[self.name] = prof.seconds.get(self.name, 0.0) + dt
+        prof.calls[self.name] = prof.calls.get(self.name, 0) + 1
+        if prof.track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            prof.peak_bytes[self.name] = max(prof.peak_bytes.get(self.name, 0), peak - self.mem0)
+            prof.net_bytes[self.name] = prof.net_bytes.get(self.name, 0) + (current - self.mem0)
+        return False
+
+
+class PhaseProfiler:
+    """
+    Skumulowany czas (perf_counter) i liczba wywołań per etap kroku.
+    track_memory=True: dodatkowo tracemalloc — szczyt alokacji w etapie i alokacje netto
+    (spowalnia obliczenia kilkukrotnie; do szukania alokacji, nie do pomiaru czasu).
+    Wyniki z wielu przebiegów (także z innych procesów) łączy merge(stats).
+    """
+
+    enabled = True
+
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.peak_bytes: Dict[str, int] = {}
+        self.net_bytes: Dict[str, int] = {}
+        self.runs = 0
+        self._phases = {name: _Phase(self, name) for name in PHASES}
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def phase(self, name: str) -> _Phase:
+        ph = self._phases.get(name)
+        if ph is None:
+            ph = self._phases[name] = _Phase(self, name)
+        return ph
+
+    def stats(self) -> Dict:
+        """Słownik gotowy do JSON: etapy w kolejności PHASES, potem pozostałe."""
+        names = [n for n in PHASES if n in self.calls] + sorted(n for n in self.calls if n not in PHASES)
+        total = sum(self.seconds.values())
+        phases = {}
+        for name in names:
+            row = {
+                "seconds": self.seconds[name],
+                "calls": self.calls[name],
+                "us_per_call": 1e6 * self.seconds[name] / max(1, self.calls[name]),
+                "share": self.seconds[name] / total if total > 0 else 0.0,
+            }
+            if name in self.peak_bytes:
+                row["peak_bytes"] = self.peak_bytes[name]
+                row["net_bytes"] = self.net_bytes[name]
+            phases[name] = row
+        return {"runs": self.runs, "total_seconds": total, "track_memory": self.track_memory, "phases": phases}
+
+    def merge(self, stats: Dict) -> None:
+        self.runs += stats.get("runs", 0)
+        for name, row in stats["phases"].items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + row["seconds"]
+            self.calls[name] = self.calls.get(name, 0) + row["calls"]
+            if "peak_bytes" in row:
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), row["peak_bytes"])
+                self.net_bytes[name] = self.net_bytes.get(name, 0) + row["net_bytes"]
+
+    def format_table(self) -> str:
+        stats = self.stats()
+        mem = any("peak_bytes" in row for row in stats["phases"].values())
+        header = f"{'phase':<18}{'calls':>9}{'total [s]':>12}{'us/call':>11}{'share':>8}"
+        if mem:
+            header += f"{'peak [KiB]':>12}"
+        lines = [header]
+        for name, row in stats["phases"].items():
+            line = f"{name:<18}{row['calls']:>9}{row['seconds']:>12.4f}{row['us_per_call']:>11.1f}{row['share']:>8.1%}"
+            if mem:
+                line += f"{row.get('peak_bytes', 0) / 1024:>12.1f}"
+            lines.append(line)
+        lines.append(f"{'total':<18}{'':>9}{stats['total_seconds']:>12.4f}   ({stats['runs']} run(s))")
+        return "\n".join(lines)
+
+    def to_json(self, path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.stats(), indent=2))
+        return path
+
+
+def make_profiler(enabled: bool, track_memory: bool = False):
+    return PhaseProfiler(track_memory=track_memory) if enabled else NULL_PROFILER
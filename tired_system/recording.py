@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple, Union
+import numpy as np
+
+from .engine import VassalState, LordState, STATE_VARS, VASSAL_ARRAYS, LORD_ARRAYS
+
+
+STATUSES = ("running", "reform", "collapse", "max_steps")
+
+# kolumny liczbowe szeregów modelu (po "status" i "resolution_event")
+MODEL_COLUMNS = (
+    "A_t",
+    "collective_regen",
+    "ConflictIntensity",
+    "ResolutionPotential",
+    "mean_E",
+    "mean_F",
+    "mean_Sense",
+    "mean_Out",
+    "mean_Fear",
+    "mean_Loy",
+    "mean_Coord",
+    "gini_F",
+    "gini_access",
+    "corr_access_loy",
+    "exit_share",
+)
+
+
+class ModelSeries:
+    """
+    Kolumnowy, prealokowany bufor szeregów modelu: jeden wiersz na zebrany krok.
+    Pojemność to zwykle max_steps + 1 (t=0 + kroki); przy przepełnieniu bufor rośnie.
+    """
+
+    def __init__(self, capacity: int):
+        capacity = max(1, int(capacity))
+        self.step = np.zeros(capacity, dtype=np.int64)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.resolution_event = np.zeros(capacity, dtype=bool)
+        self.values = np.full((capacity, len(MODEL_COLUMNS)), np.nan)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _grow(self) -> None:
+        cap = 2 * self.step.size
+        self.step = np.resize(self.step, cap)
+        self.status = np.resize(self.status, cap)
+        self.resolution_event = np.resize(self.resolution_event, cap)
+        values = np.full((cap, len(MODEL_COLUMNS)), np.nan)
+        values[:self.size] = self.values[:self.size]
+        self.values = values
+
+    def append(self, step: int, status: str, resolution_event: bool, row: Dict[str, float]) -> None:
+        if self.size == self.step.size:
+            self._grow()
+        i = self.size
+        self.step[i] = step
+        self.status[i] = STATUSES.index(status)
+        self.resolution_event[i] = resolution_event
+        self.values[i] = [row[c] for c in MODEL_COLUMNS]
+        self.size += 1
+
+    def clear(self) -> None:
+        """Opróżnia bufor (po zrzucie na dysk); pamięć zostaje zaalokowana."""
+        self.size = 0
+
+    def copy(self) -> "ModelSeries":
+        """Niezależna kopia bufora (ta sama pojemność)."""
+        out = ModelSeries.__new__(ModelSeries)
+        out.step = self.step.copy()
+        out.status = self.status.copy()
+        out.resolution_event = self.resolution_event.copy()
+        out.values = self.values.copy()
+        out.size = self.size
+        return out
+
+    def column(self, name: str) -> np.ndarray:
+        """Widok (bez kopii) na wypełnioną część kolumny liczbowej."""
+        return self.values[:self.size, MODEL_COLUMNS.index(name)]
+
+    def to_frame(self):
+        """DataFrame w układzie DataCollector.get_model_vars_dataframe (indeks = krok)."""
+        import pandas as pd
+
+        n = self.size
+        df = pd.DataFrame(self.values[:n], columns=list(MODEL_COLUMNS), index=pd.Index(self.step[:n]))
+        df.insert(0, "status", np.array(STATUSES, dtype=object)[self.status[:n]])
+        df.insert(1, "resolution_event", self.resolution_event[:n].copy())
+        return df
+
+
+COLLECTION_MODES = ("none", "end", "summary", "full")
+
+
+@dataclass(frozen=True)
+class CollectionPolicy:
+    """
+    Co przebieg zbiera poza EndState (koszt czasu i pamięci):
+    mode: "none" — nic; "end" — jeden wiersz szeregów modelu po ostatnim kroku;
+    "summary" — szeregi modelu, bez danych agentów; "full" — szeregi modelu i dane agentów.
+    every: zapis co k-ty krok (t=0 i ostatni krok zawsze) w trybach summary/full.
+    Kroki bez zapisu liczą tylko agregaty potrzebne dynamice (bez gini i korelacji).
+    """
+    mode: str = "full"
+    every: int = 1
+
+    def __post_init__(self):
+        if self.mode not in COLLECTION_MODES:
+            raise ValueError(f"Nieznany tryb zbierania: {self.mode} (dostępne: {', '.join(COLLECTION_MODES)})")
+        if self.every < 1:
+            raise ValueError("every musi być >= 1")
+
+    @classmethod
+    def parse(cls, text: str) -> "CollectionPolicy":
+        """"none" | "end" | "summary" | "summary:10" | "full" | "full:10"."""
+        mode, _, every = text.partition(":")
+        return cls(mode, int(every) if every else 1)
+
+    @property
+    def agents(self) -> bool:
+        return self.mode == "full"
+
+    def collects(self, step: int, final: bool) -> bool:
+        if self.mode == "none":
+            return False
+        if self.mode == "end":
+            return final
+        return final or step % self.every == 0
+
+    def capacity(self, horizon: int) -> int:
+        """Pojemność bufora ModelSeries dla `horizon` kroków."""
+        if self.mode in ("none", "end"):
+            return 1
+        return horizon // self.every + 2
+
+
+FULL_COLLECTION = CollectionPolicy()
+# przebiegi wsadowe (batch, sweep): wynikiem jest tylko EndState
+NO_COLLECTION = CollectionPolicy("none")
+
+
+@dataclass(frozen=True)
+class AgentRecording:
+    """
+    Specyfikacja zapisu stanu agentów do tablicy (steps, n_vassals, n_vars) float32.
+    variables: zmienne wasali (nazwy z VASSAL_ARRAYS)
+    stride: zapis co k-ty krok (t=0 zawsze)
+    sample: None = wszyscy wasale; int = losowa podpróbka tej wielkości; sekwencja = konkretne indeksy
+    lords: czy zapisywać też lordów (osobna tablica)
+    """
+    variables: Tuple[str, ...] = STATE_VARS + ("access_received",)
+    stride: int = 1
+    sample: Optional[Union[int, Sequence[int]]] = None
+    sample_seed: int = 0
+    lords: bool = False
+
+
+class AgentRecorder:
+    """
+    Prealokowany, kolumnowy zapis stanu wasali (i opcjonalnie lordów).
+    `data[r, a, v]` = zmienna v agenta vassals[a] w r-tym zapisanym kroku (steps[r]).
+    """
+
+    def __init__(self, spec: AgentRecording, n_vassals: int, n_lords: int, max_steps: int):
+        unknown = [v for v in spec.variables if v not in VASSAL_ARRAYS]
+        if unknown:
+            raise ValueError(f"Nieznane zmienne wasali: {unknown}")
+        if spec.stride < 1:
+            raise ValueError("stride musi być >= 1")
+        self.spec = spec
+        self.variables = tuple(spec.variables)
+        self._rows = np.array([VASSAL_ARRAYS.index(v) for v in self.variables], dtype=np.intp)
+
+        if spec.sample is None:
+            self.agents = np.arange(n_vassals)
+        elif isinstance(spec.sample, (int, np.integer)):
+            rng = np.random.default_rng(spec.sample_seed)
+            self.agents = np.sort(rng.choice(n_vassals, size=min(int(spec.sample), n_vassals), replace=False))
+        else:
+            self.agents = np.asarray(spec.sample, dtype=np.intp)
+        self._all_agents = self.agents.size == n_vassals and np.array_equal(self.agents, np.arange(n_vassals))
+
+        capacity = max_steps // spec.stride + 1
+        self.steps = np.zeros(capacity, dtype=np.int64)
+        self.data = np.zeros((capacity, self.agents.size, len(self.variables)), dtype=np.float32)
+        self.lord_data = np.zeros((capacity, n_lords, len(LORD_ARRAYS)), dtype=np.float32) if spec.lords else None
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _grow(self) -> None:
+        cap = 2 * self.steps.size
+        self.steps = np.resize(self.steps, cap)
+        self.data = np.concatenate([self.data, np.zeros_like(self.data)])
+        if self.lord_data is not None:
+            self.lord_data = np.concatenate([self.lord_data, np.zeros_like(self.lord_data)])
+
+    def record(self, step: int, state: VassalState, lord_state: Optional[LordState] = None) -> None:
+        if step % self.spec.stride:
+            return
+        if self.size == self.steps.size:
+            self._grow()
+        i = self.size
+        self.steps[i] = step
+        block = state.data[self._rows]
+        if not self._all_agents:
+            block = block[:, self.agents]
+        self.data[i] = block.T
+        if self.lord_data is not None and lord_state is not None:
+            self.lord_data[i] = np.stack([getattr(lord_state, v) for v in LORD_ARRAYS], axis=1)
+        self.size += 1
+
+    def clear(self) -> None:
+        """Opróżnia bufor (po zrzucie na dysk); pamięć zostaje zaalokowana."""
+        self.size = 0
+
+    def copy(self) -> "AgentRecorder":
+        """Niezależna kopia rejestratora (bufory kopiowane, specyfikacja i indeksy współdzielone)."""
+        out = copy.copy(self)
+        out.steps = self.steps.copy()
+        out.data = self.data.copy()
+        out.lord_data = self.lord_data.copy() if self.lord_data is not None else None
+        return out
+
+    def to_frame(self):
+        """DataFrame (Step, vassal) × zmienne — widok na bufor, bez kopiowania danych."""
+        import pandas as pd
+
+        n = self.size
+        index = pd.MultiIndex.from_product([self.steps[:n], self.agents], names=["Step", "vassal"])
+        flat = self.data[:n].reshape(n * self.agents.size, len(self.variables))
+        return pd.DataFrame(flat, index=index, columns=list(self.variables), copy=False)
+
+    def lords_frame(self):
+        """DataFrame (Step, lord) × parametry lordów (tylko gdy spec.lords)."""
+        import pandas as pd
+
+        if self.lord_data is None:
+            raise ValueError("Zapis lordów jest wyłączony (AgentRecording.lords=False)")
+        n, n_lords = self.size, self.lord_data.shape[1]
+        index = pd.MultiIndex.from_product([self.steps[:n], np.arange(n_lords)], names=["Step", "lord"])
+        flat = self.lord_data[:n].reshape(n * n_lords, len(LORD_ARRAYS))
+        return pd.DataFrame(flat, index=index, columns=list(LORD_ARRAYS), copy=False)
+
+    def to_xarray(self):
+        """xarray.DataArray (step, vassal, var) na buforze (wymaga pakietu xarray)."""
+        import xarray as xr
+
+        n = self.size
+        return xr.DataArray(
+            self.data[:n],
+            dims=("step", "vassal", "var"),
+            coords={"step": self.steps[:n], "vassal": self.agents, "var": list(self.variables)},
+        )
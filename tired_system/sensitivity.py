@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import warnings
+from dataclasses import dataclass, fields
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+
+from .batch import run_end_states, run_replicated_end_states
+from .metrics import EndState
+from .params import ModelParams
+from .presets import PRESETS
+
+# wielkości wyjściowe analizy (status jako kod: collapse=0, dryf/max_steps=1, reform=2)
+OUTPUTS = ("status", "step", "mean_coord", "exit_share")
+STATUS_CODE = {"reform": 2, "running": 1, "max_steps": 1, "collapse": 0}
+
+# domyślne zakresy pól ModelParams (pola całkowite są zaokrąglane)
+DEFAULT_BOUNDS: Dict[str, Tuple[float, float]] = {
+    "peer_k": (2, 20),
+    "peer_rewire_p": (0.0, 1.0),
+    "I_work": (0.0, 1.0),
+    "A_affect": (0.0, 1.0),
+    "R_power": (0.0, 1.0),
+    "C_conflict": (0.0, 1.0),
+    "G_regen": (0.0, 1.0),
+    "alpha": (0.0, 0.5),
+    "beta": (0.0, 0.3),
+    "kappa": (0.0, 0.5),
+    "gamma": (0.0, 0.5),
+    "delta": (0.0, 0.3),
+    "eta": (0.0, 0.5),
+    "mu": (0.0, 0.5),
+    "nu": (0.0, 0.5),
+    "rho": (0.0, 0.3),
+    "sigma": (0.0, 0.4),
+    "tau": (0.0, 0.3),
+    "TH_reform": (0.3, 0.95),
+    "TH_exit": (0.1, 0.7),
+    "e_min": (0.05, 0.4),
+    "s_min": (0.05, 0.4),
+    "access_scale": (1, 30),
+    "visibility_weight": (0.0, 0.5),
+    "regen_base": (0.0, 0.4),
+    "regen_work_penalty": (0.0, 0.15),
+    "overload_threshold": (0.8, 1.4),
+    "overload_scale": (0.0, 0.3),
+    "rp_threshold": (0.1, 0.7),
+    "rp_scale": (0.02, 0.3),
+    "w_loy": (0.0, 3.0),
+    "w_cent": (0.0, 2.0),
+    "w_perf": (0.0, 2.0),
+}
+
+
+@dataclass(frozen=True)
+class ParamSpace:
+    """
+    Hiperprostokąt pól `names` ModelParams; pozostałe pola z `base`.
+    Projekty są w [0, 1]^d, to_params przelicza je na konfiguracje (seed z base — wspólny dla punktów).
+    """
+    base: ModelParams
+    names: Tuple[str, ...]
+    lower: Tuple[float, ...]
+    upper: Tuple[float, ...]
+
+    @property
+    def d(self) -> int:
+        return len(self.names)
+
+    def values(self, unit: np.ndarray) -> np.ndarray:
+        """(m, d) wartości pól dla punktów z [0, 1]^d (pola całkowite zaokrąglone)."""
+        lo, hi = np.array(self.lower), np.array(self.upper)
+        x = lo + np.asarray(unit, dtype=float) * (hi - lo)
+        for k, name in enumerate(self.names):
+            if isinstance(getattr(self.base, name), int):
+                x[:, k] = np.rint(x[:, k])
+        return x
+
+    def to_params(self, unit: np.ndarray) -> List[ModelParams]:
+        ints = [isinstance(getattr(self.base, name), int) for name in self.names]
+        out = []
+        for row in self.values(unit):
+            changes = {name: int(v) if is_int else float(v) for name, v, is_int in zip(self.names, row, ints)}
+            out.append(self.base.__class__(**{**self.base.__dict__, **changes}))
+        return out
+
+
+def parse_bounds(text: Optional[str]) -> Dict[str, Tuple[float, float]]:
+    """Zakresy z tekstu "I_work=0.1:0.9,G_regen=0.2:0.8" (format opcji --bounds skryptów)."""
+    out = {}
+    for item in filter(None, (text or "").split(",")):
+        name, rng = item.split("=")
+        lo, hi = rng.split(":")
+        out[name.strip()] = (float(lo), float(hi))
+    return out
+
+
+def param_space(
+    names: Optional[Sequence[str]] = None,
+    base: Optional[ModelParams] = None,
+    preset: Optional[str] = None,
+    bounds: Optional[Mapping[str, Tuple[float, float]]] = None,
+    spread: Optional[float] = None,
+) -> ParamSpace:
+    """
+    names: pola do analizy (domyślnie wszystkie z DEFAULT_BOUNDS); bounds nadpisuje zakresy.
+    preset: pozostałe pola (i środek zakresów) z PRESETS[preset].
+    spread: zakres wokół wartości bazowej ± spread * szerokość zakresu (przycięty do zakresu).
+    """
+    base = base or ModelParams()
+    if preset:
+        base = base.__class__(**{**base.__dict__, **{k: v for k, v in PRESETS[preset].items() if hasattr(base, k)}})
+    names = tuple(names or DEFAULT_BOUNDS)
+    known = {f.name for f in fields(ModelParams)} - {"seed", "rng_scheme"}
+    ranges = {**DEFAULT_BOUNDS, **(bounds or {})}
+    lower, upper = [], []
+    for name in names:
+        if name not in known:
+            raise ValueError(f"Nieznane pole ModelParams do analizy: {name}")
+        if name not in ranges:
+            raise ValueError(f"Brak zakresu dla {name} (podaj bounds)")
+        lo, hi = ranges[name]
+        if spread is not None:
+            center, half = getattr(base, name), spread * (hi - lo)
+            lo, hi = max(lo, center - half), min(hi, center + half)
+        if not hi > lo:
+            raise ValueError(f"Pusty zakres dla {name}: [{lo}, {hi}]")
+        lower.append(float(lo))
+        upper.append(float(hi))
+    return ParamSpace(base, names, tuple(lower), tuple(upper))
+
+
+# --- próbkowanie ---
+def _primes(k: int) -> List[int]:
+    out, c = [], 2
+    while len(out) < k:
+        if all(c % p for p in out if p * p <= c):
+            out.append(c)
+        c += 1
+    return out
+
+
+def _halton(n: int, d: int, seed: Optional[int]) -> np.ndarray:
+    # ciąg Haltona z losowym przesunięciem (rotacja Cranleya–Pattersona)
+    out = np.zeros((n, d))
+    for j, b in enumerate(_primes(d)):
+        i, f = np.arange(1, n + 1), 1.0
+        while i.any():
+            f /= b
+            out[:, j] += f * (i % b)
+            i //= b
+    return (out + np.random.default_rng(seed).random(d)) % 1.0
+
+
+def unit_sample(n: int, d: int, seed: Optional[int] = None) -> np.ndarray:
+    """
+    n punktów niskiej rozbieżności w [0, 1)^d: scrambled Sobol (scipy.stats.qmc), jeśli dostępny,
+    w przeciwnym razie Halton. Dla Sobola n powinno być potęgą 2.
+    """
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        return _halton(n, d, seed)
+    sampler = qmc.Sobol(d=d, scramble=True, seed=seed)
+    m = int(np.log2(n))
+    return sampler.random_base2(m) if 2 ** m == n else sampler.random(n)
+
+
+def saltelli_design(space: ParamSpace, n: int, seed: Optional[int] = None) -> np.ndarray:
+    """
+    Projekt Saltellego: macierze A, B (n × d) i AB_i (A z kolumną i z B), razem n * (d + 2) punktów
+    w kolejności [A; B; AB_1; ...; AB_d].
+    """
+    d = space.d
+    ab = unit_sample(n, 2 * d, seed)
+    A, B = ab[:, :d], ab[:, d:]
+    blocks = [A, B]
+    for i in range(d):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        blocks.append(AB)
+    return np.vstack(blocks)
+
+
+def _interval(samples: np.ndarray, confidence: float) -> Tuple[np.ndarray, np.ndarray]:
+    q = 100.0 * (1.0 - confidence) / 2.0
+    with warnings.catch_warnings():
+        # wszystkie próby NaN (wyjście stałe w próbie) — przedział NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanpercentile(samples, q, axis=0), np.nanpercentile(samples, 100.0 - q, axis=0)
+
+
+def _sobol_from_blocks(fA: np.ndarray, fB: np.ndarray, fAB: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # fA, fB: (..., n); fAB: (d, ..., n). S1 — Saltelli (2010), ST — Jansen (1999)
+    var = np.concatenate([fA, fB], axis=-1).var(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        S1 = np.mean(fB * (fAB - fA), axis=-1) / var
+        ST = 0.5 * np.mean((fA - fAB) ** 2, axis=-1) / var
+    return S1, ST
+
+
+def sobol_indices(
+    y: np.ndarray, n: int, d: int, bootstrap: int = 500, confidence: float = 0.95, seed: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Indeksy pierwszego rzędu (S1) i całkowite (ST) z wyników projektu saltelli_design (y: n * (d + 2)),
+    z przedziałami bootstrap (percentylowe; losowanie wierszy A/B/AB_i ze zwracaniem).
+    Wyjście stałe w całym projekcie — indeksy NaN.
+    """
+    y = np.asarray(y, dtype=float)
+    fA, fB, fAB = y[:n], y[n:2 * n], y[2 * n:].reshape(d, n)
+    S1, ST = _sobol_from_blocks(fA, fB, fAB)
+    out = {"S1": S1, "ST": ST}
+    if bootstrap:
+        idx = np.random.default_rng(seed).integers(0, n, size=(bootstrap, n))
+        S1_b, ST_b = _sobol_from_blocks(fA[idx], fB[idx], fAB[:, idx])
+        out["S1_lo"], out["S1_hi"] = _interval(S1_b.T, confidence)
+        out["ST_lo"], out["ST_hi"] = _interval(ST_b.T, confidence)
+    return out
+
+
+def morris_design(
+    space: ParamSpace, trajectories: int, levels: int = 4, seed: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Trajektorie Morrisa (one-at-a-time) na siatce `levels` poziomów, krok delta = levels / (2 (levels - 1)).
+    Zwraca punkty (r * (d + 1), d), kolejność zmienianych pól (r, d) i znaki kroków (r, d).
+    """
+    d, rng = space.d, np.random.default_rng(seed)
+    delta = levels / (2.0 * (levels - 1))
+    grid = np.arange(levels) / (levels - 1)
+    points, order, signs = [], np.zeros((trajectories, d), dtype=np.intp), np.zeros((trajectories, d))
+    for t in range(trajectories):
+        sign = rng.choice([-1.0, 1.0], size=d)
+        # start tak, by krok ±delta nie wychodził poza [0, 1]
+        x = np.array([rng.choice(grid[grid <= 1.0 - delta + 1e-12] if s > 0 else grid[grid >= delta - 1e-12]) for s in sign])
+        order[t], signs[t] = rng.permutation(d), sign
+        points.append(x.copy())
+        for i in order[t]:
+            x[i] += sign[i] * delta
+            points.append(x.copy())
+    return np.array(points), order, signs
+
+
+def morris_indices(
+    y: np.ndarray,
+    order: np.ndarray,
+    signs: np.ndarray,
+    levels: int = 4,
+    bootstrap: int = 500,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Efekty elementarne w skali [0, 1] zakresu: mu, mu_star (średni |EE|), sigma, z przedziałem bootstrap
+    dla mu_star (losowanie trajektorii ze zwracaniem).
+    """
+    r, d = order.shape
+    delta = levels / (2.0 * (levels - 1))
+    y = np.asarray(y, dtype=float).reshape(r, d + 1)
+    ee = np.zeros((r, d))
+    rows = np.arange(r)[:, None]
+    ee[rows, order] = np.diff(y, axis=1) / (signs[rows, order] * delta)
+    out = {"mu": ee.mean(axis=0), "mu_star": np.abs(ee).mean(axis=0), "sigma": ee.std(axis=0, ddof=1) if r > 1 else np.zeros(d)}
+    if bootstrap:
+        idx = np.random.default_rng(seed).integers(0, r, size=(bootstrap, r))
+        out["mu_star_lo"], out["mu_star_hi"] = _interval(np.abs(ee[idx]).mean(axis=1), confidence)
+    return out
+
+
+# --- ewaluacja ---
+def end_state_outputs(ends: Sequence[EndState]) -> np.ndarray:
+    """(len(ends), len(OUTPUTS)) — wartości wyjść dla listy stanów końcowych."""
+    return np.array(
+        [[STATUS_CODE.get(e.status, 1), e.step, e.mean_coord, e.exit_share] for e in ends], dtype=float
+    ).reshape(-1, len(OUTPUTS))
+
+
+def evaluate(space: ParamSpace, unit: np.ndarray, replicas: int = 1, **kwargs) -> np.ndarray:
+    """
+    Wyjścia (m, len(OUTPUTS)) dla punktów projektu; replicas > 1 — średnia z replik (zespół na punkt).
+    kwargs: jak run_end_states (workers, chunksize, progress, label, cache).
+    """
+    params = space.to_params(unit)
+    if replicas > 1:
+        ensembles = run_replicated_end_states(params, replicas, **kwargs)
+        return np.stack([end_state_outputs(ends).mean(axis=0) for ends in ensembles])
+    return end_state_outputs(run_end_states(params, **kwargs))
@@ -0,0 +1,557 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .params import ModelParams
+from .presets import PRESETS
+
+# Protokół: NDJSON (jeden obiekt JSON na linię) przez gniazdo Unix albo TCP na localhost.
+#   -> {"op": "run", "id": 1, "preset": "dryf", "params": {"n_vassals": 100}, "series": false}
+#   -> {"op": "batch", "id": 2, "runs": [{"params": {...}}, {"preset": "reforma"}, ...]}
+#   -> {"op": "cancel", "id": 2} | {"op": "ping"} | {"op": "stats"} | {"op": "shutdown"}
+#   <- {"id": 1, "event": "result", "index": 0, "end_state": {...}, "series": {...}}
+#   <- {"id": 1, "event": "done", "runs": 1, "errors": 0, "seconds": 0.12}
+# Każde żądanie run/batch kończy dokładnie jedno zdarzenie: done, cancelled albo error.
+
+TERMINAL_EVENTS = ("done", "cancelled", "error")
+LINE_LIMIT = 1 << 24
+
+
+def params_from_request(item: Dict) -> ModelParams:
+    """ModelParams z żądania: domyślne, potem preset ("preset"), potem pola z "params"."""
+    known = {f.name for f in fields(ModelParams)}
+    values: Dict = {}
+    preset = item.get("preset")
+    if preset is not None:
+        if preset not in PRESETS:
+            raise ValueError(f"Nieznany preset: {preset}")
+        values.update({k: v for k, v in PRESETS[preset].items() if k in known})
+    overrides = item.get("params") or {}
+    unknown = sorted(set(overrides) - known)
+    if unknown:
+        raise ValueError(f"Nieznane pola ModelParams: {', '.join(unknown)}")
+    values.update(overrides)
+    return ModelParams(**values)
+
+
+def series_payload(series) -> Dict[str, list]:
+    """ModelSeries jako kolumny JSON (NaN -> null)."""
+    from .recording import MODEL_COLUMNS, STATUSES
+
+    n = series.size
+    out: Dict[str, list] = {
+        "step": series.step[:n].tolist(),
+        "status": [STATUSES[s] for s in series.status[:n]],
+        "resolution_event": series.resolution_event[:n].tolist(),
+    }
+    for k, name in enumerate(MODEL_COLUMNS):
+        out[name] = [None if math.isnan(v) else v for v in series.values[:n, k].tolist()]
+    return out
+
+
+# --- procesy robocze ---
+def _warm() -> None:
+    # importy rdzenia raz na proces — kolejne przebiegi startują od razu
+    from . import core  # noqa: F401
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run_chunk(jobs: Sequence[Tuple[ModelParams, bool]]) -> list:
+    """Przebiegi paczki: (EndState, ModelSeries albo None) lub tekst błędu dla każdego zadania."""
+    from .core import TiredSystemCore
+    from .recording import FULL_COLLECTION, NO_COLLECTION
+
+    out = []
+    for params, with_series in jobs:
+        try:
+            model = TiredSystemCore(params, collection=FULL_COLLECTION if with_series else NO_COLLECTION)
+            end = model.run()
+            out.append((end, model.series if with_series else None))
+        except Exception as exc:
+            out.append(f"{type(exc).__name__}: {exc}")
+    return out
+
+
+@dataclass
+class _Job:
+    params: ModelParams
+    series: bool
+    future: asyncio.Future
+
+
+class _Connection:
+    def __init__(self, writer: asyncio.StreamWriter, max_requests: int):
+        self.writer = writer
+        self.lock = asyncio.Lock()
+        self.tasks: Dict[object, asyncio.Task] = {}
+        # liczone żądania i żądania czekające na miejsce (czytanie połączenia staje dopiero, gdy obie pule są pełne)
+        self.slots = asyncio.Semaphore(max_requests)
+        self.waiting = asyncio.Semaphore(max_requests)
+
+    async def send(self, msg: Dict) -> None:
+        data = (json.dumps(msg, separators=(",", ":")) + "\n").encode()
+        async with self.lock:
+            self.writer.write(data)
+            # back-pressure wyjścia: czekamy, aż klient odbierze dane
+            await self.writer.drain()
+
+
+class SimulationServer:
+    """
+    Długo żyjący serwer symulacji: pula `workers` procesów z zaimportowanym modelem przyjmuje
+    żądania z wielu połączeń i strumieniuje wyniki (EndState, opcjonalnie szeregi modelu).
+
+    Paczkowanie: oczekujące przebiegi ze wszystkich żądań trafiają do wspólnej kolejki; wolny proces
+    dostaje naraz do `max_batch` z nich (mniej, gdy kolejka jest krótka — praca rozkłada się na procesy).
+    W procesach jest najwyżej `workers` paczek, reszta czeka w kolejce, więc anulowanie usuwa ją od razu
+    (paczki już liczone kończą się, ich wyniki są odrzucane).
+    Back-pressure: najwyżej `max_pending` przyjętych przebiegów na serwer (żądanie batch czeka na miejsce)
+    i `max_requests` liczonych żądań na połączenie; kolejne czekają na miejsce (można je anulować), a gdy
+    czeka także `max_requests`, serwer przestaje czytać połączenie. cancel/ping nie czekają na miejsce.
+    cache: ResultCache — trafienia bez symulacji, nowe wyniki zapisywane. SQLite działa w osobnym wątku,
+    więc zajęta blokada zapisu nie wstrzymuje pętli zdarzeń.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_batch: int = 16,
+        max_pending: int = 1024,
+        max_requests: int = 256,
+        cache=None,
+    ):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_batch = max(1, max_batch)
+        self.max_pending = max(1, max_pending)
+        self.max_requests = max(1, max_requests)
+        self.cache = cache
+        self.stats: Dict[str, int] = dict(requests=0, runs=0, batches=0, cached=0, errors=0, cancelled=0)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cache_thread: Optional[ThreadPoolExecutor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._closed: Optional[asyncio.Event] = None
+        self._path: Optional[str] = None
+        self._next_id = 0
+
+    def _make_pool(self) -> ProcessPoolExecutor:
+        import multiprocessing as mp
+
+        return ProcessPoolExecutor(self.workers, mp_context=mp.get_context("spawn"), initializer=_warm)
+
+    async def start(self, path: Optional[str] = None, host: str = "127.0.0.1", port: Optional[int] = None) -> None:
+        """Uruchamia procesy robocze (czeka na ich import) i nasłuchuje na gnieździe `path` albo host:port."""
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._pending = asyncio.Semaphore(self.max_pending)
+        self._closed = asyncio.Event()
+        self._pool = self._make_pool()
+        if self.cache is not None:
+            # jedno połączenie SQLite, zawsze z tego samego wątku
+            self._cache_thread = ThreadPoolExecutor(1, thread_name_prefix="result-cache")
+        await asyncio.gather(*[loop.run_in_executor(self._pool, _ping) for _ in range(self.workers)])
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        if path is not None:
+            if os.path.exists(path):
+                os.unlink(path)
+            self._path = path
+            self._server = await asyncio.start_unix_server(self._handle, path=path, limit=LINE_LIMIT)
+        else:
+            self._server = await asyncio.start_server(self._handle, host=host, port=port or 0, limit=LINE_LIMIT)
+
+    @property
+    def address(self):
+        """Ścieżka gniazda albo (host, port) — przy port=0 port wybrany przez system."""
+        return self._path or self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        await self._closed.wait()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._cache_thread is not None:
+            # zaległe zapisy kończą się przed zamknięciem połączenia (kolejka wątku jest FIFO)
+            thread, self._cache_thread = self._cache_thread, None
+            await asyncio.get_running_loop().run_in_executor(thread, self.cache.close)
+            thread.shutdown(wait=False)
+        if self._path and os.path.exists(self._path):
+            os.unlink(self._path)
+        self._closed.set()
+
+    # --- kolejka i paczki ---
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            chunk: List[_Job] = []
+            while not chunk:
+                job = await self._queue.get()
+                if not job.future.done():
+                    chunk.append(job)
+            # paczka tym większa, im dłuższa kolejka (do max_batch), by nie zająć jednego procesu wszystkim
+            size = min(self.max_batch, 1 + self._queue.qsize() // self.workers)
+            while len(chunk) < size and not self._queue.empty():
+                job = self._queue.get_nowait()
+                if not job.future.done():
+                    chunk.append(job)
+            self.stats["batches"] += 1
+            fut = loop.run_in_executor(self._pool, _run_chunk, [(j.params, j.series) for j in chunk])
+            fut.add_done_callback(lambda f, chunk=chunk: self._chunk_done(chunk, f))
+
+    def _chunk_done(self, chunk: List[_Job], fut: asyncio.Future) -> None:
+        self._slots.release()
+        exc = None if fut.cancelled() else fut.exception()
+        if fut.cancelled() or exc is not None:
+            if isinstance(exc, BrokenProcessPool) and self._server is not None and self._server.is_serving():
+                # proces roboczy padł (np. brak pamięci): nowa pula dla kolejnych paczek
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._make_pool()
+            results = [f"{type(exc).__name__}: {exc}"] * len(chunk)
+        else:
+            results = fut.result()
+        for job, res in zip(chunk, results):
+            if not job.future.done():
+                job.future.set_result(res)
+
+    # --- połączenia i żądania ---
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        conn = _Connection(writer, self.max_requests)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    msg = json.loads(line)
+                    if not isinstance(msg, dict):
+                        raise ValueError("żądanie musi być obiektem JSON")
+                except ValueError as exc:
+                    await conn.send({"event": "error", "error": f"invalid request: {exc}"})
+                    continue
+                await self._dispatch_op(conn, msg)
+        except ConnectionError:
+            pass
+        finally:
+            for task in list(conn.tasks.values()):
+                task.cancel()
+            writer.close()
+
+    async def _dispatch_op(self, conn: _Connection, msg: Dict) -> None:
+        op = msg.get("op", "run")
+        rid = msg.get("id")
+        if op in ("run", "batch"):
+            if rid is None:
+                self._next_id += 1
+                rid = msg["id"] = f"auto-{self._next_id}"
+            if rid in conn.tasks:
+                await conn.send({"id": rid, "event": "error", "error": "duplicate request id"})
+                return
+            await conn.waiting.acquire()
+            conn.tasks[rid] = asyncio.create_task(self._request(conn, rid, msg))
+            # zadanie dochodzi do oczekiwania na miejsce, zanim przeczytamy następne cancel
+            await asyncio.sleep(0)
+        elif op == "cancel":
+            task = conn.tasks.get(rid)
+            if task is not None:
+                task.cancel()
+            else:
+                await conn.send({"id": rid, "event": "error", "error": "unknown request id"})
+        elif op == "ping":
+            await conn.send({"id": rid, "event": "pong"})
+        elif op == "stats":
+            await conn.send({"id": rid, "event": "stats", "workers": self.workers, "queued": self._queue.qsize(), **self.stats})
+        elif op == "shutdown":
+            await conn.send({"id": rid, "event": "shutdown"})
+            asyncio.get_running_loop().call_soon(lambda: asyncio.ensure_future(self.close()))
+        else:
+            await conn.send({"id": rid, "event": "error", "error": f"unknown op: {op}"})
+
+    async def _request(self, conn: _Connection, rid, msg: Dict) -> None:
+        try:
+            try:
+                await conn.slots.acquire()
+            finally:
+                conn.waiting.release()
+        except asyncio.CancelledError:
+            # anulowane przed startem
+            conn.tasks.pop(rid, None)
+            self.stats["cancelled"] += 1
+            try:
+                await conn.send({"id": rid, "event": "cancelled", "completed": 0})
+            except (ConnectionError, RuntimeError):
+                pass
+            return
+        try:
+            await self._serve_request(conn, rid, msg)
+        finally:
+            conn.slots.release()
+            conn.tasks.pop(rid, None)
+
+    async def _serve_request(self, conn: _Connection, rid, msg: Dict) -> None:
+        t0 = time.perf_counter()
+        self.stats["requests"] += 1
+        jobs: List[_Job] = []
+        feeder = None
+        done_q: asyncio.Queue = asyncio.Queue()
+        try:
+            items = msg.get("runs") if msg.get("op") == "batch" else [msg]
+            if not isinstance(items, list):
+                raise ValueError("batch: brak listy 'runs'")
+            runs = [(params_from_request(item), bool(item.get("series", msg.get("series", False)))) for item in items]
+        except (TypeError, ValueError, AttributeError) as exc:
+            await conn.send({"id": rid, "event": "error", "error": str(exc)})
+            return
+
+        loop = asyncio.get_running_loop()
+
+        async def feed() -> None:
+            for i, (params, with_series) in enumerate(runs):
+                hit = await self._cached(params, with_series)
+                if hit is not None:
+                    done_q.put_nowait((i, hit, True))
+                    continue
+                await self._pending.acquire()
+                job = _Job(params, with_series, loop.create_future())
+                job.future.add_done_callback(lambda f: self._pending.release())
+                job.future.add_done_callback(lambda f, i=i: f.cancelled() or done_q.put_nowait((i, f.result(), False)))
+                jobs.append(job)
+                self._queue.put_nowait(job)
+
+        errors = sent = 0
+        stores: List[asyncio.Future] = []
+        try:
+            feeder = asyncio.create_task(feed())
+            for _ in range(len(runs)):
+                i, res, cached = await done_q.get()
+                event: Dict = {"id": rid, "event": "result", "index": i}
+                if isinstance(res, str):
+                    errors += 1
+                    event["error"] = res
+                else:
+                    end, series = res
+                    event["end_state"] = asdict(end)
+                    if runs[i][1]:
+                        event["series"] = series_payload(series)
+                    if cached:
+                        event["cached"] = True
+                await conn.send(event)
+                sent += 1
+                if not isinstance(res, str) and not cached and self._cache_thread is not None:
+                    # zapis do cache w tle (wątek cache) — kolejne wyniki nie czekają na SQLite
+                    stores.append(self._store(runs[i][0], *res))
+            await feeder
+            self.stats["runs"] += len(runs)
+            self.stats["errors"] += errors
+            await conn.send({"id": rid, "event": "done", "runs": len(runs), "errors": errors, "seconds": time.perf_counter() - t0})
+            # na zapisy czekamy dopiero po "done" — odpowiedź nie czeka na SQLite
+            await asyncio.gather(*stores)
+        except asyncio.CancelledError:
+            if feeder is not None:
+                feeder.cancel()
+            for job in jobs:
+                job.future.cancel()
+            self.stats["cancelled"] += 1
+            try:
+                await conn.send({"id": rid, "event": "cancelled", "completed": sent})
+            except (ConnectionError, RuntimeError):
+                pass
+        except ConnectionError:
+            for job in jobs:
+                job.future.cancel()
+
+    def _cache_lookup(self, params: ModelParams, with_series: bool):
+        # wątek cache
+        end = self.cache.get(params)
+        if end is None:
+            return None
+        series = self.cache.get_series(params) if with_series else None
+        if with_series and series is None:
+            return None
+        return end, series
+
+    async def _cached(self, params: ModelParams, with_series: bool):
+        if self._cache_thread is None:
+            return None
+        loop = asyncio.get_running_loop()
+        hit = await loop.run_in_executor(self._cache_thread, self._cache_lookup, params, with_series)
+        if hit is not None:
+            self.stats["cached"] += 1
+        return hit
+
+    def _store(self, params: ModelParams, end, series) -> asyncio.Future:
+        """Zapis do cache zlecony wątkowi cache (bez czekania); zapisy wykonują się w kolejności zlecenia."""
+        return asyncio.get_running_loop().run_in_executor(self._cache_thread, self.cache.put, params, end, series)
+
+
+async def serve(
+    path: Optional[str] = None,
+    host: str = "127.0.0.1",
+    port: Optional[int] = None,
+    **kwargs,
+) -> None:
+    """Uruchamia SimulationServer do komendy shutdown albo SIGINT/SIGTERM."""
+    import signal
+
+    server = SimulationServer(**kwargs)
+    await server.start(path=path, host=host, port=port)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, lambda: asyncio.ensure_future(server.close()))
+        except NotImplementedError:
+            pass
+    print(f"Serving on {server.address} ({server.workers} workers)", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+# --- klient ---
+def _request_item(params=None, preset: Optional[str] = None, series: bool = False) -> Dict:
+    item: Dict = {}
+    if isinstance(params, ModelParams):
+        params = asdict(params)
+    if params:
+        item["params"] = dict(params)
+    if preset is not None:
+        item["preset"] = preset
+    if series:
+        item["series"] = True
+    return item
+
+
+class ServiceClient:
+    """
+    Synchroniczny klient SimulationServer (bez importu modelu): jedno żądanie naraz na połączenie.
+    Wyniki: zdarzenia "result" z "end_state" jako EndState.
+    """
+
+    def __init__(self, path: Optional[str] = None, host: str = "127.0.0.1", port: Optional[int] = None, timeout: Optional[float] = None):
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.sock.settimeout(timeout)
+        self._file = self.sock.makefile("rb")
+        self._next_id = 0
+
+    def close(self) -> None:
+        self._file.close()
+        self.sock.close()
+
+    def __enter__(self) -> "ServiceClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def send(self, msg: Dict) -> None:
+        self.sock.sendall((json.dumps(msg, separators=(",", ":")) + "\n").encode())
+
+    def receive(self) -> Dict:
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("serwer zamknął połączenie")
+        event = json.loads(line)
+        if "end_state" in event:
+            from .metrics import EndState
+
+            event["end_state"] = EndState(**event["end_state"])
+        return event
+
+    def _new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def events(self, msg: Dict) -> Iterator[Dict]:
+        """Wysyła żądanie i zwraca jego zdarzenia do końcowego włącznie; przerwanie iteracji anuluje żądanie."""
+        rid = msg.setdefault("id", self._new_id())
+        self.send(msg)
+        finished = False
+        try:
+            while True:
+                event = self.receive()
+                if event.get("id") != rid:
+                    continue
+                finished = event["event"] in TERMINAL_EVENTS
+                yield event
+                if finished:
+                    return
+        finally:
+            if not finished:
+                self.send({"op": "cancel", "id": rid})
+                while self.receive().get("event") not in TERMINAL_EVENTS:
+                    pass
+
+    def run(self, params=None, preset: Optional[str] = None, series: bool = False) -> Dict:
+        """
+        Jeden przebieg; zdarzenie "result" (end_state, opcjonalnie series).
+        Błąd przebiegu, anulowanie albo koniec żądania bez wyniku — RuntimeError.
+        """
+        result, last = None, None
+        for event in self.events({"op": "run", **_request_item(params, preset, series)}):
+            last = event["event"]
+            if last == "result":
+                result = event
+            elif last == "error":
+                raise RuntimeError(event["error"])
+        if result is None:
+            raise RuntimeError(f"Żądanie zakończone bez wyniku (zdarzenie: {last})")
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+
+    def batch(self, runs: Sequence, series: bool = False) -> Iterator[Dict]:
+        """
+        Wiele przebiegów jednym żądaniem; zdarzenia "result" w kolejności ukończenia (pole "index").
+        runs: ModelParams albo słowniki {"params": ..., "preset": ...}.
+        """
+        items = [r if isinstance(r, dict) else _request_item(r) for r in runs]
+        for event in self.events({"op": "batch", "runs": items, "series": series}):
+            if event["event"] == "result":
+                yield event
+            elif event["event"] == "error":
+                raise RuntimeError(event["error"])
+
+    def ping(self) -> bool:
+        return self._control("ping")["event"] == "pong"
+
+    def stats(self) -> Dict:
+        return self._control("stats")
+
+    def shutdown(self) -> None:
+        self._control("shutdown")
+
+    def _control(self, op: str) -> Dict:
+        rid = self._new_id()
+        self.send({"op": op, "id": rid})
+        while True:
+            event = self.receive()
+            if event.get("id") == rid:
+                return event
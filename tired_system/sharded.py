@@ -0,0 +1,534 @@
+from __future__ import annotations
+
+import math
+import multiprocessing as mp
+import os
+import traceback
+import weakref
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from .engine import (
+    VassalParams,
+    VassalState,
+    LordState,
+    LORD_ARRAYS,
+    VASSAL_ARRAYS,
+    STATE_VARS,
+    access_budget,
+    access_keys,
+    select_by_lord,
+    switch_candidates,
+    update_core_states,
+    update_loyalty_after_access,
+)
+from .metrics import EndState, corr_from_sums, gini_from_sums
+from .model import TiredSystemModel
+from .network import PeerCSR
+from .params import ModelParams
+from .profiling import PhaseProfiler
+from .recording import AgentRecording, CollectionPolicy
+from .snapshot import ModelSnapshot
+from .streams import CounterStreams
+
+# NumPy sumuje ciągłe tablice parami: zakres > 128 dzieli na połowy (wyrównane do 8), krótszy liczy w jednej pętli
+_PW_BLOCK = 128
+
+
+def _pairwise_split(n: int) -> int:
+    n2 = n // 2
+    return n2 - n2 % 8
+
+
+def pairwise_leaves(n: int, depth: int) -> List[Tuple[int, int]]:
+    """
+    Liście drzewa sumowania parami NumPy (np.add.reduce) do głębokości `depth`, jako zakresy [a, b).
+    Suma liścia to np.add.reduce na jego wycinku, a pairwise_combine składa liście w kolejności NumPy —
+    wynik jest bit-identyczny z sumą całej tablicy.
+    """
+    leaves: List[Tuple[int, int]] = []
+
+    def split(start: int, size: int, d: int) -> None:
+        if d == 0 or size <= _PW_BLOCK:
+            leaves.append((start, start + size))
+            return
+        half = _pairwise_split(size)
+        split(start, half, d - 1)
+        split(start + half, size - half, d - 1)
+
+    split(0, n, depth)
+    return leaves
+
+
+def pairwise_combine(n: int, depth: int, sums: Sequence):
+    """Składa sumy liści (skalary albo wektory — wtedy po elementach) tak jak np.add.reduce całości."""
+    it = iter(sums)
+
+    def combine(size: int, d: int):
+        if d == 0 or size <= _PW_BLOCK:
+            return next(it)
+        half = _pairwise_split(size)
+        left = combine(half, d - 1)
+        return left + combine(size - half, d - 1)
+
+    return combine(n, depth)
+
+
+def _mean_from_sum(total, n: int):
+    # jak np.mean: suma w typie tablicy, dzielenie przez licznik intp, wynik rzutowany na typ tablicy
+    return np.asarray(total / np.intp(n)).astype(np.asarray(total).dtype)
+
+
+# --- scalanie posortowanych fragmentów (gini po całej populacji) ---
+_SIGN = 0x7FFF_FFFF_FFFF_FFFF
+
+
+def _float_key(x: float) -> int:
+    """Liczba całkowita o tym samym porządku co float64 (-0.0 tuż przed +0.0)."""
+    i = int(np.float64(x).view(np.int64))
+    return i if i >= 0 else -1 - (i & _SIGN)
+
+
+def _key_float(k: int) -> np.float64:
+    i = k if k >= 0 else (-1 - k) - (1 << 63)
+    return np.int64(i).view(np.float64)
+
+
+def rank_cuts(runs: Sequence[np.ndarray], p: int) -> np.ndarray:
+    """
+    Podział p najmniejszych elementów między posortowane fragmenty: cuts[r] elementów z początku runs[r].
+    Wartości runs[r][:cuts[r]] tworzą (jako multizbiór) początek globalnie posortowanej tablicy długości p.
+    """
+    lens = np.array([r.size for r in runs], dtype=np.int64)
+    if p <= 0:
+        return np.zeros_like(lens)
+    if p >= lens.sum():
+        return lens
+    # p-ty element (od 0): najmniejsze v z count(x <= v) > p — bisekcja po kluczach całkowitych
+    lo = min(_float_key(r[0]) for r in runs if r.size)
+    hi = max(_float_key(r[-1]) for r in runs if r.size)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        v = _key_float(mid)
+        if sum(int(np.searchsorted(r, v, "right")) for r in runs) > p:
+            hi = mid
+        else:
+            lo = mid + 1
+    v = _key_float(lo)
+    below = np.array([np.searchsorted(r, v, "left") for r in runs], dtype=np.int64)
+    equal = np.array([np.searchsorted(r, v, "right") for r in runs], dtype=np.int64) - below
+    # remisy (równe wartości) bierzemy z kolejnych fragmentów — suma wartości się nie zmienia
+    need = p - int(below.sum())
+    take = np.minimum(equal, np.maximum(0, need - (np.cumsum(equal) - equal)))
+    return below + take
+
+
+class SharedArrays:
+    """
+    Nazwane tablice w jednym bloku multiprocessing.shared_memory. Właściciel (name=None) tworzy blok
+    i usuwa go w close(); procesy robocze (spawn — wspólny resource_tracker z właścicielem)
+    podłączają się po nazwie i tym samym spec.
+    """
+
+    def __init__(self, spec: Dict[str, Tuple[Tuple[int, ...], str]], name: Optional[str] = None):
+        self.spec = spec
+        offsets, size = {}, 0
+        for key, (shape, dtype) in spec.items():
+            size = -(-size // 64) * 64
+            offsets[key] = size
+            size += int(np.prod(shape)) * np.dtype(dtype).itemsize
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=max(1, size) if self.owner else 0)
+        self.arrays = {
+            key: np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offsets[key])
+            for key, (shape, dtype) in spec.items()
+        }
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    def close(self) -> None:
+        self.arrays = {}
+        try:
+            self.shm.close()
+        except BufferError:
+            # widoki trzymane poza modelem — mapowanie zniknie razem z nimi
+            pass
+        if self.owner:
+            self.shm.unlink()
+
+
+# --- proces roboczy: fragment [start, stop) populacji ---
+class _Shard:
+    def __init__(self, shared: SharedArrays, params: ModelParams, start: int, stop: int, leaves, bounds):
+        self.p = params
+        self.start, self.stop = start, stop
+        self.leaves = [(a - start, b - start) for a, b in leaves]
+        self.bounds = bounds
+        self.sh = shared
+        self.state = VassalState.view(shared["state"][:, start:stop])
+        lords = LordState.__new__(LordState)
+        lords._bind(shared["lords"])
+        self.lords = lords
+        self.patron = shared["patron"][start:stop]
+        self.csr = PeerCSR(shared["indptr"], shared["indices"]).row_block(start, stop)
+        self.streams = CounterStreams(params.seed) if params.rng_scheme == "counter" else None
+        p = params
+        self.vp = VassalParams(
+            alpha=p.alpha, beta=p.beta, kappa=p.kappa, gamma=p.gamma, delta=p.delta, eta=p.eta,
+            mu=p.mu, nu=p.nu, rho=p.rho, sigma=p.sigma, tau=p.tau,
+        )
+
+    def _leaf_sums(self, x: np.ndarray) -> np.ndarray:
+        return np.array([np.add.reduce(x[a:b]) for a, b in self.leaves], dtype=x.dtype)
+
+    def support(self) -> None:
+        s = self.state
+        self.sh["support"][self.start:self.stop] = (1.0 - s.F) * (1.0 - s.Fear)
+
+    def regen(self) -> np.ndarray:
+        # sąsiedzi spoza fragmentu (halo) czytani wprost z bufora support
+        local_support = np.clip(self.csr.neighbor_mean(self.sh["support"]), 0.0, 1.0)
+        return self._leaf_sums(local_support)
+
+    def core(self, step: int, A_t: float, collective_regen: float):
+        p, m = self.p, self.stop - self.start
+        if self.streams is not None:
+            noise = self.streams.normal_array("noise", step, m, 0.0, 0.10, start=self.start)
+            gumbel = self.streams.gumbel_array("gumbel", step, m, start=self.start)
+        else:
+            noise = self.sh["noise"][self.start:self.stop]
+            gumbel = self.sh["gumbel"][self.start:self.stop]
+        update_core_states(
+            self.state,
+            self.vp,
+            noise=noise,
+            A_t=A_t,
+            I_work=p.I_work,
+            collective_regen=collective_regen,
+            G_regen=p.G_regen,
+            visibility_weight=p.visibility_weight,
+            regen_base=p.regen_base,
+            regen_work_penalty=p.regen_work_penalty,
+            overload_threshold=p.overload_threshold,
+            overload_scale=p.overload_scale,
+        )
+        # kandydaci do access: lokalne top-k każdego lorda (globalne top-k jest ich podzbiorem)
+        keys = access_keys(self.state, self.lords, self.patron, gumbel, p.w_loy, p.w_cent, p.w_perf)
+        budget = access_budget(self.lords, p.access_scale)
+        counts = np.bincount(self.patron, minlength=self.lords.n)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        pos = select_by_lord(self.patron, keys, budget, offsets)
+        self.state.access_received[:] = 0.0
+        return pos + self.start, keys[pos], self.patron[pos]
+
+    def loyalty(self, step: int, sort: bool, switching: bool) -> Dict:
+        s, p = self.state, self.p
+        update_loyalty_after_access(s, self.vp)
+        # częściowe agregaty kroku; sort — krok zapisywany: F posortowane do scalenia (gini)
+        x = np.clip(s.F.astype(float, copy=False), 0.0, None)
+        if sort:
+            self.sort_runs()
+        out = {
+            "core": np.stack([self._leaf_sums(s.data[k]) for k in range(len(STATE_VARS))], axis=1),
+            "F": self._leaf_sums(x),
+            "Loy": self._leaf_sums(s.Loy.astype(float, copy=False)),
+            "bad": int(np.count_nonzero((s.E < p.e_min) & (s.Sense < p.s_min))),
+            "access": int(np.count_nonzero(s.access_received)),
+        }
+        if switching:
+            # schemat licznikowy: decyzje o zmianie patrona losowane lokalnie (te same liczby co w całości)
+            u = self.streams.random_array("switch", step, self.stop - self.start, start=self.start)[:, 0]
+            out["switch"] = np.flatnonzero(switch_candidates(s, u, p.switch_loy, p.switch_prob)) + self.start
+        return out
+
+    def sort_runs(self) -> None:
+        x = np.clip(self.state.F.astype(float, copy=False), 0.0, None)
+        self.sh["runs"][self.start:self.stop] = np.sort(x)
+
+    def aggregate(self, mean_access: float, mean_loy: float) -> Dict:
+        # gini: scalanie posortowanych fragmentów F; korelacja access–Loy: sumy scentrowane jak safe_corr
+        runs = [self.sh["runs"][a:b] for a, b in self.bounds]
+        lo, hi = rank_cuts(runs, self.start), rank_cuts(runs, self.stop)
+        x = np.sort(np.concatenate([r[a:b] for r, a, b in zip(runs, lo, hi)]))
+        index = np.arange(self.start + 1, self.stop + 1)
+        s = self.state
+        dx = s.access_received.astype(float, copy=False) - mean_access
+        dy = s.Loy.astype(float, copy=False) - mean_loy
+        out = {
+            "sorted": self._leaf_sums(x),
+            "weighted": self._leaf_sums(index * x),
+            "corr": np.stack([self._leaf_sums(dx * dx), self._leaf_sums(dy * dy), self._leaf_sums(dx * dy)], axis=1),
+        }
+        # support na następny krok (stan po kroku jest już kompletny)
+        self.support()
+        return out
+
+
+def _worker_main(conn, name: str, spec, params: ModelParams, start: int, stop: int, leaves, bounds) -> None:
+    shared = SharedArrays(spec, name=name)
+    shard = _Shard(shared, params, start, stop, leaves, bounds)
+    try:
+        while True:
+            cmd, args = conn.recv()
+            if cmd == "stop":
+                break
+            try:
+                conn.send(("ok", getattr(shard, cmd)(*args)))
+            except Exception:
+                conn.send(("error", traceback.format_exc()))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del shard
+        shared.close()
+
+
+def _shutdown(procs, conns, shared: SharedArrays) -> None:
+    for conn in conns:
+        try:
+            conn.send(("stop", ()))
+        except (OSError, ValueError):
+            pass
+    for proc in procs:
+        proc.join(timeout=5)
+        if proc.is_alive():
+            proc.terminate()
+    shared.close()
+
+
+class ShardedModel(TiredSystemModel):
+    """
+    TiredSystemModel liczony w `workers` procesach: wasale podzieleni na ciągłe fragmenty, stan w
+    multiprocessing.shared_memory. W kroku procesy wymieniają tylko to, czego nie da się policzyć lokalnie:
+    wartości sąsiadów spoza fragmentu (halo, czytane z bufora support), częściowe sumy średnich,
+    liczniki exit/access, kandydatów top-k per lord, a w krokach zapisywanych posortowane F (gini) i sumy
+    scentrowane korelacji access–Loy.
+    Wyniki są bit-identyczne z TiredSystemModel dla tych samych params: fragmenty są liśćmi drzewa
+    sumowania parami NumPy, a suma z liści jest składana w jego kolejności (pairwise_combine).
+    Proces główny nie przechodzi po populacji przy rng_scheme="counter": szum, Gumbel i decyzje o zmianie
+    patrona losują procesy robocze; scalanie kandydatów access to sortowanie najwyżej workers × Σ budżet
+    lordów wpisów (niezależnie od n_vassals), a zmiana patrona kosztuje O(liczba zmian).
+    Przy "sequential" jeden generator wymusza losowanie w procesie głównym (O(n_vassals) na krok, szeregowo).
+    Profil: core_update obejmuje lokalny wybór kandydatów access, loyalty — częściowe agregaty,
+    collect — gini i korelację kroków zapisywanych.
+    close() kończy procesy i przenosi stan do zwykłej pamięci (dalsze kroki liczone jak w TiredSystemModel).
+    """
+
+    def __init__(
+        self,
+        params: ModelParams,
+        agent_recording: Optional[AgentRecording] = None,
+        buffer_steps: Optional[int] = None,
+        profiler: Optional[PhaseProfiler] = None,
+        compact: bool = False,
+        workers: Optional[int] = None,
+        collection: Optional[CollectionPolicy] = None,
+    ):
+        if params.exit_removal:
+            # wyjście zmienia sieć w trakcie przebiegu, a fragmenty trzymają ją w pamięci współdzielonej
+            raise ValueError("ShardedModel nie obsługuje exit_removal")
+        super().__init__(
+            params, agent_recording=agent_recording, buffer_steps=buffer_steps, profiler=profiler, compact=compact,
+            collection=collection,
+        )
+        n, workers = params.n_vassals, max(1, workers or os.cpu_count() or 1)
+        self._depth = math.ceil(math.log2(workers)) + 2
+        leaves = pairwise_leaves(n, self._depth)
+        groups = [g for g in np.array_split(np.arange(len(leaves)), min(workers, len(leaves))) if g.size]
+        self.workers = len(groups)
+        shard_leaves = [[leaves[i] for i in g] for g in groups]
+        bounds = [(sl[0][0], sl[-1][1]) for sl in shard_leaves]
+
+        csr = self.peer_csr
+        dtype = self.state.dtype.str
+        spec = {
+            "state": ((len(VASSAL_ARRAYS), n), dtype),
+            "lords": ((len(LORD_ARRAYS), params.n_lords), dtype),
+            "patron": ((n,), np.dtype(np.intp).str),
+            "indptr": (csr.indptr.shape, csr.indptr.dtype.str),
+            "indices": (csr.indices.shape, csr.indices.dtype.str),
+            "support": ((n,), dtype),
+            "runs": ((n,), "<f8"),
+        }
+        if params.rng_scheme != "counter":
+            spec.update(noise=((n,), "<f8"), gumbel=((n,), "<f8"))
+        self._shared = shared = SharedArrays(spec)
+        shared["state"][...] = self.state.data
+        shared["indptr"][...] = csr.indptr
+        shared["indices"][...] = csr.indices
+        self.state = VassalState.view(shared["state"])
+        self._publish()
+
+        ctx = mp.get_context("spawn")
+        self._conns, procs = [], []
+        for sl, (start, stop) in zip(shard_leaves, bounds):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(
+                target=_worker_main,
+                args=(child, shared.name, spec, params, start, stop, sl, bounds),
+                daemon=True,
+            )
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            procs.append(proc)
+        self._finalizer = weakref.finalize(self, _shutdown, procs, self._conns, shared)
+        self._support_ready = False
+
+    # --- komunikacja z procesami roboczymi ---
+    @property
+    def closed(self) -> bool:
+        return not self._finalizer.alive
+
+    def _send(self, cmd: str, *args) -> None:
+        for conn in self._conns:
+            conn.send((cmd, args))
+
+    def _recv(self) -> list:
+        out = []
+        for conn in self._conns:
+            status, value = conn.recv()
+            if status != "ok":
+                raise RuntimeError(f"Błąd w procesie roboczym:\n{value}")
+            out.append(value)
+        return out
+
+    def _call(self, cmd: str, *args) -> list:
+        self._send(cmd, *args)
+        return self._recv()
+
+    def _publish(self) -> None:
+        # lordowie i patronat: kopie w pamięci współdzielonej (model trzyma własne)
+        self._shared["lords"][...] = self.lord_state.data
+        self._shared["patron"][...] = self.lord_groups.patron
+
+    def close(self) -> None:
+        """Kończy procesy robocze i zwalnia pamięć współdzieloną (stan zostaje w modelu)."""
+        if self.closed:
+            return
+        self.state = VassalState.view(self.state.data.copy())
+        self._finalizer()
+
+    def __enter__(self) -> "ShardedModel":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.close()
+        return False
+
+    def restore(self, snap: ModelSnapshot) -> None:
+        super().restore(snap)
+        if not self.closed:
+            self._publish()
+        self._support_ready = False
+
+    # --- krok ---
+    def _leaf_combine(self, parts: List[np.ndarray]):
+        return pairwise_combine(self.p.n_vassals, self._depth, [leaf for part in parts for leaf in part])
+
+    def _summary_from_parts(self, parts: List[Dict]) -> Dict[str, float]:
+        # te same wzory co metrics.summarize_vassals(full=False), z sum składanych po liściach
+        n = self.p.n_vassals
+        means = _mean_from_sum(self._leaf_combine([part["core"] for part in parts]), n)
+        out = {f"mean_{var}": float(m) for var, m in zip(STATE_VARS, means)}
+        bad = sum(part["bad"] for part in parts)
+        out["exit_share"] = float(bad / max(1, n))
+        return out
+
+    def _complete_summary(self, parts: List[Dict], sorted_runs: bool) -> None:
+        """Gini i korelacja access–Loy kroku zapisywanego (jak summarize_vassals(full=True)) z procesów roboczych."""
+        n = self.p.n_vassals
+        if not sorted_runs:
+            self._call("sort_runs")
+        # access_received ma wartości 0/1: suma to dokładnie liczba wasali z access
+        k = sum(part["access"] for part in parts)
+        mean_access = float(_mean_from_sum(np.float64(k), n)) if n else 0.0
+        mean_loy = float(_mean_from_sum(self._leaf_combine([part["Loy"] for part in parts]), n)) if n else 0.0
+        agg = self._call("aggregate", mean_access, mean_loy)
+        self._support_ready = True
+
+        out = self._summary
+        total_F = self._leaf_combine([part["F"] for part in parts])
+        if n == 0 or np.isclose(total_F, 0.0):
+            out["gini_F"] = 0.0
+        else:
+            weighted = self._leaf_combine([g["weighted"] for g in agg])
+            out["gini_F"] = gini_from_sums(weighted, self._leaf_combine([g["sorted"] for g in agg]), n)
+        # po sortowaniu jedynki access na pozycjach n-k+1..n (sumy całkowite, dokładne)
+        out["gini_access"] = gini_from_sums(np.float64(k * (2 * n - k + 1) // 2), np.float64(k), n) if k else 0.0
+        out["corr_access_loy"] = corr_from_sums(*self._leaf_combine([g["corr"] for g in agg]), n) if n else 0.0
+
+    def step(self) -> EndState:
+        if not self.running:
+            return self._end_state()
+        if self.closed:
+            return super().step()
+
+        self.step_count += 1
+        prof, p, t = self.profiler, self.p, self.step_count
+
+        with prof.phase("collective_regen"):
+            if not self._support_ready:
+                self._call("support")
+            base = float(_mean_from_sum(self._leaf_combine(self._call("regen")), p.n_vassals)) if p.n_vassals else 0.0
+            self._collective_regen = float(np.clip(base * (1.0 - p.G_regen), 0.0, 1.0))
+
+        with prof.phase("affect"):
+            self._A_t = self._draw_affect_shock()
+
+        with prof.phase("core_update"):
+            if p.rng_scheme != "counter":
+                # schemat sekwencyjny: jeden generator, ta sama kolejność losowań co w TiredSystemModel
+                self._shared["noise"][...] = self.streams.normal_array("noise", t, p.n_vassals, 0.0, 0.10)
+                self._shared["gumbel"][...] = self.streams.gumbel_array("gumbel", t, p.n_vassals)
+            candidates = self._call("core", t, self._A_t, self._collective_regen)
+
+        with prof.phase("access"):
+            idx, keys, patron = (np.concatenate(c) for c in zip(*candidates))
+            counts = np.bincount(patron, minlength=p.n_lords)
+            offsets = np.concatenate(([0], np.cumsum(counts)))
+            # scalanie top-k fragmentów (≤ workers × Σ budżet wpisów); remis kluczy — mniejszy indeks wasala,
+            # jak w stabilnym sortowaniu całej populacji
+            perm = np.lexsort((idx, -keys, patron))
+            chosen = idx[select_by_lord(patron, keys, access_budget(self.lord_state, p.access_scale), offsets, perm=perm)]
+            self.state.access_received[chosen] = 1.0
+
+        counter = p.rng_scheme == "counter"
+        with prof.phase("loyalty"):
+            sorted_runs = self.collection.collects(t, final=False)
+            parts = self._call("loyalty", t, sorted_runs, p.patron_switching and counter)
+
+        if p.patron_switching:
+            with prof.phase("patronage"):
+                # licznikowy: kandydaci z procesów roboczych; sekwencyjny: jeden generator w procesie głównym
+                if counter:
+                    moved = self._move_patrons(np.concatenate([part["switch"] for part in parts]))
+                else:
+                    moved = self._switch_patrons()
+                # procesy robocze liczą grupy lordów co krok z patronatu w pamięci współdzielonej
+                self._shared["patron"][moved] = self.lord_groups.patron[moved]
+
+        with prof.phase("aggregate"):
+            self._summary = self._summary_from_parts(parts)
+            self._summary_step = t
+            self._support_ready = False
+
+        with prof.phase("conflict"):
+            self._conflict_intensity, self._resolution_potential, self.resolution_event_last = self._compute_conflict_and_resolution()
+
+        with prof.phase("termination"):
+            self._check_termination()
+
+        with prof.phase("collect"):
+            # gini i korelacja tylko dla kroków zapisywanych (ostatni krok znany dopiero po warunkach końcowych)
+            if self.collection.collects(t, final=not self.running):
+                self._complete_summary(parts, sorted_runs)
+            self._collect()
+
+        return self._end_state()
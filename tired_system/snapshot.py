@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import pickle
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+import numpy as np
+
+from .params import ModelParams
+from .recording import ModelSeries, AgentRecorder
+
+# pola, które muszą się zgadzać między snapshotem a modelem, do którego go wczytujemy
+# (wyznaczają topologię peer i kształt tablic)
+TOPOLOGY_FIELDS = ("n_vassals", "n_lords", "peer_k", "peer_rewire_p", "seed")
+
+
+@dataclass
+class ModelSnapshot:
+    """
+    Pełny stan TiredSystemModel po kroku `step_count`: kopie tablic stanu, patronat,
+    stan generatorów, status, wartości globalne i zebrane dane. Niezależny od modelu —
+    ten sam snapshot można wczytać wiele razy (każdy restore kopiuje z niego tablice).
+    Topologia peer jest statyczna i wynika z params (TOPOLOGY_FIELDS), więc nie jest kopiowana.
+    """
+    params: ModelParams
+    step_count: int
+    mesa_steps: int
+    running: bool
+    status: str
+    resolution_event_last: bool
+    globals: Dict[str, float]
+    summary: Dict[str, float]
+    state: np.ndarray
+    lord_state: np.ndarray
+    patron: np.ndarray
+    rng_state: Dict[str, Any]
+    random_state: Any
+    series: ModelSeries
+    agent_recorder: Optional[AgentRecorder] = None
+    agent_records: Optional[Dict[int, list]] = field(default=None, repr=False)
+    compact: bool = False
+    # exit_removal: sieć obecnych (PeerExits), indeksy i zamrożony stan wasali po wyjściu
+    exits: Optional[Dict[str, Any]] = field(default=None, repr=False)
+
+    def check_compatible(self, params: ModelParams) -> None:
+        for name in TOPOLOGY_FIELDS:
+            if getattr(params, name) != getattr(self.params, name):
+                raise ValueError(f"Snapshot niezgodny z modelem: różne {name}")
+
+    def save(self, path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @staticmethod
+    def load(path) -> "ModelSnapshot":
+        with open(path, "rb") as f:
+            snap = pickle.load(f)
+        if not isinstance(snap, ModelSnapshot):
+            raise TypeError(f"{path} nie zawiera ModelSnapshot")
+        return snap
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict
+import numpy as np
+
+from .recording import MODEL_COLUMNS, STATUSES, ModelSeries, AgentRecorder
+from .engine import LORD_ARRAYS
+
+FORMATS = ("parquet", "arrow")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as exc:  # pragma: no cover - zależy od środowiska
+        raise ImportError("Zapis Parquet/Arrow wymaga pakietu pyarrow (pip install pyarrow)") from exc
+    return pa
+
+
+class _ParquetParts:
+    """Katalog z plikami part-NNNNN.parquet — każdy chunk to osobny, kompletny plik."""
+
+    def __init__(self, path: Path, compression: str):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self.parts = 0
+
+    def write(self, table) -> None:
+        import pyarrow.parquet as pq
+
+        final = self.path / f"part-{self.parts:05d}.parquet"
+        tmp = final.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp, compression=self.compression)
+        # rename jest atomowy: czytelnik nigdy nie zobaczy połowy pliku
+        os.replace(tmp, final)
+        self.parts += 1
+
+    def close(self) -> None:
+        return
+
+
+class _ArrowStream:
+    """Plik Arrow IPC (format strumieniowy): każdy chunk to osobny record batch, od razu na dysku."""
+
+    def __init__(self, path: Path, schema, compression: str):
+        pa = _require_pyarrow()
+        self.path = path
+        self._sink = pa.OSFile(str(path), "wb")
+        options = pa.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+        self._writer = pa.ipc.new_stream(self._sink, schema, options=options)
+
+    def write(self, table) -> None:
+        self._writer.write_table(table)
+        self._sink.flush()
+
+    def close(self) -> None:
+        self._writer.close()
+        self._sink.close()
+
+
+class ChunkedRunWriter:
+    """
+    Strumieniowy zapis przebiegu: co `flush(model)` dopisuje zawartość buforów modelu
+    (szeregi modelu, zapis agentów, opcjonalnie lordów) i je opróżnia — pamięć nie rośnie z --steps.
+
+    fmt="parquet": katalogi <stem>.parquet/ z plikami part-*.parquet (pd.read_parquet(katalog));
+    fmt="arrow":   pliki <stem>.arrows w formacie Arrow IPC stream.
+    Po przerwaniu runu dane do ostatniego pełnego chunku są czytelne (zob. read_partial).
+    """
+
+    def __init__(self, outdir, stems: Dict[str, str], fmt: str = "parquet", compression: str = "zstd"):
+        if fmt not in FORMATS:
+            raise ValueError(f"fmt musi być jednym z {FORMATS}")
+        _require_pyarrow()
+        self.outdir = Path(outdir)
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        self.stems = stems  # {"model": ..., "agents": ..., "lords": ...}
+        self.fmt = fmt
+        self.compression = compression
+        self._sinks: Dict[str, object] = {}
+        self.paths: Dict[str, Path] = {}
+
+    def _sink(self, name: str, table):
+        if name not in self._sinks:
+            if self.fmt == "parquet":
+                path = self.outdir / f"{self.stems[name]}.parquet"
+                self._sinks[name] = _ParquetParts(path, self.compression)
+            else:
+                path = self.outdir / f"{self.stems[name]}.arrows"
+                self._sinks[name] = _ArrowStream(path, table.schema, self.compression)
+            self.paths[name] = path
+        return self._sinks[name]
+
+    def _write(self, name: str, table) -> None:
+        if table.num_rows:
+            self._sink(name, table).write(table)
+
+    def flush(self, model) -> None:
+        self._write("model", model_series_table(model.series))
+        model.series.clear()
+        rec = model.agent_recorder
+        if rec is not None:
+            self._write("agents", agent_table(rec))
+            if rec.lord_data is not None and "lords" in self.stems:
+                self._write("lords", lord_table(rec))
+            rec.clear()
+
+    def close(self) -> None:
+        for sink in self._sinks.values():
+            sink.close()
+
+    def __enter__(self) -> "ChunkedRunWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def model_series_table(series: ModelSeries):
+    pa = _require_pyarrow()
+    n = series.size
+    columns = {
+        "Step": pa.array(series.step[:n], type=pa.int64()),
+        "status": pa.array(np.array(STATUSES, dtype=object)[series.status[:n]], type=pa.string()),
+        "resolution_event": pa.array(series.resolution_event[:n], type=pa.bool_()),
+    }
+    for j, name in enumerate(MODEL_COLUMNS):
+        columns[name] = pa.array(np.ascontiguousarray(series.values[:n, j]), type=pa.float64())
+    return pa.table(columns)
+
+
+def agent_table(rec: AgentRecorder):
+    pa = _require_pyarrow()
+    n, n_agents = rec.size, rec.agents.size
+    flat = rec.data[:n].reshape(n * n_agents, len(rec.variables))
+    columns = {
+        "Step": pa.array(np.repeat(rec.steps[:n], n_agents), type=pa.int64()),
+        "vassal": pa.array(np.tile(rec.agents, n).astype(np.int32), type=pa.int32()),
+    }
+    for j, name in enumerate(rec.variables):
+        columns[name] = pa.array(np.ascontiguousarray(flat[:, j]), type=pa.float32())
+    return pa.table(columns)
+
+
+def lord_table(rec: AgentRecorder):
+    pa = _require_pyarrow()
+    n, n_lords = rec.size, rec.lord_data.shape[1]
+    flat = rec.lord_data[:n].reshape(n * n_lords, len(LORD_ARRAYS))
+    columns = {
+        "Step": pa.array(np.repeat(rec.steps[:n], n_lords), type=pa.int64()),
+        "lord": pa.array(np.tile(np.arange(n_lords, dtype=np.int32), n), type=pa.int32()),
+    }
+    for j, name in enumerate(LORD_ARRAYS):
+        columns[name] = pa.array(np.ascontiguousarray(flat[:, j]), type=pa.float32())
+    return pa.table(columns)
+
+
+def read_partial(path):
+    """
+    Czyta wynik zapisu strumieniowego, także z przerwanego runu:
+    katalog Parquet — wszystkie kompletne pliki part-*; plik .arrows — batche do pierwszego uszkodzonego.
+    """
+    pa = _require_pyarrow()
+    path = Path(path)
+    if path.is_dir():
+        import pyarrow.parquet as pq
+
+        parts = sorted(path.glob("part-*.parquet"))
+        tables = [pq.read_table(p) for p in parts]
+        return pa.concat_tables(tables).to_pandas() if tables else None
+
+    batches = []
+    with pa.OSFile(str(path), "rb") as source:
+        try:
+            reader = pa.ipc.open_stream(source)
+            while True:
+                batches.append(reader.read_next_batch())
+        except StopIteration:
+            pass
+        except (pa.ArrowInvalid, OSError, EOFError):
+            # urwany ostatni batch (kill w trakcie zapisu) — zwracamy to, co kompletne
+            pass
+    return pa.Table.from_batches(batches).to_pandas() if batches else None
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from typing import Optional
+import numpy as np
+
+# schematy losowań (ModelParams.rng_scheme)
+RNG_SCHEMES = ("sequential", "counter")
+
+# cele losowań — część klucza strumienia w schemacie licznikowym
+PURPOSES = {
+    "patron": 0,
+    "lord_init": 1,
+    "vassal_init": 2,
+    "affect": 3,
+    "noise": 4,
+    "gumbel": 5,
+    "resolution": 6,
+    "switch": 7,
+}
+
+_TWO_PI = 2.0 * np.pi
+_INV_2_53 = 1.0 / 9007199254740992.0
+
+
+class SequentialStreams:
+    """
+    Dotychczasowy schemat: jeden generator zużywany w kolejności wywołań.
+    Argumenty purpose/step/slot/start są ignorowane — wynik zależy od kolejności, a nie od klucza.
+    """
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+
+    def integers(self, purpose: str, n: int, high: int) -> np.ndarray:
+        return self.rng.integers(0, high, size=n)
+
+    def random_matrix(self, purpose: str, n: int, k: int) -> np.ndarray:
+        return self.rng.random((n, k))
+
+    def random(self, purpose: str, step: int, slot: int = 0) -> float:
+        return float(self.rng.random())
+
+    def normal(self, purpose: str, step: int, slot: int = 0, loc: float = 0.0, scale: float = 1.0) -> float:
+        return float(self.rng.normal(loc=loc, scale=scale))
+
+    def uniform(self, purpose: str, step: int, slot: int = 0, low: float = 0.0, high: float = 1.0) -> float:
+        return float(self.rng.uniform(low, high))
+
+    def normal_array(self, purpose: str, step: int, n: int, loc: float = 0.0, scale: float = 1.0, start: int = 0) -> np.ndarray:
+        return self.rng.normal(loc, scale, size=n)
+
+    def gumbel_array(self, purpose: str, step: int, n: int, start: int = 0) -> np.ndarray:
+        return self.rng.gumbel(size=n)
+
+    def random_array(self, purpose: str, step: int, n: int, k: int = 1, start: int = 0) -> np.ndarray:
+        return self.rng.random((n, k))
+
+    def random_at(self, purpose: str, step: int, idx: np.ndarray, k: int = 1) -> np.ndarray:
+        return self.rng.random((len(idx), k))
+
+
+class CounterStreams:
+    """
+    Schemat licznikowy (Philox): wartość zależy tylko od klucza (seed, step, agent, cel), nie od kolejności
+    ani podziału pracy — zakres agentów [start, start + n) daje te same liczby w całości, w chunkach
+    i w osobnych procesach. Agent i dostaje blok 4 × uint64 pod licznikiem (i, step, cel, sub);
+    normalne z Boxa–Mullera, Gumbel z odwrotnej dystrybuanty.
+    """
+
+    def __init__(self, seed: Optional[int]):
+        self.seed = seed
+        self.key = np.random.SeedSequence(seed).generate_state(2, np.uint64)
+
+    def _blocks(self, purpose: str, step: int, start: int, n: int, sub: int = 0) -> np.ndarray:
+        counter = np.array([start, step, PURPOSES[purpose], sub], dtype=np.uint64)
+        bg = np.random.Philox(key=self.key, counter=counter)
+        return bg.random_raw(4 * n).reshape(n, 4)
+
+    def _uniforms(self, purpose: str, step: int, start: int, n: int, k: int) -> np.ndarray:
+        """(n, k) liczb z (0, 1): k wartości na agenta, z ceil(k / 4) bloków."""
+        raw = np.concatenate(
+            [self._blocks(purpose, step, start, n, sub) for sub in range(-(-k // 4))], axis=1
+        )[:, :k]
+        return ((raw >> np.uint64(11)).astype(np.float64) + 0.5) * _INV_2_53
+
+    @staticmethod
+    def _box_muller(u1: np.ndarray, u2: np.ndarray) -> np.ndarray:
+        return np.sqrt(-2.0 * np.log(u1)) * np.cos(_TWO_PI * u2)
+
+    # --- inicjalizacja (step = 0) ---
+    def integers(self, purpose: str, n: int, high: int) -> np.ndarray:
+        u = self._uniforms(purpose, 0, 0, n, 1)[:, 0]
+        return np.minimum((u * high).astype(np.int64), high - 1)
+
+    def random_matrix(self, purpose: str, n: int, k: int) -> np.ndarray:
+        return self._uniforms(purpose, 0, 0, n, k)
+
+    # --- wartości skalarne kroku (slot = numer losowania w obrębie celu) ---
+    def random(self, purpose: str, step: int, slot: int = 0) -> float:
+        return float(self._uniforms(purpose, step, slot, 1, 1)[0, 0])
+
+    def normal(self, purpose: str, step: int, slot: int = 0, loc: float = 0.0, scale: float = 1.0) -> float:
+        u = self._uniforms(purpose, step, slot, 1, 2)
+        return float(loc + scale * self._box_muller(u[:, 0], u[:, 1])[0])
+
+    def uniform(self, purpose: str, step: int, slot: int = 0, low: float = 0.0, high: float = 1.0) -> float:
+        return low + (high - low) * self.random(purpose, step, slot)
+
+    # --- wektory per agent ---
+    def normal_array(self, purpose: str, step: int, n: int, loc: float = 0.0, scale: float = 1.0, start: int = 0) -> np.ndarray:
+        u = self._uniforms(purpose, step, start, n, 2)
+        return loc + scale * self._box_muller(u[:, 0], u[:, 1])
+
+    def gumbel_array(self, purpose: str, step: int, n: int, start: int = 0) -> np.ndarray:
+        u = self._uniforms(purpose, step, start, n, 1)[:, 0]
+        return -np.log(-np.log(u))
+
+    def random_array(self, purpose: str, step: int, n: int, k: int = 1, start: int = 0) -> np.ndarray:
+        """(n, k) liczb z (0, 1) — k wartości na agenta."""
+        return self._uniforms(purpose, step, start, n, k)
+
+    def random_at(self, purpose: str, step: int, idx: np.ndarray, k: int = 1) -> np.ndarray:
+        """Wiersze idx tablicy random_array(purpose, step, ·, k) — koszt O(len(idx)), nie O(N)."""
+        rows = [self._uniforms(purpose, step, i, 1, k) for i in idx.tolist()]
+        return np.concatenate(rows) if rows else np.zeros((0, k))
+
+
+def make_streams(scheme: str, seed: Optional[int], rng: np.random.Generator):
+    """Strumienie losowań modelu wg ModelParams.rng_scheme (rng — generator schematu sekwencyjnego)."""
+    if scheme == "sequential":
+        return SequentialStreams(rng)
+    if scheme == "counter":
+        return CounterStreams(seed)
+    raise ValueError(f"rng_scheme musi być jednym z {RNG_SCHEMES}")
@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import math
+import pickle
+from dataclasses import fields
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+
+from .params import ModelParams
+from .sensitivity import OUTPUTS, STATUS_CODE, ParamSpace, evaluate, unit_sample
+
+# reżimy w kolejności kodów STATUS_CODE (collapse=0, dryf/max_steps=1, reform=2)
+REGIMES = ("collapse", "max_steps", "reform")
+# wielkości ciągłe przewidywane obok reżimu
+TARGETS = ("step", "mean_coord", "exit_share")
+
+_JITTER = 1e-8
+# granice (log) hiperparametrów; cechy są w skali [0, 1], wyjścia standaryzowane
+_LOG_LS = (math.log(0.02), math.log(20.0))
+_LOG_SIGNAL = (math.log(0.1), math.log(10.0))
+_LOG_NOISE = (math.log(1e-3), math.log(1.0))
+
+
+def _sqdist(A: np.ndarray, B: np.ndarray, ls: np.ndarray) -> np.ndarray:
+    a, b = A / ls, B / ls
+    d = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(d, 0.0)
+
+
+def _tri_inv(L: np.ndarray) -> np.ndarray:
+    try:
+        from scipy.linalg import solve_triangular
+    except ImportError:
+        return np.linalg.inv(L)
+    return solve_triangular(L, np.eye(len(L)), lower=True)
+
+
+def _norm_cdf(x: np.ndarray) -> np.ndarray:
+    try:
+        from scipy.special import ndtr
+    except ImportError:
+        # Abramowitz–Stegun 7.1.26 (błąd < 1.5e-7)
+        z = np.abs(x) / math.sqrt(2.0)
+        t = 1.0 / (1.0 + 0.3275911 * z)
+        poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+        erf = 1.0 - poly * np.exp(-z * z)
+        return 0.5 * (1.0 + np.sign(x) * erf)
+    return ndtr(x)
+
+
+def _neg_log_likelihood(theta: np.ndarray, X: np.ndarray, Z: np.ndarray) -> Tuple[float, np.ndarray]:
+    # -log p(Z | X, theta) dla kolumn Z ze wspólnym jądrem i gradient po theta = [log ls, log signal, log noise]
+    n, d = X.shape
+    T = Z.shape[1]
+    ls, s2, n2 = np.exp(theta[:d]), math.exp(2.0 * theta[d]), math.exp(2.0 * theta[d + 1])
+    KR = s2 * np.exp(-0.5 * _sqdist(X, X, ls))
+    K = KR + (n2 + _JITTER) * np.eye(n)
+    try:
+        L = np.linalg.cholesky(K)
+    except np.linalg.LinAlgError:
+        return 1e25, np.zeros_like(theta)
+    Linv = _tri_inv(L)
+    Kinv = Linv.T @ Linv
+    A = Kinv @ Z
+    nll = 0.5 * float((Z * A).sum()) + T * float(np.log(np.diag(L)).sum()) + 0.5 * n * T * math.log(2.0 * math.pi)
+    W = T * Kinv - A @ A.T
+    WK = W * KR
+    grad = np.empty_like(theta)
+    for j in range(d):
+        diff = X[:, j][:, None] - X[:, j][None, :]
+        grad[j] = 0.5 * float((WK * diff * diff).sum()) / ls[j] ** 2
+    grad[d] = float(WK.sum())
+    grad[d + 1] = float(np.trace(W)) * n2
+    return nll, grad
+
+
+def _fit_hyper(X: np.ndarray, Z: np.ndarray) -> np.ndarray:
+    """
+    Hiperparametry z maksimum wiarygodności brzegowej: L-BFGS-B (scipy), a bez scipy —
+    siatka po wspólnej długości skali i szumie.
+    """
+    d = X.shape[1]
+    try:
+        from scipy.optimize import minimize
+    except ImportError:
+        best, best_theta = np.inf, None
+        for log_ls in np.linspace(math.log(0.05), math.log(3.0), 12):
+            for log_noise in np.linspace(_LOG_NOISE[0], _LOG_NOISE[1], 7):
+                theta = np.array([log_ls] * d + [0.0, log_noise])
+                nll, _ = _neg_log_likelihood(theta, X, Z)
+                if nll < best:
+                    best, best_theta = nll, theta
+        return best_theta
+    theta0 = np.array([math.log(0.3)] * d + [0.0, math.log(0.1)])
+    bounds = [_LOG_LS] * d + [_LOG_SIGNAL, _LOG_NOISE]
+    res = minimize(_neg_log_likelihood, theta0, args=(X, Z), jac=True, method="L-BFGS-B", bounds=bounds)
+    return res.x
+
+
+class GaussianProcess:
+    """
+    Regresja GP z jądrem RBF (ARD, osobna długość skali na cechę) i szumem gaussowskim.
+    Kolumny Y (standaryzowane) dzielą jądro i rozkład Cholesky'ego — predykcja wszystkich wyjść
+    kosztuje jeden wektor jądra i jedno mnożenie przez L^-1 (O(n^2) na punkt).
+    """
+
+    def __init__(self, X: np.ndarray, Y: np.ndarray, lengthscales: np.ndarray, signal: float, noise: float):
+        self.X = np.asarray(X, dtype=float)
+        Y = np.asarray(Y, dtype=float)
+        self.lengthscales = np.asarray(lengthscales, dtype=float)
+        self.signal = float(signal)
+        self.noise = float(noise)
+        self.y_mean = Y.mean(axis=0)
+        std = Y.std(axis=0)
+        self.y_std = np.where(std > 0, std, 1.0)
+        self._Z = (Y - self.y_mean) / self.y_std
+        K = self.signal ** 2 * np.exp(-0.5 * _sqdist(self.X, self.X, self.lengthscales))
+        K[np.diag_indices_from(K)] += self.noise ** 2 + _JITTER
+        self._Linv = _tri_inv(np.linalg.cholesky(K))
+        self._alpha = self._Linv.T @ (self._Linv @ self._Z)
+
+    @classmethod
+    def fit(cls, X: np.ndarray, Y: np.ndarray, max_fit: int = 600, seed: Optional[int] = 0) -> "GaussianProcess":
+        """Hiperparametry na podpróbie max_fit punktów (koszt O(max_fit^3) na iterację), model na wszystkich."""
+        X, Y = np.asarray(X, dtype=float), np.asarray(Y, dtype=float)
+        sub = np.arange(len(X))
+        if len(X) > max_fit:
+            sub = np.sort(np.random.default_rng(seed).choice(len(X), size=max_fit, replace=False))
+        std = Y[sub].std(axis=0)
+        Z = (Y[sub] - Y[sub].mean(axis=0)) / np.where(std > 0, std, 1.0)
+        theta = _fit_hyper(X[sub], Z)
+        d = X.shape[1]
+        return cls(X, Y, np.exp(theta[:d]), math.exp(theta[d]), math.exp(theta[d + 1]))
+
+    def kernel(self, A: np.ndarray, B: np.ndarray) -> np.ndarray:
+        return self.signal ** 2 * np.exp(-0.5 * _sqdist(A, B, self.lengthscales))
+
+    def predict(self, Xs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Średnie (m, T) w jednostkach Y i wariancja latentna (m,) w jednostkach standaryzowanych (bez szumu)."""
+        Ks = self.kernel(np.atleast_2d(np.asarray(Xs, dtype=float)), self.X)
+        mean = (Ks @ self._alpha) * self.y_std + self.y_mean
+        V = self._Linv @ Ks.T
+        var = np.maximum(self.signal ** 2 - (V * V).sum(axis=0), 1e-12)
+        return mean, var
+
+    def loo(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Predykcje leave-one-out w postaci zamkniętej: średnie (n, T) i wariancje predykcyjne (n,) standaryzowane."""
+        diag = (self._Linv * self._Linv).sum(axis=0)
+        mean = (self._Z - self._alpha / diag[:, None]) * self.y_std + self.y_mean
+        return mean, 1.0 / diag
+
+
+def _class_probs(mean: np.ndarray, var: np.ndarray, scale: float) -> np.ndarray:
+    # one-vs-rest: P(f_k > 0) przez łącze probitowe, znormalizowane do sumy 1
+    p = _norm_cdf(scale * mean / np.sqrt(1.0 + scale ** 2 * var))
+    p = np.maximum(p, 1e-12)
+    return p / p.sum(axis=1, keepdims=True)
+
+
+def _as_array(rows, name: str) -> np.ndarray:
+    return np.asarray(rows[name])
+
+
+class Surrogate:
+    """
+    Emulator reżimu i wyjść końcowych nad polami `names` ModelParams (pozostałe pola jak w danych
+    uczących). Klasyfikacja: regresja GP na wskaźnikach ±1 reżimów (one-vs-rest) z kalibracją
+    probitową z predykcji leave-one-out; step, mean_coord, exit_share — regresja GP z odchyleniem.
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        lower: np.ndarray,
+        upper: np.ndarray,
+        gp: GaussianProcess,
+        scale: float,
+        base: Optional[ModelParams] = None,
+    ):
+        self.names = tuple(names)
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.gp = gp
+        self.scale = float(scale)
+        self.base = base
+
+    @property
+    def n_train(self) -> int:
+        return len(self.gp.X)
+
+    @classmethod
+    def fit(
+        cls,
+        rows,
+        names: Optional[Sequence[str]] = None,
+        lower: Optional[Sequence[float]] = None,
+        upper: Optional[Sequence[float]] = None,
+        base: Optional[ModelParams] = None,
+        max_fit: int = 600,
+        seed: Optional[int] = 0,
+    ) -> "Surrogate":
+        """
+        rows: kolumny (DataFrame albo dict) z polami ModelParams, status, step, mean_coord, exit_share —
+        np. wyniki sweep_phase_diagram.py lub projekt sensitivity_analysis.py (status jako tekst albo kod).
+        names: cechy (domyślnie kolumny będące polami ModelParams); lower/upper: skala cech
+        (domyślnie zakres danych).
+        """
+        names = tuple(names or feature_columns(rows))
+        if not names:
+            raise ValueError("Brak kolumn z polami ModelParams w danych")
+        X = np.column_stack([_as_array(rows, name).astype(float) for name in names])
+        lo = np.nanmin(X, axis=0) if lower is None else np.asarray(lower, dtype=float)
+        hi = np.nanmax(X, axis=0) if upper is None else np.asarray(upper, dtype=float)
+        hi = np.where(hi > lo, hi, lo + 1.0)
+        codes = status_codes(_as_array(rows, "status"))
+        Y = np.column_stack(
+            [np.where(codes == k, 1.0, -1.0) for k in range(len(REGIMES))]
+            + [_as_array(rows, name).astype(float) for name in TARGETS]
+        )
+        # wiersze bez wartości (np. pole nieobecne w części plików) pomijamy
+        ok = np.isfinite(X).all(axis=1) & np.isfinite(Y).all(axis=1)
+        if not ok.any():
+            raise ValueError("Brak kompletnych wierszy dla cech: " + ", ".join(names))
+        X, Y, codes = X[ok], Y[ok], codes[ok]
+        gp = GaussianProcess.fit((X - lo) / (hi - lo), Y, max_fit=max_fit, seed=seed)
+
+        # kalibracja łącza: skala maksymalizująca wiarygodność LOO reżimów
+        mean, var = gp.loo()
+        k = len(REGIMES)
+        loo_var = var[:, None] * gp.y_std[:k] ** 2
+        best, scale = -np.inf, 1.0
+        for s in np.geomspace(0.1, 100.0, 61):
+            p = _class_probs(mean[:, :k], loo_var, s)
+            ll = float(np.log(p[np.arange(len(codes)), codes]).sum())
+            if ll > best:
+                best, scale = ll, float(s)
+        return cls(names, lo, hi, gp, scale, base=base)
+
+    def features(self, query) -> np.ndarray:
+        """
+        (m, d) cechy w skali [0, 1]: query — ModelParams, lista ModelParams, mapa nazwa -> wartości
+        albo tablica (m, d) wartości pól w kolejności names.
+        """
+        if isinstance(query, ModelParams):
+            query = [query]
+        if isinstance(query, Mapping) or hasattr(query, "columns"):
+            X = np.column_stack([np.atleast_1d(np.asarray(query[name], dtype=float)) for name in self.names])
+        elif len(query) and isinstance(query[0], ModelParams):
+            X = np.array([[float(getattr(p, name)) for name in self.names] for p in query])
+        else:
+            X = np.atleast_2d(np.asarray(query, dtype=float))
+        return (X - self.lower) / (self.upper - self.lower)
+
+    def _predict_unit(self, U: np.ndarray) -> Dict[str, np.ndarray]:
+        mean, var = self.gp.predict(U)
+        k = len(REGIMES)
+        noisy = var + self.gp.noise ** 2
+        p = _class_probs(mean[:, :k], noisy[:, None] * self.gp.y_std[:k] ** 2, self.scale)
+        out = {f"p_{name}": p[:, i] for i, name in enumerate(REGIMES)}
+        out["regime"] = np.array(REGIMES)[p.argmax(axis=1)]
+        # entropia rozkładu reżimów znormalizowana do [0, 1] i względne odchylenie latentne
+        out["entropy"] = -(p * np.log(p)).sum(axis=1) / math.log(k)
+        out["std"] = np.sqrt(var) / self.gp.signal
+        for i, name in enumerate(TARGETS):
+            out[name] = mean[:, k + i]
+            out[f"{name}_std"] = np.sqrt(noisy) * self.gp.y_std[k + i]
+        return out
+
+    def predict(self, query) -> Dict[str, np.ndarray]:
+        """
+        Prawdopodobieństwa reżimów (p_collapse, p_max_steps, p_reform), reżim najbardziej prawdopodobny,
+        niepewność (entropy, std) oraz średnie i odchylenia step, mean_coord, exit_share.
+        """
+        return self._predict_unit(self.features(query))
+
+    def acquisition(self, U: np.ndarray, explore: float = 0.5) -> np.ndarray:
+        """Wynik punktów: entropia reżimu (granice faz) + explore * odchylenie latentne (obszary bez danych)."""
+        pred = self._predict_unit(U)
+        return pred["entropy"] + explore * pred["std"]
+
+    def suggest(self, n: int, pool: int = 4096, explore: float = 0.5, seed: Optional[int] = None) -> np.ndarray:
+        """
+        n nowych punktów (n, d) w jednostkach pól do symulacji: najwyższe acquisition w puli Sobola,
+        wybierane zachłannie z karą za bliskość już wybranych (1 - k(x, x*) / signal^2).
+        """
+        U = unit_sample(pool, len(self.names), seed)
+        score = np.maximum(self.acquisition(U, explore), 0.0)
+        chosen: List[int] = []
+        for _ in range(min(n, pool)):
+            i = int(np.argmax(score))
+            chosen.append(i)
+            score *= 1.0 - self.gp.kernel(U, U[i:i + 1])[:, 0] / self.gp.signal ** 2
+            score[i] = -np.inf
+        return self.lower + U[chosen] * (self.upper - self.lower)
+
+    def save(self, path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as fh:
+            pickle.dump(self, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @staticmethod
+    def load(path) -> "Surrogate":
+        with open(path, "rb") as fh:
+            return pickle.load(fh)
+
+
+def feature_columns(rows) -> List[str]:
+    """Kolumny danych będące polami ModelParams (bez seed i rng_scheme), wypełnione we wszystkich wierszach."""
+    known = {f.name for f in fields(ModelParams)} - {"seed", "rng_scheme"}
+    names = rows.columns if hasattr(rows, "columns") else rows.keys()
+    return [c for c in names if c in known and np.isfinite(np.asarray(rows[c], dtype=float)).all()]
+
+
+def status_codes(status: np.ndarray) -> np.ndarray:
+    """Kody reżimów (indeksy REGIMES) dla statusów tekstowych albo kodów liczbowych."""
+    status = np.asarray(status)
+    if status.dtype.kind in "iuf":
+        # statusy uśrednione po replikach (np. 1.5, 0.67) — do najbliższego kodu, jak w _space_rows
+        return np.rint(status).astype(np.intp)
+    return np.array([STATUS_CODE.get(str(s), 1) for s in status], dtype=np.intp)
+
+
+def load_rows(paths: Sequence) -> "pd.DataFrame":
+    """Połączone wiersze z plików CSV (sweep, projekt analizy wrażliwości, wyniki active_learning)."""
+    import pandas as pd
+
+    return pd.concat([pd.read_csv(p) for p in paths], ignore_index=True)
+
+
+def _space_rows(space: ParamSpace, unit: np.ndarray, y: np.ndarray) -> Dict[str, np.ndarray]:
+    x = space.values(unit)
+    rows = {name: x[:, k] for k, name in enumerate(space.names)}
+    codes = np.rint(y[:, OUTPUTS.index("status")]).astype(np.intp)
+    rows["status"] = np.array(REGIMES, dtype=object)[codes]
+    for name in TARGETS:
+        rows[name] = y[:, OUTPUTS.index(name)]
+    return rows
+
+
+def active_learning(
+    space: ParamSpace,
+    rounds: int,
+    batch: int,
+    initial: int = 32,
+    rows=None,
+    pool: int = 4096,
+    explore: float = 0.5,
+    seed: Optional[int] = None,
+    max_fit: int = 600,
+    callback=None,
+    **kwargs,
+) -> Tuple[Surrogate, Dict[str, np.ndarray]]:
+    """
+    Pętla: dopasuj emulator, wybierz `batch` punktów (suggest), zasymuluj je (evaluate), dołącz do danych.
+    rows: dane początkowe (kolumny space.names + wyjścia); bez nich — `initial` punktów Sobola.
+    callback(round, surrogate, rows) po każdym dopasowaniu; kwargs: jak evaluate (workers, cache, ...).
+    """
+    lo, hi = np.array(space.lower), np.array(space.upper)
+    if rows is None:
+        unit = unit_sample(initial, space.d, seed)
+        data = _space_rows(space, unit, evaluate(space, unit, **kwargs))
+    else:
+        data = {name: np.asarray(rows[name]) for name in space.names + ("status",) + TARGETS}
+    for r in range(rounds):
+        sur = Surrogate.fit(data, space.names, lo, hi, base=space.base, max_fit=max_fit, seed=seed)
+        if callback is not None:
+            callback(r, sur, data)
+        x = sur.suggest(batch, pool=pool, explore=explore, seed=None if seed is None else seed + r + 1)
+        unit = np.clip((x - lo) / (hi - lo), 0.0, 1.0)
+        new = _space_rows(space, unit, evaluate(space, unit, **kwargs))
+        data = {name: np.concatenate([data[name], new[name]]) for name in data}
+    sur = Surrogate.fit(data, space.names, lo, hi, base=space.base, max_fit=max_fit, seed=seed)
+    if callback is not None:
+        callback(rounds, sur, data)
+    return sur, data